@@ -1,13 +1,57 @@
 # AGENTapi.py  (o app/main.py)
 
-from fastapi import FastAPI, HTTPException, Header, status
+import asyncio, json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, HTTPException, Header, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import uuid
 
-from agent import responder_pregunta   # apunta al nuevo agent.py
+from agent import responder_pregunta, responder_pregunta_astream   # apunta al nuevo agent.py
+from config import QA_MAX_WORKERS
+from router import ROUTER_STATS
+from semantic_cache import semantic_cache
+import hybrid_search
+import vectorstore
+import embed
+
+app = FastAPI(title="Sentencia QA API", version="1.4")
+
+
+@app.on_event("startup")
+def _warmup_indexes():
+    # Carga los índices FAISS en segundo plano: el worker acepta tráfico ya
+    vectorstore.warmup(background=True)
+
+
+@app.on_event("startup")
+async def _bounded_executor():
+    # Todo el trabajo bloqueante (asyncio.to_thread) va a un pool acotado:
+    # el event loop nunca espera a Together / FAISS / SQL Server
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=QA_MAX_WORKERS, thread_name_prefix="qa")
+    )
+
+
+@app.get("/health/memory", tags=["ops"])
+def memory_report():
+    # Pesos del embedder compartido + RSS del worker
+    return embed.resident_memory()
+
+
+@app.get("/health/cache", tags=["ops"])
+def cache_report():
+    # Decisiones del router (local/LLM) y aciertos de la caché semántica
+    return {"router": ROUTER_STATS, "semantic_cache": semantic_cache.stats()}
 
-app = FastAPI(title="Sentencia QA API", version="1.3")
+
+@app.get("/health/retrieval", tags=["ops"])
+def retrieval_report():
+    # Latencia media y tasa de acierto por ruta (dense / bm25 / ids)
+    return hybrid_search.stats()
 
 # ---------- modelos de request/response --------------------------
 class FileItem(BaseModel):
@@ -22,26 +66,85 @@ class QARequest(BaseModel):
 
 class QAResponse(BaseModel):
     answer: str
+    intent: str
+    confidence: float
+
+
+# Un asyncio.Lock por sesión, tomado en el event loop antes de pasar trabajo
+# al executor: ningún hilo del pool espera por él y sólo se ordenan los
+# turnos de la misma sesión (su historial y documento activo son propios)
+_SESSION_LOCKS: "OrderedDict[str, asyncio.Lock]" = OrderedDict()
+_MAX_SESSION_LOCKS = 10_000
+
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _SESSION_LOCKS.pop(session_id, None) or asyncio.Lock()
+    _SESSION_LOCKS[session_id] = lock
+    while len(_SESSION_LOCKS) > _MAX_SESSION_LOCKS:
+        old_id, old = next(iter(_SESSION_LOCKS.items()))
+        if old.locked():
+            break
+        del _SESSION_LOCKS[old_id]
+    return lock
 
 
 # -------------------- endpoint /qa -------------------------------
 @app.post("/qa", response_model=QAResponse, tags=["qa"])
 async def qa_endpoint(
     req: QARequest,
+    response: Response,
     x_session: Optional[str] = Header(None, convert_underscores=False),
 ):
     # 1) sesión
     session_id = x_session or uuid.uuid4().hex
 
-    # 2) llamar al agente
-    answer = responder_pregunta(
-        question=req.question,
-    )
+    # 2) llamar al agente (fuera del event loop); los turnos de una misma
+    #    sesión van en orden, sesiones distintas en paralelo
+    async with _session_lock(session_id):
+        answer, intent, confidence, _ = await asyncio.to_thread(
+            responder_pregunta, question=req.question, session_id=session_id)
 
     # 3) errores semánticos
     if answer.startswith("⚠️"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=answer)
 
     # 4) devolver session_id si era nuevo
-    headers = {"X-Session": session_id} if not x_session else {}
-    return QAResponse(answer=answer), headers
+    if not x_session:
+        response.headers["X-Session"] = session_id
+    return QAResponse(answer=answer, intent=intent, confidence=confidence)
+
+
+# -------------------- endpoint /qa/stream (SSE) ------------------
+def _sse(data: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/qa/stream", tags=["qa"])
+async def qa_stream_endpoint(
+    req: QARequest,
+    x_session: Optional[str] = Header(None, convert_underscores=False),
+):
+    """
+    Server-Sent Events: un evento `data: {"token": …}` por fragmento
+    generado y un evento final `end` con sesión e intención (o `error`).
+    """
+    session_id = x_session or uuid.uuid4().hex
+
+    async def _events():
+        info: dict = {}
+        try:
+            async with _session_lock(session_id):
+                async for token in responder_pregunta_astream(req.question, info,
+                                                              session_id=session_id):
+                    yield _sse({"token": token})
+            # La clasificación con la que se generó la respuesta
+            yield _sse({"session": session_id, "intent": info["intent"],
+                        "confidence": info["confidence"]}, event="end")
+        except Exception as e:
+            yield _sse({"detail": str(e)}, event="error")
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if not x_session:
+        headers["X-Session"] = session_id
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=headers)
@@ -1,7 +1,10 @@
 # core/agent.py — Orquestador con soporte doc_text + session_id
-import logging, uuid
-from memory import memory, register_pdf
-from router import detect_intent
+import asyncio, logging, uuid
+from typing import AsyncIterator, NamedTuple
+from memory import register_pdf, session_memory, session_state, use_session
+from router import classify_with_source
+from config import SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_INTENTS
+from semantic_cache import semantic_cache
 from tools import consulta_doc
 from tools.comparar_ids import run as comparar_ids_run
 from tools.cronología import run as cronologia_run
@@ -15,11 +18,13 @@ from tools.comparar       import run as comparar_run
 from tools.estadistica    import run as estadistica_run
 from tools.borrador_alerta import run as alerta_run
 from tools.auditoria_ley  import run as auditoria_ley_run
-from tools.query_libre    import query_libre_run
+from tools.query_libre    import query_libre_run, cache_context as query_libre_context, \
+                                remember as query_libre_remember
 
 from tools.consulta_doc   import run as consulta_run, _set_active, extract_identifier
+from hybrid_search        import hybrid_search
 from vectorstore          import search_by_text
-from tools.conversacional import run as conversacional_run
+from tools.conversacional import run as conversacional_run, astream as conversacional_astream
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +35,7 @@ TOOL_MAP = {
     "relacionar_juris":  comparar_run,        # (session_id, msg)
     "estadistica":     estadistica_run,     # (msg)
     #"borrador_alerta": alerta_run,          # (msg)
-    "consulta_doc":    consulta_run,        # (msg) — ya usa consulta_doc.active_doc
+    "consulta_doc":    consulta_run,        # (msg) — usa el documento activo de la sesión
     "consulta_concepto": query_libre_run,   # (msg)
     "auditoria_ley":   auditoria_ley_run,
     "comparar_ids":   comparar_ids_run,
@@ -38,6 +43,11 @@ TOOL_MAP = {
     "cronologia": cronologia_run
 }
 
+# Tools que además saben emitir tokens en streaming (async generators)
+STREAM_TOOL_MAP = {
+    "conversacional": conversacional_astream,
+}
+
 from typing import Tuple, Any, Optional
 
 def ultima_interaccion_filtrada(conversacion: Any, n_chars: int = 100
@@ -87,26 +97,33 @@ def _auto_activate_if_id(text: str):
     ident = extract_identifier(text)
     if not ident:
         return
-    hit = search_by_text(ident, k=1)
+    # identificador puro → ruta léxica exacta; si el índice BM25 no lo
+    # tiene (o no existe) se recurre a la búsqueda densa como antes
+    hit = hybrid_search(ident, k=1) or search_by_text(ident, k=1)
     if hit:
         _set_active(hit[0])
-history = ultima_interaccion_filtrada(memory.load_memory_variables({}))
+
+
+def session_history():
+    """Historial de la sesión en curso (lo que se añade al mensaje de conversacional)."""
+    st = session_state()
+    if "history" not in st:
+        st["history"] = ultima_interaccion_filtrada(session_memory().load_memory_variables({}))
+    return st["history"]
 
 # ───────────────────────── función pública ─────────────────
-def responder_pregunta(
-    question: str,
-) -> str:
-    global history
+class Respuesta(NamedTuple):
+    """Respuesta del agente junto con la intención que la produjo."""
+    answer: str
+    intent: str
+    confidence: float
+    source: str                  # "local" (k-NN) o "llm": quién eligió `intent`
 
-    """
-    Orquesta la respuesta:
-    • si llega `doc_text` lo registra y marca como documento activo.
-    • detecta intención → llama herramienta adecuada.
-    """
 
-    # 3) Detectar intención con el router
-    label = detect_intent(question)
-    logger.debug("Intento clasificado: %s", label)
+def _clasificar(question: str) -> tuple[str, float, str, str]:
+    """Detecta la intención y arma el mensaje para la tool → (label, confianza, origen, msg)."""
+    label, confidence, source = classify_with_source(question)
+    logger.debug("Intento clasificado: %s (%.2f, %s)", label, confidence, source)
 
     # if label == "conversacional":
     #     if consulta_doc.active_doc:
@@ -119,14 +136,121 @@ def responder_pregunta(
     #         "¿Podrías darme más detalles o reformular la pregunta?"
     #     )
     use_hist = (label == "conversacional")
-    msg = question if not use_hist else f"{question}\n\nHistorial de conversaciones:\n{history}"
-    # 3) Llama a la tool
+    msg = question if not use_hist else f"{question}\n\nHistorial de conversaciones:\n{session_history()}"
     print(msg)
-    respuesta = TOOL_MAP[label](msg)
-    # 5) Guardar en memoria de conversación
+    return label, confidence, source, msg
+
+def _guardar(label: str, question: str, respuesta: str) -> None:
+    """Guarda el turno en la memoria de conversación de la sesión."""
+    memory = session_memory()
     memory.save_context(
         {"user": f"[Intent: {label}] {question}"},
         {"assistant": respuesta},
     )
-    history = memory.load_memory_variables({})
-    return respuesta
+    session_state()["history"] = memory.load_memory_variables({})
+
+# Historial que cada tool lee por su cuenta (además de lo que llega en `msg`)
+# y qué hacer cuando su respuesta sale de la caché en lugar de la tool
+_CONTEXTO_TOOL = {"consulta_concepto": query_libre_context}
+_AL_ACERTAR    = {"consulta_concepto": query_libre_remember}
+
+
+def _contexto(label: str, question: str, msg: str) -> str:
+    """Todo lo que la respuesta de la tool depende además de la pregunta."""
+    extra = msg[len(question):] if msg.startswith(question) else msg
+    leer = _CONTEXTO_TOOL.get(label)
+    return extra + (leer() if leer else "")
+
+
+def _cacheable(label: str, question: str, msg: str) -> bool:
+    # Sólo turnos sin historial: su respuesta depende únicamente de la
+    # pregunta y puede servirse a cualquier sesión
+    return (SEMANTIC_CACHE_ENABLED and label in SEMANTIC_CACHE_INTENTS
+            and not _contexto(label, question, msg).strip())
+
+
+def _buscar_en_cache(label: str, question: str, msg: str) -> tuple[str | None, bool]:
+    """
+    → (respuesta cacheada o None, cacheable). La decisión se toma antes de
+    llamar a la tool: después, la tool ya habrá guardado el turno en su historial.
+    """
+    if not _cacheable(label, question, msg):
+        return None, False
+    respuesta = semantic_cache.lookup(question, label)
+    if respuesta is not None and label in _AL_ACERTAR:
+        _AL_ACERTAR[label](question, respuesta)
+    return respuesta, True
+
+
+def _cachear(label: str, question: str, respuesta: str) -> None:
+    if respuesta and not respuesta.startswith("⚠️"):
+        semantic_cache.store(question, label, respuesta)
+
+
+def _en_sesion(session_id: str | None, fn, *args):
+    with use_session(session_id):
+        return fn(*args)
+
+
+def responder_pregunta(
+    question: str,
+    session_id: str | None = None,
+) -> Respuesta:
+    """
+    Orquesta la respuesta:
+    • si llega `doc_text` lo registra y marca como documento activo.
+    • detecta intención → llama herramienta adecuada.
+    Historial, documento activo y acciones pendientes son los de
+    `session_id` (memory.get_session_state): sesiones distintas no comparten
+    estado y pueden atenderse a la vez.
+    Devuelve Respuesta(answer, intent, confidence, source): quien registre
+    feedback usa `intent` y `source` en lugar de volver a clasificar.
+    """
+
+    with use_session(session_id):
+        # 3) Detectar intención con el router
+        label, confidence, source, msg = _clasificar(question)
+        # 3) Llama a la tool (o reutiliza una respuesta a una pregunta equivalente)
+        respuesta, cacheable = _buscar_en_cache(label, question, msg)
+        if respuesta is None:
+            respuesta = TOOL_MAP[label](msg)
+            if cacheable:
+                _cachear(label, question, respuesta)
+        # 5) Guardar en memoria de conversación
+        _guardar(label, question, respuesta)
+    return Respuesta(respuesta, label, confidence, source)
+
+async def responder_pregunta_astream(question: str,
+                                     info: dict | None = None,
+                                     session_id: str | None = None) -> AsyncIterator[str]:
+    """
+    Versión asíncrona para /qa/stream. Todo lo bloqueante (router, FAISS,
+    SQL, tools sin streaming) corre en el executor por defecto del loop;
+    las tools de STREAM_TOOL_MAP emiten tokens según los genera el LLM y
+    el resto emite su respuesta completa en un único fragmento. Cada paso
+    bloqueante corre en el hilo con la sesión `session_id` fijada.
+    Si se pasa `info`, antes del primer fragmento se rellena con la
+    clasificación usada: {"intent", "confidence", "source"}.
+    """
+    def _hilo(fn, *args):
+        return asyncio.to_thread(_en_sesion, session_id, fn, *args)
+
+    label, confidence, source, msg = await _hilo(_clasificar, question)
+    if info is not None:
+        info.update(intent=label, confidence=confidence, source=source)
+    cached, cacheable = await _hilo(_buscar_en_cache, label, question, msg)
+    if cached is not None:
+        respuesta = cached
+        yield respuesta
+    elif label in STREAM_TOOL_MAP:
+        partes = []
+        async for token in STREAM_TOOL_MAP[label](msg):
+            partes.append(token)
+            yield token
+        respuesta = "".join(partes).strip()
+    else:
+        respuesta = await _hilo(TOOL_MAP[label], msg)
+        yield respuesta
+    if cached is None and cacheable:
+        await _hilo(_cachear, label, question, respuesta)
+    await _hilo(_guardar, label, question, respuesta)
@@ -0,0 +1,154 @@
+"""
+ann_index.py
+------------
+Índices aproximados (ANN) para index_cases + informe recall/latencia.
+
+• make_index()          → IndexFlatL2 | IVF-Flat | IVF-PQ | HNSW según config
+• build_from_vectors()  → entrena (si aplica) y añade los vectores en orden,
+                          de modo que index_to_docstore_id sigue siendo válido
+• apply_search_params() → fija nprobe / efSearch tras cargar un índice
+• recall_report()       → compara contra el índice plano (ground truth)
+• holdout_report()      → recall_report con consultas fuera del índice
+
+Todos usan métrica L2 sobre vectores normalizados, igual que el índice
+plano actual, así que los umbrales de distancia (SIM_THRESHOLD_est, …)
+siguen teniendo el mismo significado.
+"""
+
+from __future__ import annotations
+import time
+from typing import Dict, List, Sequence
+
+import faiss
+import numpy as np
+
+from config import (
+    CASES_INDEX_TYPE, IVF_NLIST, IVF_NPROBE, PQ_M, PQ_NBITS,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, ANN_TRAIN_SAMPLE,
+)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def make_index(d: int, kind: str = CASES_INDEX_TYPE, n_vectors: int | None = None) -> faiss.Index:
+    """Crea un índice vacío del tipo indicado (sin entrenar)."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice desconocido: {kind!r} (usa {INDEX_TYPES})")
+    if kind == "flat":
+        return faiss.IndexFlatL2(d)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    # IVF: k-means necesita ~39 puntos por centroide para entrenar bien
+    nlist = IVF_NLIST
+    if n_vectors:
+        nlist = max(1, min(nlist, n_vectors // 39))
+    quantizer = faiss.IndexFlatL2(d)
+    if kind == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_L2)
+    return faiss.IndexIVFPQ(quantizer, d, nlist, PQ_M, PQ_NBITS)
+
+
+def apply_search_params(index: faiss.Index,
+                        nprobe: int = IVF_NPROBE,
+                        ef_search: int = HNSW_EF_SEARCH) -> faiss.Index:
+    """Ajusta los parámetros de búsqueda (no-op para IndexFlat)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Devuelve todos los vectores de un índice plano (en orden de id)."""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_from_vectors(xb: np.ndarray, kind: str = CASES_INDEX_TYPE) -> faiss.Index:
+    """Entrena (muestra de ANN_TRAIN_SAMPLE) y añade xb conservando el orden."""
+    xb = np.ascontiguousarray(xb, dtype="float32")
+    n, d = xb.shape
+    index = make_index(d, kind, n_vectors=n)
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample = xb if n <= ANN_TRAIN_SAMPLE else xb[rng.choice(n, ANN_TRAIN_SAMPLE, replace=False)]
+        t0 = time.perf_counter()
+        index.train(sample)
+        print(f"   · entrenado {kind} con {len(sample)} vectores en {time.perf_counter()-t0:.1f}s")
+    index.add(xb)
+    return apply_search_params(index)
+
+
+# ───────────────────── informe recall vs latencia ─────────────────────
+def _timed_search(index: faiss.Index, xq: np.ndarray, k: int):
+    """Búsqueda consulta a consulta (como en producción). Devuelve (I, ms/consulta)."""
+    ids = np.empty((len(xq), k), dtype="int64")
+    t0 = time.perf_counter()
+    for i in range(len(xq)):
+        _, ids[i] = index.search(xq[i : i + 1], k)
+    return ids, (time.perf_counter() - t0) * 1000 / len(xq)
+
+
+def _recall(gt: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(g) & set(f)) for g, f in zip(gt, found))
+    return hits / gt.size
+
+
+def recall_report(flat: faiss.Index, ann: faiss.Index, xq: np.ndarray, k: int = 10,
+                  nprobes: Sequence[int] = (1, 4, 8, 16, 32, 64, 128),
+                  ef_searches: Sequence[int] = (16, 32, 64, 128, 256)) -> List[Dict]:
+    """
+    Recall@k del índice ANN respecto al plano para distintos nprobe /
+    efSearch, junto con la latencia media por consulta.
+    """
+    xq = np.ascontiguousarray(xq, dtype="float32")
+    gt, flat_ms = _timed_search(flat, xq, k)
+    rows = [{"indice": "flat", "param": "-", "recall": 1.0, "ms_consulta": flat_ms}]
+
+    ivf = faiss.try_extract_index_ivf(ann)
+    if ivf is not None:
+        for p in nprobes:
+            if p > ivf.nlist:
+                break
+            ivf.nprobe = p
+            found, ms = _timed_search(ann, xq, k)
+            rows.append({"indice": "ivf", "param": f"nprobe={p}",
+                         "recall": _recall(gt, found), "ms_consulta": ms})
+    elif isinstance(ann, faiss.IndexHNSW):
+        for ef in ef_searches:
+            ann.hnsw.efSearch = max(ef, k)
+            found, ms = _timed_search(ann, xq, k)
+            rows.append({"indice": "hnsw", "param": f"efSearch={ef}",
+                         "recall": _recall(gt, found), "ms_consulta": ms})
+
+    apply_search_params(ann)          # restaura los valores de config
+    return rows
+
+
+def holdout_report(xb: np.ndarray, kind: str, k: int = 10, n_queries: int = 500,
+                   seed: int = 0) -> List[Dict]:
+    """
+    recall_report con consultas que no están indexadas: se apartan
+    `n_queries` vectores y el plano y el ANN de referencia se construyen con
+    el resto. Una consulta que es a la vez vector de la base se encuentra a
+    distancia 0 y dispara el recall (sobre todo con IVF, que la busca en su
+    propia celda).
+    """
+    xb = np.ascontiguousarray(xb, dtype="float32")
+    n = len(xb)
+    rng = np.random.default_rng(seed)
+    held = np.zeros(n, dtype=bool)
+    held[rng.choice(n, min(n_queries, n // 2), replace=False)] = True
+    rest = xb[~held]
+    return recall_report(build_from_vectors(rest, "flat"), build_from_vectors(rest, kind),
+                         xb[held], k=k)
+
+
+def print_report(rows: List[Dict], k: int) -> None:
+    print(f"\n{'índice':<8} {'parámetro':<14} {'recall@'+str(k):>10} {'ms/consulta':>12}")
+    for r in rows:
+        print(f"{r['indice']:<8} {r['param']:<14} {r['recall']:>10.3f} {r['ms_consulta']:>12.2f}")
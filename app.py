@@ -5,10 +5,19 @@ import uuid
 
 from agent import responder_pregunta       # acepta (session_id, question, files)
 from feedback_logger import log_interaction
-from router import detect_intent
+import vectorstore
 
 st.set_page_config(page_title="Asistente Judicial")
 
+
+@st.cache_resource
+def _warmup_indexes():
+    # Una sola vez por proceso; los reruns no vuelven a esperar a FAISS
+    vectorstore.warmup(background=True)
+    return True
+
+_warmup_indexes()
+
 # ───────────── estado de sesión ─────────────
 if "history" not in st.session_state:
     st.session_state.history = []
@@ -57,8 +66,8 @@ if query:
         st.markdown(query)
 
     # Llamar al agente con session_id y lista de archivos (o None)
-    answer = responder_pregunta(
-        question=query
+    answer, intent, _, source = responder_pregunta(
+        question=query, session_id=session_id
     )
 
     # Mostrar respuesta + feedback
@@ -66,10 +75,10 @@ if query:
         st.markdown(answer)
         c1, c2, c3 = st.columns(3)
         if c1.button("👍 Acepta", key=f"ok_{len(st.session_state.history)}"):
-            log_interaction(query, answer, detect_intent(query), "Acepta")
+            log_interaction(query, answer, intent, "Acepta", intent_source=source)
         if c2.button("🤷 Parcial", key=f"mid_{len(st.session_state.history)}"):
-            log_interaction(query, answer, detect_intent(query), "Parcial")
+            log_interaction(query, answer, intent, "Parcial", intent_source=source)
         if c3.button("👎 Rechaza", key=f"bad_{len(st.session_state.history)}"):
-            log_interaction(query, answer, detect_intent(query), "Rechaza")
+            log_interaction(query, answer, intent, "Rechaza", intent_source=source)
 
     st.session_state.history.append((query, answer))
@@ -0,0 +1,299 @@
+"""
+bm25_sparse.py
+--------------
+Backend BM25 nativo (NumPy / SciPy) alternativo a Whoosh.
+
+• Vocabulario término → id y matriz CSR término × documento con el peso
+  BM25 ya calculado:  idf(t) · tf·(k1+1) / (tf + k1·(1 − b + b·dl/avgdl)).
+  Puntuar una consulta es sumar las filas de sus términos.
+• Indexa el texto completo (sin el recorte de 10 000 caracteres de Whoosh)
+  y sin iterrows: tokenización por columna.
+• Persistido como .npy en BM25_SPARSE_DIR y abierto con mmap_mode="r":
+  cargar el índice no copia las postings a RAM.
+• search(q, k)            → [(DocumentID, score)]
+  search_batch([q…], k)   → una lista por consulta (Q · W en una sola
+                            multiplicación dispersa)
+  search_ids(ident, k)    → coincidencia exacta NUC / NumeroTramite / IdDocumento
+
+Selección del backend: BM25_BACKEND=sparse (ver bm25_store).
+
+    python bm25_sparse.py build    → construye desde el Excel de casos
+    python bm25_sparse.py bench    → build + latencia vs Whoosh
+"""
+
+from __future__ import annotations
+import json, re, shutil, sys, threading, time, unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from config import BM25_SPARSE_DIR, BM25_K1, BM25_B, BM25_RELOAD_CHECK
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOP = frozenset("""
+a al algo como con de del desde donde el ella en entre es esta este fue ha la las
+le lo los mas no o para pero por que se si sin sobre su sus un una y ya
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sin tildes, sin stopwords ni tokens de un carácter."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in _TOKEN.findall(text) if len(t) > 1 and t not in _STOP]
+
+
+def _norm_id(value) -> str:
+    if value is None or value != value:           # None / NaN
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().lower()
+
+
+class SparseBM25:
+    def __init__(self, vocab: Dict[str, int], indptr, indices, data, doc_ids,
+                 ids_map: Dict[str, List[int]], meta: dict):
+        self.vocab = vocab
+        self.indptr, self.indices, self.data = indptr, indices, data
+        self.doc_ids = doc_ids
+        self.ids_map = ids_map
+        self.meta = meta
+        self._W = None                             # scipy.sparse, bajo demanda
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_ids)
+
+    # ───────────────────── construcción ─────────────────────
+    @classmethod
+    def build(cls, doc_ids: Sequence[int], texts: Iterable[str],
+              ids: Dict[str, Sequence] | None = None,
+              k1: float = BM25_K1, b: float = BM25_B) -> "SparseBM25":
+        vocab: Dict[str, int] = {}
+        rows: List[np.ndarray] = []                # term id por posting
+        cols: List[np.ndarray] = []                # nº de documento
+        tfs: List[np.ndarray] = []
+        dl = np.zeros(len(doc_ids), dtype="float32")
+        for d, text in enumerate(texts):
+            counts = Counter(tokenize(text or ""))
+            if not counts:
+                continue
+            dl[d] = sum(counts.values())
+            rows.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in counts),
+                                    dtype="int32", count=len(counts)))
+            cols.append(np.full(len(counts), d, dtype="int32"))
+            tfs.append(np.fromiter(counts.values(), dtype="float32", count=len(counts)))
+
+        n_docs, n_terms = len(doc_ids), len(vocab)
+        t = np.concatenate(rows) if rows else np.empty(0, "int32")
+        d = np.concatenate(cols) if cols else np.empty(0, "int32")
+        tf = np.concatenate(tfs) if tfs else np.empty(0, "float32")
+
+        avgdl = float(dl.mean()) if n_docs else 0.0
+        df = np.bincount(t, minlength=n_terms).astype("float32")
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype("float32")
+        norm = k1 * (1 - b + b * dl[d] / max(avgdl, 1e-9))
+        w = idf[t] * tf * (k1 + 1) / (tf + norm)
+
+        # CSR término-mayor: orden estable por término
+        order = np.argsort(t, kind="stable")
+        indptr = np.zeros(n_terms + 1, dtype="int64")
+        np.cumsum(np.bincount(t, minlength=n_terms), out=indptr[1:])
+
+        ids_map: Dict[str, List[int]] = {}
+        for field_values in (ids or {}).values():
+            for i, v in enumerate(field_values):
+                key = _norm_id(v)
+                if key:
+                    ids_map.setdefault(key, []).append(i)
+
+        meta = {"k1": k1, "b": b, "avgdl": avgdl, "n_docs": n_docs, "n_terms": n_terms}
+        return cls(vocab, indptr, d[order], w[order].astype("float32"),
+                   np.asarray(doc_ids, dtype="int64"), ids_map, meta)
+
+    # ───────────────────── persistencia ─────────────────────
+    def save(self, path: Path | str = BM25_SPARSE_DIR) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+        for name in ("indptr", "indices", "data", "doc_ids"):
+            np.save(tmp / f"{name}.npy", np.asarray(getattr(self, name)))
+        with open(tmp / "vocab.json", "w", encoding="utf-8") as fh:
+            json.dump(self.vocab, fh, ensure_ascii=False)
+        with open(tmp / "ids.json", "w", encoding="utf-8") as fh:
+            json.dump(self.ids_map, fh, ensure_ascii=False)
+        with open(tmp / "meta.json", "w", encoding="utf-8") as fh:   # último: marca de versión
+            json.dump(self.meta, fh)
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Path | str = BM25_SPARSE_DIR) -> "SparseBM25":
+        path = Path(path)
+        if not (path / "meta.json").exists():
+            raise RuntimeError("Índice BM25 disperso no construido. Ejecuta build_bm25().")
+        arr = {n: np.load(path / f"{n}.npy", mmap_mode="r")
+               for n in ("indptr", "indices", "data", "doc_ids")}
+        with open(path / "vocab.json", "r", encoding="utf-8") as fh:
+            vocab = json.load(fh)
+        with open(path / "ids.json", "r", encoding="utf-8") as fh:
+            ids_map = json.load(fh)
+        with open(path / "meta.json", "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        return cls(vocab, arr["indptr"], arr["indices"], arr["data"], arr["doc_ids"],
+                   ids_map, meta)
+
+    # ───────────────────── consulta ─────────────────────
+    def _term_ids(self, query: str) -> List[int]:
+        return [self.vocab[t] for t in tokenize(query) if t in self.vocab]
+
+    def _topk(self, scores: np.ndarray, cand: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """cand: nº de documento de cada score (>0)."""
+        if len(scores) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            scores, cand = scores[part], cand[part]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(self.doc_ids[cand[i]]), float(scores[i])) for i in order]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        terms = self._term_ids(query)
+        if not terms or self.n_docs == 0:
+            return []
+        spans = [(int(self.indptr[t]), int(self.indptr[t + 1])) for t in terms]
+        idx = np.concatenate([self.indices[a:b] for a, b in spans])
+        w = np.concatenate([self.data[a:b] for a, b in spans])
+        acc = np.bincount(idx, weights=w, minlength=self.n_docs)
+        cand = np.flatnonzero(acc)
+        return self._topk(acc[cand], cand, k)
+
+    def _matrix(self):
+        if self._W is None:
+            from scipy.sparse import csr_matrix
+            self._W = csr_matrix((self.data, self.indices, self.indptr),
+                                 shape=(len(self.indptr) - 1, self.n_docs), copy=False)
+        return self._W
+
+    def search_batch(self, queries: Sequence[str], k: int = 10) -> List[List[Tuple[int, float]]]:
+        """Puntúa todas las consultas en una sola multiplicación Q · W."""
+        from scipy.sparse import csr_matrix
+
+        rows, cols = [], []
+        for i, q in enumerate(queries):
+            for t in self._term_ids(q):
+                rows.append(i)
+                cols.append(t)
+        if not rows or self.n_docs == 0:
+            return [[] for _ in queries]
+        Q = csr_matrix((np.ones(len(rows), dtype="float32"), (rows, cols)),
+                       shape=(len(queries), len(self.indptr) - 1))
+        S = (Q @ self._matrix()).tocsr()
+        out = []
+        for i in range(len(queries)):
+            a, b = S.indptr[i], S.indptr[i + 1]
+            out.append(self._topk(S.data[a:b], S.indices[a:b], k) if b > a else [])
+        return out
+
+    def search_ids(self, ident: str, k: int = 10) -> List[Tuple[int, float]]:
+        return [(int(self.doc_ids[i]), 1.0) for i in self.ids_map.get(_norm_id(ident), [])[:k]]
+
+
+# ───────────────────── instancia del proceso ─────────────────────
+_INDEX: SparseBM25 | None = None
+_VERSION = None
+_CHECKED = 0.0
+_LOCK = threading.Lock()
+
+
+def get_index() -> SparseBM25:
+    """Índice cargado (mmap); se recarga si meta.json cambió en disco."""
+    global _INDEX, _VERSION, _CHECKED
+    now = time.monotonic()
+    if _INDEX is not None and now - _CHECKED < BM25_RELOAD_CHECK:
+        return _INDEX
+    with _LOCK:
+        _CHECKED = now
+        meta = Path(BM25_SPARSE_DIR) / "meta.json"
+        version = meta.stat().st_mtime_ns if meta.exists() else None
+        if _INDEX is None or version != _VERSION:
+            _INDEX = SparseBM25.load()
+            _VERSION = version
+    return _INDEX
+
+
+def build_from_df(df, path: Path | str = BM25_SPARSE_DIR) -> SparseBM25:
+    """Construye desde el DataFrame de casos (IdDocumento, textoPDF, NUC, NumeroTramite)."""
+    ix = SparseBM25.build(
+        df["IdDocumento"].astype("int64").tolist(),
+        df["textoPDF"].fillna("").astype(str).tolist(),
+        ids={"NUC": df["NUC"].tolist(), "NumeroTramite": df["NumeroTramite"].tolist(),
+             "IdDocumento": df["IdDocumento"].astype("int64").tolist()},
+    )
+    ix.save(path)
+    return ix
+
+
+# ───────────────────── benchmark vs Whoosh ─────────────────────
+def benchmark(n_queries: int = 200, k: int = 10) -> None:
+    import random, tempfile
+    import pandas as pd
+    import bm25_store
+    from build_index import FILE_CASES
+
+    df = pd.read_excel(FILE_CASES)
+    df["textoPDF"] = df["textoPDF"].fillna("")
+    tmp = Path(tempfile.mkdtemp(prefix="bm25bench_"))
+    try:
+        t0 = time.perf_counter()
+        sparse = build_from_df(df, tmp / "sparse")
+        t_sparse = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        bm25_store.build_whoosh(df, tmp / "whoosh")
+        t_whoosh = time.perf_counter() - t0
+        pool = bm25_store.SearcherPool(tmp / "whoosh")
+
+        rnd = random.Random(0)
+        words = [w for w in sparse.vocab if len(w) > 3]
+        queries = [" ".join(rnd.sample(words, rnd.randint(1, 4))) for _ in range(n_queries)]
+
+        def _whoosh(q):
+            with pool.searcher() as s:
+                return [int(r["DocumentID"]) for r in
+                        s.search(bm25_store._PARSER.parse(q), limit=k)]
+
+        t0 = time.perf_counter(); wh = [_whoosh(q) for q in queries]
+        ms_whoosh = 1000 * (time.perf_counter() - t0) / n_queries
+        t0 = time.perf_counter(); sp = [[d for d, _ in sparse.search(q, k)] for q in queries]
+        ms_sparse = 1000 * (time.perf_counter() - t0) / n_queries
+        t0 = time.perf_counter(); sparse.search_batch(queries, k)
+        ms_batch = 1000 * (time.perf_counter() - t0) / n_queries
+        overlap = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(wh, sp)])
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{len(df)} documentos · {n_queries} consultas · top-{k}")
+    print(f"{'backend':<16} {'build s':>9} {'ms/consulta':>12}")
+    print(f"{'whoosh':<16} {t_whoosh:>9.1f} {ms_whoosh:>12.2f}")
+    print(f"{'sparse':<16} {t_sparse:>9.1f} {ms_sparse:>12.2f}")
+    print(f"{'sparse (batch)':<16} {'':>9} {ms_batch:>12.2f}")
+    print(f"solape top-{k} whoosh↔sparse: {overlap:.1%} "
+          "(whoosh sólo indexa los primeros 10 000 caracteres)")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "bench"
+    if cmd == "build":
+        import pandas as pd
+        from build_index import FILE_CASES
+        df = pd.read_excel(FILE_CASES)
+        ix = build_from_df(df)
+        print(f"✓ BM25 disperso: {ix.n_docs} docs · {ix.meta['n_terms']} términos en {BM25_SPARSE_DIR}")
+    else:
+        benchmark()
@@ -6,59 +6,194 @@ bm25_store.py
 Se basa en Whoosh (puro-Python, sin dependencias de system-libraries),
 ideal mientras sigas trabajando sólo con archivos Excel locales.
 
-• build_bm25()   → crea o carga un índice Whoosh en DATA_DIR / bm25.idx
-• search_bm25(q) → devuelve lista de (DocumentID, score) top-k
+• build_bm25()           → crea o carga un índice Whoosh en DATA_DIR / bm25.idx
+• search_bm25(q)         → devuelve lista de (DocumentID, score) top-k
+• search_bm25_ids(ident) → coincidencia exacta por NUC / NumeroTramite /
+                           IdDocumento (campos ID, en minúsculas)
+
+Las búsquedas reutilizan un índice abierto y un pool de searchers
+(SearcherPool) que se refresca sólo cuando cambia la generación del índice;
+las consultas parseadas van a un LRU y los resultados a una caché TTL
+indexada por generación, así que un rebuild nunca sirve resultados viejos.
+
+BM25_BACKEND=sparse sustituye Whoosh por bm25_sparse (NumPy/SciPy, texto
+completo, consultas por lotes) con la misma interfaz.
 
 Si luego migras a Elasticsearch / OpenSearch bastará con reemplazar
 estas dos funciones sin tocar el resto del código.
 """
 
-import os
+import os, queue, threading, time
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple
 
 import pandas as pd
 from whoosh import index
 from whoosh.fields import ID, TEXT, Schema
-from whoosh.qparser import MultifieldParser
+from whoosh.qparser import FieldsPlugin, MultifieldParser, OrGroup, WildcardPlugin
+from whoosh.query import Or, Term
 
-from config import DATA_DIR
+from config import (DATA_DIR, BM25_BACKEND, BM25_RELOAD_CHECK, BM25_QUERY_CACHE_SIZE,
+                    BM25_RESULT_CACHE_SIZE, BM25_RESULT_CACHE_TTL)
+from ttl_cache import TTLCache
 
 BM25_DIR = DATA_DIR / "bm25.idx"
 SCHEMA = Schema(
     DocumentID=ID(stored=True, unique=True),
+    NUC=ID(stored=True),
+    NumeroTramite=ID(stored=True),
     texto=TEXT(stored=False, phrase=True),
 )
+ID_FIELDS = ("NUC", "NumeroTramite", "DocumentID")
+
+
+def norm_id(value) -> str:
+    """Forma canónica de los identificadores en los campos ID."""
+    if value is None or pd.isna(value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().lower()
 
 
 def build_bm25(df: pd.DataFrame) -> None:
-    """Construye el índice BM25 o lo actualiza si ya existe."""
-    if not BM25_DIR.exists():
-        os.makedirs(BM25_DIR, exist_ok=True)
-        ix = index.create_in(BM25_DIR, SCHEMA)
+    """Construye el índice del backend activo (BM25_BACKEND)."""
+    if BM25_BACKEND == "sparse":
+        from bm25_sparse import build_from_df, BM25_SPARSE_DIR
+        ix = build_from_df(df)
+        print(f"✓ BM25 disperso listo en {BM25_SPARSE_DIR} ({ix.n_docs} docs)")
+    else:
+        build_whoosh(df)
+
+
+def build_whoosh(df: pd.DataFrame, path: Path = BM25_DIR) -> None:
+    """Construye el índice Whoosh o lo actualiza si ya existe."""
+    if not Path(path).exists() or not index.exists_in(path):
+        os.makedirs(path, exist_ok=True)
+        ix = index.create_in(path, SCHEMA)
     else:
-        ix = index.open_dir(BM25_DIR)
+        ix = index.open_dir(path)
+        if set(ix.schema.names()) != set(SCHEMA.names()):   # esquema anterior: recrear
+            ix = index.create_in(path, SCHEMA)
 
     writer = ix.writer()
     for _, row in df.iterrows():
         writer.update_document(
             DocumentID=str(int(row["IdDocumento"])),
+            NUC=norm_id(row.get("NUC")),
+            NumeroTramite=norm_id(row.get("NumeroTramite")),
             texto=row["textoPDF"][:10_000],  # límite razonable
         )
     writer.commit()
-    print("✓ BM25 index listo en", BM25_DIR)
+    print("✓ BM25 index listo en", path)
+
+
+# ───────────── buscadores persistentes (reutilizados entre consultas) ─────────────
+class SearcherPool:
+    """
+    Mantiene abierto el índice y un pool de Searcher (uno por hilo en uso;
+    un Searcher de Whoosh no debe compartirse entre hilos). Cada
+    BM25_RELOAD_CHECK s se compara la generación del índice en disco y, si
+    cambió (build_bm25), los searchers se refrescan al devolverse.
+    """
+
+    def __init__(self, path=BM25_DIR):
+        self.path = path
+        self._ix = None
+        self._generation = -1
+        self._checked = 0.0
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _index(self):
+        if self._ix is None:
+            with self._lock:
+                if self._ix is None:
+                    if not Path(self.path).exists():
+                        raise RuntimeError("BM25 index no construido. Ejecuta build_bm25().")
+                    self._ix = index.open_dir(self.path)
+                    self._generation = self._ix.latest_generation()
+                    self._checked = time.monotonic()
+        return self._ix
+
+    @property
+    def generation(self) -> int:
+        ix = self._index()
+        now = time.monotonic()
+        if now - self._checked > BM25_RELOAD_CHECK:
+            self._checked = now
+            self._generation = ix.latest_generation()
+        return self._generation
+
+    @contextmanager
+    def searcher(self):
+        ix = self._index()
+        gen = self.generation
+        try:
+            s, s_gen = self._idle.get_nowait()
+            if s_gen != gen:
+                fresh = s.refresh()              # nuevo Searcher si el índice cambió
+                if fresh is not s:
+                    s.close()                    # libera lectores y ficheros de segmentos viejos
+                    s = fresh
+                s_gen = gen
+        except queue.Empty:
+            s, s_gen = ix.searcher(), gen
+        try:
+            yield s
+        finally:
+            self._idle.put((s, s_gen))
+
+
+_POOL = SearcherPool()
+# Texto libre: OR entre términos (con AND una pregunta larga casi nunca
+# encuentra nada) y sin sintaxis de campo/comodín para "?", "*" y ":"
+_PARSER = MultifieldParser(["texto"], schema=SCHEMA, group=OrGroup)
+_PARSER.remove_plugin_class(WildcardPlugin)
+_PARSER.remove_plugin_class(FieldsPlugin)
+# (generación, tipo, consulta, k) → resultados
+_RESULTS = TTLCache(maxsize=BM25_RESULT_CACHE_SIZE, ttl=BM25_RESULT_CACHE_TTL)
+
+
+@lru_cache(maxsize=BM25_QUERY_CACHE_SIZE)
+def _parse(query: str):
+    return _PARSER.parse(query)
+
+
+@lru_cache(maxsize=BM25_QUERY_CACHE_SIZE)
+def _ids_query(ident: str):
+    return Or([Term(f, ident) for f in ID_FIELDS])
+
+
+def _search(kind: str, q, key: str, k: int) -> List[Tuple[int, float]]:
+    cache_key = (_POOL.generation, kind, key, k)
+    hit = _RESULTS.get(cache_key)
+    if hit is not None:
+        return hit
+    with _POOL.searcher() as s:
+        results = s.search(q, limit=k)
+        out = [(int(r["DocumentID"]), r.score) for r in results]
+    _RESULTS.set(cache_key, out)
+    return out
 
 
 def search_bm25(
     query: str, k: int = 10
 ) -> List[Tuple[int, float]]:
-    """Busca en el índice Whoosh y devuelve (DocumentID, score)."""
-    if not BM25_DIR.exists():
-        raise RuntimeError("BM25 index no construido. Ejecuta build_bm25().")
-
-    ix = index.open_dir(BM25_DIR)
-    with ix.searcher() as s:
-        parser = MultifieldParser(["texto"], schema=SCHEMA)
-        q = parser.parse(query)
-        results = s.search(q, limit=k)
-        return [(int(r["DocumentID"]), r.score) for r in results]
+    """Busca en el índice BM25 y devuelve (DocumentID, score)."""
+    if BM25_BACKEND == "sparse":
+        from bm25_sparse import get_index
+        return get_index().search(query, k)
+    return _search("texto", _parse(query), query, k)
+
+
+def search_bm25_ids(ident: str, k: int = 10) -> List[Tuple[int, float]]:
+    """(DocumentID, score) de los documentos cuyo NUC / NumeroTramite /
+    IdDocumento coincide exactamente con `ident`."""
+    ident = norm_id(ident)
+    if BM25_BACKEND == "sparse":
+        from bm25_sparse import get_index
+        return get_index().search_ids(ident, k)
+    return _search("ids", _ids_query(ident), ident, k)
@@ -31,20 +31,29 @@
 # print(f"✅ index_cases guardado ({len(docs_cases)} chunks)")
 #
 
-# build_index.py  — BLOQUE NUEVO para index_laws
-# ------------------------------------------------
-from pathlib import Path
 # build_index.py  — BLOQUE CORREGIDO para index_laws
 # --------------------------------------------------
+#   python build_index.py                        → index_laws (como siempre)
+#   python build_index.py --cases-ann hnsw       → index_cases aproximado
+#   python build_index.py --cases-ann ivf_pq --report
+#                                                  (+ recall/latencia vs plano)
+#   python build_index.py --incremental          → index_laws sólo con cambios
+#   python build_index.py --cases --incremental  → index_cases sólo con cambios
+import argparse, shutil
 from pathlib import Path
 import pandas as pd
 from langchain.schema import Document
 from langchain_community.vectorstores import FAISS
-from config import DATA_DIR, INDEX_DIR, CHUNK_SIZE, CHUNK_OVERLAP
+from config import DATA_DIR, INDEX_DIR, CHUNK_SIZE, CHUNK_OVERLAP, CASES_INDEX_TYPE
 from embed import get_embeddings
+import ann_index
+from incremental_index import update_index, save_atomic
+
+FILE_CASES = DATA_DIR / "output (1).xlsx"
 
 INDEX_LAWS = INDEX_DIR / "index_laws"
-INDEX_LAWS.mkdir(parents=True, exist_ok=True)
+INDEX_CASES = INDEX_DIR / "index_cases"
+INDEX_CASES_FLAT = INDEX_DIR / "index_cases_flat"   # copia exacta (fuente + ground truth)
 
 # ---------- helpers ----------
 def _split_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
@@ -64,41 +73,137 @@ def _chunks_from_records(records: list[dict]):
                                  metadata={**base, "ChunkID": idx}))
     return docs
 
-# ---------- 1. Constitución ----------
-df_const = pd.read_csv(DATA_DIR / "constitucion.csv")
-records_const = [
-    {
-        "text": row["ArticuloContenido"],
-        "metadata": {"articulo": int(row["ArticuloNo"]),
-                     "fuente": "constitucion"},
-    }
-    for _, row in df_const.iterrows()
-    if pd.notna(row["ArticuloContenido"])
-]
-
-# ---------- 2. Criterios ----------
-keep = [
-    "ID","ItemID","Materia","Asunto","Categoria","SubCategoria","TipoDesicion",
-    "Relevancia","RefRelevancia","BaseLegal","PalabrasClaves","NumDesicion",
-    "FechaDoc","NumBoletin",
-]
-df_crit = pd.read_csv(DATA_DIR / "Criterios.csv", usecols=keep + ["Título","Resena"])
-records_crit = []
-for _, row in df_crit.iterrows():
-    if pd.isna(row["Título"]) and pd.isna(row["Resena"]):
-        continue
-    texto = f"{row['Título'] or ''}. {row['Resena'] or ''}"
-    meta  = {k: row[k] for k in keep}
-    meta["fuente"] = "criterio"
-    records_crit.append({"text": texto, "metadata": meta})
-
-# ---------- 3. Chunkear y embebir ----------
-docs = _chunks_from_records(records_const + records_crit)
-
-idx_laws = FAISS.from_documents(
-    docs,
-    embedding=get_embeddings("laws"),
-    normalize_L2=True,
-)
-idx_laws.save_local(str(INDEX_LAWS))
-print(f"✅ index_laws guardado ({len(docs)} chunks)")
+def _laws_documents() -> list[Document]:
+    # ---------- 1. Constitución ----------
+    df_const = pd.read_csv(DATA_DIR / "constitucion.csv")
+    records_const = [
+        {
+            "text": row["ArticuloContenido"],
+            "metadata": {"articulo": int(row["ArticuloNo"]),
+                         "fuente": "constitucion"},
+        }
+        for _, row in df_const.iterrows()
+        if pd.notna(row["ArticuloContenido"])
+    ]
+
+    # ---------- 2. Criterios ----------
+    keep = [
+        "ID","ItemID","Materia","Asunto","Categoria","SubCategoria","TipoDesicion",
+        "Relevancia","RefRelevancia","BaseLegal","PalabrasClaves","NumDesicion",
+        "FechaDoc","NumBoletin",
+    ]
+    df_crit = pd.read_csv(DATA_DIR / "Criterios.csv", usecols=keep + ["Título","Resena"])
+    records_crit = []
+    for _, row in df_crit.iterrows():
+        if pd.isna(row["Título"]) and pd.isna(row["Resena"]):
+            continue
+        texto = f"{row['Título'] or ''}. {row['Resena'] or ''}"
+        meta  = {k: row[k] for k in keep}
+        meta["fuente"] = "criterio"
+        records_crit.append({"text": texto, "metadata": meta})
+
+    # ---------- 3. Chunkear ----------
+    return _chunks_from_records(records_const + records_crit)
+
+def build_laws(incremental: bool = False) -> None:
+    docs = _laws_documents()
+
+    # ---------- 4. Embebir ----------
+    if incremental:
+        st = update_index(INDEX_LAWS, docs, get_embeddings("laws"))
+        print(f"✅ index_laws actualizado: {st}")
+        return
+
+    INDEX_LAWS.mkdir(parents=True, exist_ok=True)
+    idx_laws = FAISS.from_documents(
+        docs,
+        embedding=get_embeddings("laws"),
+        normalize_L2=True,
+    )
+    idx_laws.save_local(str(INDEX_LAWS))
+    print(f"✅ index_laws guardado ({len(docs)} chunks)")
+
+# ---------- index_cases aproximado (IVF / PQ / HNSW) ----------
+def build_cases_ann(kind: str, report: bool = False, k: int = 10, n_queries: int = 500) -> None:
+    """
+    Reconstruye index_cases con un índice ANN a partir de la versión plana.
+    La primera vez copia index_cases → index_cases_flat, que queda como
+    fuente exacta para futuras reconstrucciones y para el informe.
+    """
+    if not INDEX_CASES_FLAT.exists():
+        shutil.copytree(INDEX_CASES, INDEX_CASES_FLAT)
+    db = FAISS.load_local(str(INDEX_CASES_FLAT), embeddings=get_embeddings(),
+                          allow_dangerous_deserialization=True)
+    xb = ann_index.reconstruct_all(db.index)
+    print(f"▷ {len(xb)} vectores (d={xb.shape[1]}) → {kind}")
+
+    ann = ann_index.build_from_vectors(xb, kind)
+    if report:
+        # consultas apartadas del índice que se mide (ver holdout_report)
+        ann_index.print_report(ann_index.holdout_report(xb, kind, k=k, n_queries=n_queries), k)
+
+    db.index = ann
+    save_atomic(db, INDEX_CASES)
+    print(f"✅ index_cases guardado como {kind} ({ann.ntotal} vectores)")
+
+
+def build_cases_incremental() -> None:
+    """
+    Re-chunkea el Excel de casos y embebe sólo los chunks nuevos/cambiados.
+    Con un índice ANN activo se actualiza la copia plana y luego se
+    regenera el ANN desde ella (reentrenar no requiere re-embeber).
+    El almacén de chunks se escribe en una generación nueva que sólo se
+    publica si la actualización del índice termina bien: los lectores nunca
+    ven el blob a medio escribir ni desfasado respecto al índice.
+    """
+    from chunker import make_chunks
+    from chunk_store import chunk_store
+
+    df_cases = pd.read_excel(FILE_CASES)
+    df_cases["textoPDF"] = df_cases["textoPDF"].fillna("")
+    ann = CASES_INDEX_TYPE != "flat"
+    if ann and not INDEX_CASES_FLAT.exists() and INDEX_CASES.exists():
+        shutil.copytree(INDEX_CASES, INDEX_CASES_FLAT)
+    with chunk_store.rebuilding() as store:
+        docs_cases = make_chunks(df_cases, store)
+        st = update_index(INDEX_CASES_FLAT if ann else INDEX_CASES, docs_cases, get_embeddings())
+    print(f"✅ index_cases actualizado: {st}")
+    if ann and (st["nuevos"] or st["modificados"] or st["eliminados"]):
+        build_cases_ann(CASES_INDEX_TYPE)
+
+
+def build_bm25_cases() -> None:
+    """Índice léxico de sentencias (texto + campos ID) para hybrid_search."""
+    from bm25_store import build_bm25
+
+    df_cases = pd.read_excel(FILE_CASES)
+    df_cases["textoPDF"] = df_cases["textoPDF"].fillna("")
+    build_bm25(df_cases)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Construye los índices FAISS.")
+    ap.add_argument("--laws", action="store_true", help="(re)construye index_laws")
+    ap.add_argument("--cases", action="store_true",
+                    help="actualiza index_cases desde el Excel (requiere --incremental)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="embebe sólo chunks nuevos o modificados (manifest.json)")
+    ap.add_argument("--cases-ann", choices=ann_index.INDEX_TYPES,
+                    help="reconstruye index_cases con el tipo de índice dado")
+    ap.add_argument("--report", action="store_true",
+                    help="informe recall@k / latencia contra el índice plano")
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--bm25", action="store_true",
+                    help="(re)construye el índice BM25 de sentencias")
+    args = ap.parse_args()
+
+    if args.cases and not args.incremental:
+        ap.error("--cases requiere --incremental")
+    if args.laws or not (args.cases_ann or args.cases or args.bm25):
+        build_laws(incremental=args.incremental)
+    if args.cases:
+        build_cases_incremental()
+    if args.cases_ann:
+        build_cases_ann(args.cases_ann, report=args.report, k=args.k)
+    if args.bm25:
+        build_bm25_cases()
@@ -0,0 +1,145 @@
+"""
+case_catalog.py
+---------------
+Catálogo único de sentencias (Excel de casos) compartido por las tools.
+
+El Excel se convierte una sola vez (y de nuevo sólo si cambia su mtime) a
+CASE_CATALOG_DIR:
+
+    • meta.parquet  → columnas de metadatos (NUC, IdDocumento, Materia, …),
+                      cargadas en memoria al primer uso
+    • text.arrow    → columnas de texto (textoPDF) en Arrow IPC sin
+                      comprimir, abiertas con memory-map: el texto se lee
+                      por fila bajo demanda, sin copiarlo a RAM
+    • source.json   → ruta y mtime del Excel de origen
+
+Uso:
+    from case_catalog import catalog
+    catalog.meta                 → DataFrame de metadatos (una sola copia)
+    catalog.text(pos)            → textoPDF de la fila `pos`
+    catalog.row(pos)             → pd.Series de metadatos + textoPDF
+
+    python case_catalog.py       → fuerza la conversión
+"""
+
+from __future__ import annotations
+import json, os, threading
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from config import DATA_DIR, CASE_CATALOG_DIR
+
+FILE_CASES   = DATA_DIR / "output (1).xlsx"
+TEXT_COLUMNS = ("textoPDF",)
+
+# Alias posibles → nombre estándar (encabezados del Excel varían)
+_ALIAS = {
+    "nuc": "NUC",
+    "numerodecaso": "NUC",
+    "númerodecaso": "NUC",
+    "numeroexpediente": "NUC",
+    "iddocumento": "IdDocumento",
+    "id_documento": "IdDocumento",
+}
+REQUIRED = ["NUC", "IdDocumento", "textoPDF", "Materia", "Asunto", "TipoFallo"]
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip() for c in df.columns]
+    rename_map = {c: _ALIAS[c.lower().replace(" ", "")] for c in df.columns
+                  if c.lower().replace(" ", "") in _ALIAS and c not in REQUIRED}
+    df = df.rename(columns=rename_map)
+    for col in REQUIRED:
+        if col not in df.columns:
+            df[col] = ""
+    return df.reset_index(drop=True)
+
+
+def convert(source: Path = FILE_CASES, out: Path = CASE_CATALOG_DIR) -> None:
+    """Excel → meta.parquet + text.arrow (escritura atómica por fichero)."""
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    df = _normalize(pd.read_excel(source))
+
+    meta = df.drop(columns=list(TEXT_COLUMNS))
+    for c in meta.columns:                       # Parquet no admite object mixto
+        if meta[c].dtype == object:
+            meta[c] = meta[c].where(meta[c].isna(), meta[c].astype(str))
+    # temporales por proceso: dos conversiones simultáneas no se pisan
+    tmp = f".{os.getpid()}.tmp"
+    meta.to_parquet(out / f"meta.parquet{tmp}", index=False)
+
+    text = pa.table({c: pa.array(df[c].fillna("").astype(str), type=pa.large_string())
+                     for c in TEXT_COLUMNS})
+    with pa.OSFile(str(out / f"text.arrow{tmp}"), "wb") as sink:
+        with pa.ipc.new_file(sink, text.schema) as writer:
+            writer.write_table(text)
+
+    os.replace(out / f"meta.parquet{tmp}", out / "meta.parquet")
+    os.replace(out / f"text.arrow{tmp}", out / "text.arrow")
+    with open(out / f"source.json{tmp}", "w", encoding="utf-8") as fh:
+        json.dump({"path": str(source), "mtime_ns": Path(source).stat().st_mtime_ns}, fh)
+    os.replace(out / f"source.json{tmp}", out / "source.json")
+
+
+def _is_fresh(source: Path, out: Path) -> bool:
+    try:
+        with open(out / "source.json", "r", encoding="utf-8") as fh:
+            info = json.load(fh)
+    except (OSError, json.JSONDecodeError):
+        return False
+    if not Path(source).exists():                # sin Excel: se usa lo convertido
+        return (out / "meta.parquet").exists()
+    return info.get("mtime_ns") == Path(source).stat().st_mtime_ns
+
+
+class CaseCatalog:
+    def __init__(self, source: Path = FILE_CASES, root: Path = CASE_CATALOG_DIR):
+        self.source = Path(source)
+        self.root = Path(root)
+        self._meta: Optional[pd.DataFrame] = None
+        self._text: Optional[pa.Table] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._meta is not None:
+                return
+            if not _is_fresh(self.source, self.root):
+                convert(self.source, self.root)
+            self._meta = pd.read_parquet(self.root / "meta.parquet")
+            source = pa.memory_map(str(self.root / "text.arrow"), "r")
+            self._text = pa.ipc.open_file(source).read_all()     # zero-copy sobre el mmap
+
+    @property
+    def meta(self) -> pd.DataFrame:
+        if self._meta is None:
+            self._load()
+        return self._meta
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def text(self, pos: int, column: str = "textoPDF") -> str:
+        if self._text is None:
+            self._load()
+        return self._text.column(column)[int(pos)].as_py() or ""
+
+    def row(self, pos: int) -> pd.Series:
+        """Fila completa (metadatos + textos) por posición."""
+        r = self.meta.iloc[int(pos)].copy()
+        for c in TEXT_COLUMNS:
+            r[c] = self.text(pos, c)
+        return r
+
+
+catalog = CaseCatalog()
+
+
+if __name__ == "__main__":
+    convert()
+    print(f"✓ Catálogo de casos en {CASE_CATALOG_DIR} ({len(CaseCatalog())} filas)")
@@ -0,0 +1,303 @@
+"""
+chunk_store.py
+--------------
+Almacén columnar de chunks en disco (reemplaza DATA_DIR/chunks/*.json).
+
+En lugar de un JSON por chunk se mantienen cuatro archivos en
+CHUNK_STORE_DIR:
+
+    • texts.bin    → blob append-only con el texto UTF-8 de cada chunk
+    • meta.bin     → blob append-only con los metadatos (JSON) de cada chunk
+    • offsets.bin  → registro fijo por chunk (text_off, text_len, meta_off, meta_len)
+    • keys.json    → índice  clave normalizada → [nº de registro, …]
+                     (DocumentID / IdDocumento / NUC / NumeroTramite)
+
+Los blobs se abren con mmap, de modo que `get(clave)` es un lookup en el
+dict de claves + lecturas por offset; no hay carga anticipada de textos.
+
+Generaciones: una regeneración completa se escribe en un subdirectorio
+nuevo (gen-<ns>) y se publica reemplazando de forma atómica el fichero
+CURRENT. Los lectores de otros procesos (API, Streamlit) comparan CURRENT
+y el mtime de keys.json en cada lookup: al cambiar la generación reabren
+los blobs nuevos, y si sólo crecieron (append + flush) recargan las claves.
+Nunca se leen offsets nuevos con números de registro viejos. Sin CURRENT
+(formato anterior) la generación es la propia raíz.
+
+Uso:
+    from chunk_store import chunk_store
+    chunk_store.append(texto, metadata); chunk_store.flush()
+    chunk_store.get("034-2021-econ-00366")      # → [texto_chunk_0, …]
+    with chunk_store.rebuilding() as store:     # regeneración atómica
+        make_chunks(df, store)
+
+Migración desde el formato anterior:
+    python chunk_store.py            # importa DATA_DIR/chunks/*.json
+"""
+
+from __future__ import annotations
+import os, json, mmap, shutil, struct, threading, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import DATA_DIR, CHUNK_STORE_DIR
+
+KEY_FIELDS = ("NUC", "NumeroTramite", "IdDocumento", "DocumentID")
+_REC = struct.Struct("<QIQI")          # text_off, text_len, meta_off, meta_len
+
+
+def norm_key(value) -> str:
+    """Normaliza un identificador igual que el antiguo docs_map de consulta_doc."""
+    return str(value if value is not None else "").lower().lstrip("auto:").strip(" _.,")
+
+
+class _Blob:
+    """Archivo append-only leído vía mmap (se re-mapea si creció)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._size = 0
+
+    def view(self) -> Optional[mmap.mmap]:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size == 0:
+            return None
+        if self._mm is None or size != self._size:
+            self.close()
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._size = size
+        return self._mm
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            self._size = 0
+
+
+def _mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class ChunkStore:
+    def __init__(self, root: Path | str = CHUNK_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._current = self.root / "CURRENT"
+        self._current_sig: Optional[int] = None
+        self._writers = None           # (texts, meta, offsets) abiertos en "ab"
+        self._lock = threading.RLock()
+        self._open(self._generation_dir())
+
+    # ───────────── generación vigente ─────────────
+    def _generation_dir(self) -> Path:
+        self._current_sig = _mtime_ns(self._current)
+        try:
+            name = self._current.read_text(encoding="utf-8").strip()
+        except OSError:
+            return self.root                     # formato anterior: blobs en la raíz
+        return self.root / name if name else self.root
+
+    def _open(self, gen_dir: Path) -> None:
+        """Apunta a los blobs de `gen_dir` (cerrando los de la generación anterior)."""
+        self._close_writers()
+        for blob in getattr(self, "_blobs", ()):
+            blob.close()
+        self.dir = gen_dir
+        self._texts   = _Blob(gen_dir / "texts.bin")
+        self._meta    = _Blob(gen_dir / "meta.bin")
+        self._offsets = _Blob(gen_dir / "offsets.bin")
+        self._blobs = (self._texts, self._meta, self._offsets)
+        self._keys_path = gen_dir / "keys.json"
+        self._keys: Optional[Dict[str, List[int]]] = None
+        self._keys_sig: Optional[int] = None
+
+    def _revalidate(self) -> None:
+        """Otra instancia publicó una generación nueva → reabrir (llamar con el lock)."""
+        if self._writers is None and _mtime_ns(self._current) != self._current_sig:
+            gen_dir = self._generation_dir()
+            if gen_dir != self.dir:
+                self._open(gen_dir)
+
+    # ───────────── índice de claves ─────────────
+    def __len__(self) -> int:
+        p = self._offsets.path
+        return (p.stat().st_size // _REC.size) if p.exists() else 0
+
+    def _load_keys(self) -> Dict[str, List[int]]:
+        with self._lock:
+            self._revalidate()
+            if self._keys is not None and (
+                self._writers is not None or _mtime_ns(self._keys_path) == self._keys_sig
+            ):
+                return self._keys
+            n = len(self)
+            if self._keys_path.exists():
+                sig = _mtime_ns(self._keys_path)
+                with open(self._keys_path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved.get("n") == n:
+                    self._keys, self._keys_sig = saved["keys"], sig
+                    return self._keys
+            # keys.json ausente o desfasado → reconstruir desde meta.bin
+            self._keys, self._keys_sig = {}, _mtime_ns(self._keys_path)
+            for rec_no in range(n):
+                self._index_record(rec_no, self._read_meta(rec_no))
+            return self._keys
+
+    def _index_record(self, rec_no: int, meta: dict) -> None:
+        for field in KEY_FIELDS:
+            k = norm_key(meta.get(field, ""))
+            if k:
+                recs = self._keys.setdefault(k, [])
+                if not recs or recs[-1] != rec_no:
+                    recs.append(rec_no)
+
+    # ───────────── lectura ─────────────
+    def _record(self, rec_no: int) -> Tuple[int, int, int, int]:
+        if self._writers is not None:
+            for f in self._writers:
+                f.flush()
+        return _REC.unpack_from(self._offsets.view(), rec_no * _REC.size)
+
+    def _read_text(self, rec_no: int) -> str:
+        t_off, t_len, _, _ = self._record(rec_no)
+        return self._texts.view()[t_off : t_off + t_len].decode("utf-8")
+
+    def _read_meta(self, rec_no: int) -> dict:
+        _, _, m_off, m_len = self._record(rec_no)
+        return json.loads(self._meta.view()[m_off : m_off + m_len].decode("utf-8"))
+
+    def get(self, key: str, default=None) -> List[str]:
+        """Textos de todos los chunks asociados a la clave (en orden de escritura)."""
+        with self._lock:                 # claves y blobs de la misma generación
+            recs = self._load_keys().get(norm_key(key))
+            if not recs:
+                return [] if default is None else default
+            return [self._read_text(r) for r in recs]
+
+    def get_records(self, key: str) -> List[Tuple[str, dict]]:
+        """Igual que get(), pero devuelve (texto, metadatos) por chunk."""
+        with self._lock:
+            recs = self._load_keys().get(norm_key(key)) or []
+            return [(self._read_text(r), self._read_meta(r)) for r in recs]
+
+    def __contains__(self, key: str) -> bool:
+        return norm_key(key) in self._load_keys()
+
+    def keys(self) -> Iterable[str]:
+        return self._load_keys().keys()
+
+    # ───────────── escritura ─────────────
+    def append(self, text: str, metadata: dict) -> int:
+        """Añade un chunk al final de los blobs. Llama a flush() al terminar."""
+        self._load_keys()
+        t_raw = text.encode("utf-8")
+        m_raw = json.dumps(metadata, ensure_ascii=False, default=str).encode("utf-8")
+        with self._lock:
+            if self._writers is None:
+                self._writers = tuple(
+                    open(b.path, "ab") for b in (self._texts, self._meta, self._offsets)
+                )
+            ft, fm, fo = self._writers
+            t_off, m_off = ft.tell(), fm.tell()
+            ft.write(t_raw)
+            fm.write(m_raw)
+            rec_no = fo.tell() // _REC.size
+            fo.write(_REC.pack(t_off, len(t_raw), m_off, len(m_raw)))
+            self._index_record(rec_no, metadata)
+        return rec_no
+
+    def _close_writers(self) -> None:
+        if self._writers is not None:
+            for f in self._writers:
+                f.close()
+            self._writers = None
+
+    def flush(self) -> None:
+        """Cierra los blobs en escritura y persiste keys.json de forma atómica."""
+        with self._lock:
+            self._close_writers()
+            keys = self._load_keys()
+            tmp = self._keys_path.with_suffix(".json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"n": len(self), "keys": keys}, f, ensure_ascii=False)
+            os.replace(tmp, self._keys_path)
+            self._keys_sig = _mtime_ns(self._keys_path)
+
+    @contextmanager
+    def rebuilding(self):
+        """
+        Almacén vacío en un directorio de generación nuevo; al salir sin error
+        se publica (CURRENT) de forma atómica. Los lectores siguen sirviendo la
+        generación anterior mientras tanto.
+        """
+        gen_dir = self.root / f"gen-{time.time_ns()}"
+        staging = ChunkStore(gen_dir)
+        try:
+            yield staging
+            staging.flush()
+        except BaseException:
+            staging.close()
+            shutil.rmtree(gen_dir, ignore_errors=True)
+            raise
+        staging.close()
+        with self._lock:
+            tmp = self._current.with_name(f"CURRENT.{os.getpid()}.tmp")
+            tmp.write_text(gen_dir.name, encoding="utf-8")
+            os.replace(tmp, self._current)
+            self._open(self._generation_dir())
+        self._remove_stale()
+
+    def _remove_stale(self) -> None:
+        """Borra generaciones anteriores (las aún mapeadas en Windows quedan para después)."""
+        for p in self.root.iterdir():
+            if p == self.dir or p.name.startswith("CURRENT"):
+                continue
+            if p.is_dir() and p.name.startswith("gen-"):
+                shutil.rmtree(p, ignore_errors=True)
+            elif p.name in ("texts.bin", "meta.bin", "offsets.bin", "keys.json"):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        """Publica una generación vacía (para regenerar todos los chunks desde cero)."""
+        with self.rebuilding():
+            pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_writers()
+            for blob in self._blobs:
+                blob.close()
+
+    def import_json_dir(self, chunks_dir: Path | str) -> int:
+        """Migra los antiguos DATA_DIR/chunks/*.json al almacén."""
+        n = 0
+        for fname in sorted(os.listdir(chunks_dir)):
+            if not fname.endswith(".json"):
+                continue
+            with open(os.path.join(chunks_dir, fname), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            self.append(entry.get("text", ""), entry.get("metadata", {}))
+            n += 1
+        self.flush()
+        return n
+
+
+# Instancia compartida por chunker, consulta_doc y auditoria_ley
+chunk_store = ChunkStore()
+
+
+if __name__ == "__main__":
+    legacy_dir = DATA_DIR / "chunks"
+    with chunk_store.rebuilding() as store:
+        total = store.import_json_dir(legacy_dir)
+    print(f"✅ {total} chunks migrados de {legacy_dir} a {CHUNK_STORE_DIR}")
@@ -4,7 +4,8 @@ chunker.py  ─  genera chunks con metadatos completos (+ fechas)
 • Lee el Excel `output.xlsx` desde DATA_DIR.
 • Divide la columna `textoPDF` en trozos de longitud CHUNK_SIZE tokens
   con solapamiento CHUNK_OVERLAP.
-• Guarda cada chunk como JSON individual en DATA_DIR/chunks/.
+• Guarda cada chunk en el almacén columnar `chunk_store` (CHUNK_STORE_DIR):
+  blob de textos + offsets, leído luego vía mmap por consulta_doc.
 • Metadatos incluidos por chunk:
     - DocumentID
     - NUC
@@ -20,14 +21,10 @@ chunker.py  ─  genera chunks con metadatos completos (+ fechas)
 """
 
 import os
-import json
 import pandas as pd
 from langchain.schema import Document
-from config import DATA_DIR, CHUNK_SIZE, CHUNK_OVERLAP
-
-CHUNKS_DIR = DATA_DIR / "chunks"           # ← define la ruta
-
-os.makedirs(CHUNKS_DIR, exist_ok=True)
+from config import DATA_DIR, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_STORE_DIR
+from chunk_store import ChunkStore, chunk_store
 
 
 def _split_text(text: str) -> list[str]:
@@ -42,7 +39,10 @@ def _split_text(text: str) -> list[str]:
     return chunks
 
 
-def make_chunks(df: pd.DataFrame) -> list[Document]:
+def make_chunks(df: pd.DataFrame, store: ChunkStore | None = chunk_store) -> list[Document]:
+    """Trocea `df` y añade los chunks al almacén (append-only; para
+    regenerar todo pasa el store de chunk_store.rebuilding()). store=None ⇒
+    no persiste."""
     docs: list[Document] = []
 
     for _, row in df.iterrows():
@@ -78,18 +78,18 @@ def make_chunks(df: pd.DataFrame) -> list[Document]:
             }
             docs.append(Document(page_content=chunk, metadata=meta))
 
-            # Persistir a disco (JSON por chunk)
-            out_path = os.path.join(
-                CHUNKS_DIR, f"{meta['DocumentID']}_chunk_{idx}.json"
-            )
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump({"text": chunk, "metadata": meta}, f, ensure_ascii=False)
+            # Persistir en el blob append-only
+            if store is not None:
+                store.append(chunk, meta)
 
+    if store is not None:
+        store.flush()
     return docs
 
 
 if __name__ == "__main__":
     excel_path = os.path.join(DATA_DIR, "output (1).xlsx")
     df = pd.read_excel(excel_path)
-    total_docs = make_chunks(df)
-    print(f"✅ Chunks generados: {len(total_docs)}. Guardados en {CHUNKS_DIR}")
+    with chunk_store.rebuilding() as store:
+        total_docs = make_chunks(df, store)
+    print(f"✅ Chunks generados: {len(total_docs)}. Guardados en {CHUNK_STORE_DIR}")
@@ -24,6 +24,20 @@ LLM_MODEL_ID = "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8"
 EMBED_MODEL_ID = (
     "dariolopez/roberta-base-bne-finetuned-msmarco-qa-es-mnrl-mn"
 )
+# Caché persistente de embeddings (ver embed_cache.py)
+EMBED_CACHE_ENABLED   = os.getenv("EMBED_CACHE", "1") != "0"
+EMBED_CACHE_PATH      = DATA_DIR / "embed_cache.sqlite"
+EMBED_CACHE_MAX_ITEMS = 2_000_000      # ≈ 3 GB con float16 de 768 dims
+# Embedding por lotes en pool de procesos (builds de índices)
+# Cada worker carga una copia completa del modelo: pocos por defecto y, además,
+# embed.py no lanza más de los que caben en la RAM disponible (EMBED_WORKER_MB c/u)
+EMBED_WORKERS      = int(os.getenv("EMBED_WORKERS", str(min(4, os.cpu_count() or 1))))
+EMBED_WORKER_MB    = int(os.getenv("EMBED_WORKER_MB", "1500"))   # RSS estimado por worker
+EMBED_PARALLEL_MIN = 4096             # menos textos → un solo proceso
+# Backend de inferencia: "torch" (fp32) | "onnx-int8" (ver embed_onnx.py)
+EMBED_BACKEND     = os.getenv("EMBED_BACKEND", "torch")
+ONNX_MODEL_DIR    = BASE_DIR / "models" / "onnx-int8"
+ONNX_QUANT_CONFIG = os.getenv("ONNX_QUANT_CONFIG", "avx2")   # arm64 | avx2 | avx512 | avx512_vnni
 # ──────────── VectorStore ────────────
 CHUNK_SIZE      = 750       # tokens aprox.
 CHUNK_OVERLAP   = 80
@@ -31,7 +45,88 @@ SIM_THRESHOLD   = 0.8     # coseno mínimo para “encontrado”
 K_RETRIEVE      = 5
 SIM_THRESHOLD_est = 1.0            # <= 1.0 se considera match
 GREY_MARGIN   = 0.15
+# Plazo (s, desde el inicio) por fuente en conversacional._collect_context
+CTX_DEADLINES = {"cases": 8.0, "laws": 8.0, "web": 3.0}
+
+# ──────────── Índice ANN para index_cases ────────────
+#  "flat" (exacto) | "ivf_flat" | "ivf_pq" | "hnsw"  →  python build_index.py --cases-ann …
+CASES_INDEX_TYPE     = os.getenv("CASES_INDEX_TYPE", "flat")
+IVF_NLIST            = 4096     # centroides IVF (se recorta a n/39 si hay pocos vectores)
+IVF_NPROBE           = 32       # listas visitadas por consulta
+PQ_M                 = 48       # sub-vectores PQ (768 / 48 = 16 dims c/u)
+PQ_NBITS             = 8
+HNSW_M               = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH       = 128
+ANN_TRAIN_SAMPLE     = 200_000  # vectores usados para entrenar IVF/PQ
+
+# ──────────── Chunk store (mmap) ────────────
+CHUNK_STORE_DIR = DATA_DIR / "chunk_store"
+
+# ──────────── API ────────────
+QA_MAX_WORKERS = int(os.getenv("QA_MAX_WORKERS", "16"))   # hilos para trabajo bloqueante
 
 # ──────────── Feedback ────────────
 SCORES     = {"Acepta": 1, "Parcial": 0, "Rechaza": -1}
 INTER_FILE = DATA_DIR / "Interactions.xlsx"
+
+# ──────────── Router: clasificador local (ver intent_classifier.py) ────────────
+INTENT_LOCAL_ENABLED   = os.getenv("INTENT_LOCAL", "1") != "0"
+INTENT_LOCAL_THRESHOLD = float(os.getenv("INTENT_LOCAL_THRESHOLD", "0.85"))  # < umbral → LLM
+INTENT_KNN_K           = 7
+INTENT_MIN_SIM         = 0.55      # coseno mínimo con el vecino más cercano
+ROUTER_CACHE_SIZE      = 4096      # (label, confianza) por mensaje normalizado
+ROUTER_CACHE_TTL       = 3600.0    # s
+
+# ──────────── Caché semántica de respuestas (ver semantic_cache.py) ────────────
+SEMANTIC_CACHE_ENABLED   = os.getenv("SEMANTIC_CACHE", "1") != "0"
+# Sólo se cachea un turno cuya respuesta no depende del historial (ver agent._contexto);
+# conversacional siempre lleva historial, así que no figura aquí
+SEMANTIC_CACHE_INTENTS   = ("consulta_concepto",)
+SEMANTIC_CACHE_THRESHOLD = 0.95        # coseno mínimo pregunta ↔ pregunta cacheada
+SEMANTIC_CACHE_SIZE      = 2048
+SEMANTIC_CACHE_TTL       = 6 * 3600.0  # s
+
+# ──────────── Texto de PDFs de SJ.Documentos (ver doc_text_cache.py) ────────────
+DOC_TEXT_CACHE_DIR       = DATA_DIR / "doc_text_cache"
+DOC_TEXT_CACHE_MAX_BYTES = int(os.getenv("DOC_TEXT_CACHE_MAX_MB", "2048")) * 1024 * 1024
+DOWNLOAD_WORKERS         = int(os.getenv("DOWNLOAD_WORKERS", "8"))    # descargas HTTP simultáneas
+EXTRACT_WORKERS          = int(os.getenv("EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# ──────────── data_text_job.py (ingesta OCR de JuritecaTrainingSample) ────────────
+OCR_WORKERS            = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+OCR_DPI                = 300
+OCR_MAX_IN_FLIGHT      = OCR_WORKERS * 2   # páginas rasterizadas esperando OCR (acota RAM)
+TEXT_JOB_UPDATE_BATCH  = 50       # filas por UPDATE/commit
+TEXT_JOB_WINDOW        = 200      # documentos en vuelo (acota memoria)
+TEXT_JOB_STATE_DIR     = DATA_DIR / "data_text_job"
+
+# ──────────── data_chunk_job.py (carga de JuritecaChunks) ────────────
+CHUNK_INSERT_BATCH = int(os.getenv("CHUNK_INSERT_BATCH", "5000"))   # filas por executemany/commit
+CHUNK_FETCH_SIZE   = 200                                             # documentos por fetchmany
+
+# ──────────── Pool de conexiones SQL Server (ver db_pool.py) ────────────
+DB_POOL_SIZE             = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT          = 30.0    # s de espera por una conexión libre
+DB_POOL_HEALTHCHECK_IDLE = 60.0    # s de inactividad tras los que se valida con SELECT 1
+
+# ──────────── Identificadores ────────────
+# NUC (p. ej. 034-2021-ECON-00366; la materia tiene 3 o 4 letras). Usar con re.I
+NUC_PATTERN = r"\b\d{3}-\d{4}-[A-Z]{3,4}-\d{5}\b"
+
+# ──────────── Recuperación híbrida BM25 + FAISS (ver hybrid_search.py) ────────────
+HYBRID_RRF_K = 60      # constante de Reciprocal Rank Fusion
+HYBRID_DEPTH = 4       # candidatos por ruta = k × HYBRID_DEPTH
+
+# ──────────── BM25 (Whoosh): searchers persistentes y cachés ────────────
+BM25_RELOAD_CHECK      = 2.0       # s entre comprobaciones de generación del índice
+BM25_QUERY_CACHE_SIZE  = 4096      # consultas parseadas (LRU)
+BM25_RESULT_CACHE_SIZE = 8192      # resultados por (generación, consulta, k)
+BM25_RESULT_CACHE_TTL  = 600.0     # s
+# "whoosh" | "sparse" (bm25_sparse.py: CSR NumPy/SciPy memmapeado, texto completo)
+BM25_BACKEND           = os.getenv("BM25_BACKEND", "whoosh")
+BM25_SPARSE_DIR        = DATA_DIR / "bm25_sparse"
+BM25_K1, BM25_B        = 1.2, 0.75
+
+# ──────────── Catálogo de casos (ver case_catalog.py) ────────────
+CASE_CATALOG_DIR = DATA_DIR / "case_catalog"     # meta.parquet + text.arrow (mmap)
@@ -1,8 +1,37 @@
+"""
+data_chunk_job.py
+-----------------
+Trocea TextoPDF de [IA].[JuritecaTrainingSample] y lo carga en
+[IA].[JuritecaChunks].
+
+• Lectura paginada por IdDocumento (sql_reader.iter_keyset, CHUNK_FETCH_SIZE
+  documentos por página): nunca se materializa toda la columna TextoPDF.
+• Reanudación en SQL: cada documento terminado se registra en
+  JuritecaChunksDone (IdDocumento, Chunks) en la misma transacción que sus
+  chunks, y NOT EXISTS contra esa tabla descarta los ya troceados. Los
+  documentos con TextoPDF vacío se registran con Chunks=0 para no volver a
+  leerlos en cada corrida.
+• Antes de reanudar, _reconcile() revisa los documentos con chunks pero sin
+  registro (p. ej. cargados por el loader fila a fila anterior): si el
+  número de chunks coincide con el esperado se registran como completos;
+  si no, se borran sus chunks y se vuelven a trocear. Un executemany por
+  operación y un commit por página.
+• Escritura por lotes: executemany con fast_executemany y un commit cada
+  ~CHUNK_INSERT_BATCH filas, siempre en frontera de documento. Si un lote
+  falla se reintenta documento a documento para aislar el culpable.
+
+    python data_chunk_job.py [--batch 5000]
+"""
+
+import argparse, time
 import pyodbc
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 import warnings
 
+from config import CHUNK_INSERT_BATCH, CHUNK_FETCH_SIZE
+from sql_reader import iter_keyset, iter_keyset_pages
+
 # Silence pandas warning
 warnings.filterwarnings("ignore", category=UserWarning)
 
@@ -10,6 +39,48 @@ warnings.filterwarnings("ignore", category=UserWarning)
 CHUNK_SIZE = 200
 CHUNK_OVERLAP = 50
 
+INSERT_SQL = """
+    INSERT INTO [Reportes].[IA].[JuritecaChunks] (
+        IdDocumento, IdChunk, Texto,
+        NUC, NumeroTramite, Sala, Tribunal, Materia,
+        TipoFallo, TipoDocumento, FechaDecision, FechaTramite
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+DONE_TABLE = "[Reportes].[IA].[JuritecaChunksDone]"
+CREATE_DONE_SQL = f"""
+    IF OBJECT_ID(N'{DONE_TABLE}', N'U') IS NULL
+        CREATE TABLE {DONE_TABLE} (
+            IdDocumento BIGINT NOT NULL PRIMARY KEY,
+            Chunks      INT    NOT NULL,
+            Fecha       DATETIME2 NOT NULL DEFAULT SYSDATETIME()
+        )
+"""
+DONE_SQL = f"INSERT INTO {DONE_TABLE} (IdDocumento, Chunks) VALUES (?, ?)"
+DELETE_CHUNKS_SQL = "DELETE FROM [Reportes].[IA].[JuritecaChunks] WHERE IdDocumento = ?"
+
+SOURCE_COLUMNS = """
+    s.IdDocumento, s.TextoPDF, s.NUC, s.NumeroTramite, s.Sala, s.Tribunal,
+    s.Materia, s.TipoFallo, s.TipoDocumento, s.FechaDecision, s.FechaTramite
+"""
+SOURCE_TABLE = "[Reportes].[IA].[JuritecaTrainingSample] s"
+# Sólo documentos sin registro de terminado: chunks y registro se confirman
+# juntos, así que un documento registrado está completo en JuritecaChunks
+SOURCE_WHERE = f"""
+    s.TextoPDF IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM {DONE_TABLE} d WHERE d.IdDocumento = s.IdDocumento)
+"""
+# Documentos con chunks pero sin registro (cargas anteriores o interrumpidas)
+ORPHAN_COLUMNS = """
+    s.IdDocumento, s.TextoPDF,
+    (SELECT COUNT(*) FROM [Reportes].[IA].[JuritecaChunks] c
+     WHERE c.IdDocumento = s.IdDocumento) AS Chunks
+"""
+ORPHAN_WHERE = SOURCE_WHERE + """
+    AND EXISTS (SELECT 1 FROM [Reportes].[IA].[JuritecaChunks] c
+                WHERE c.IdDocumento = s.IdDocumento)
+"""
+
 def _split_text(text: str) -> list[str]:
     words = text.split()
     chunks = []
@@ -23,85 +94,172 @@ def _split_text(text: str) -> list[str]:
 def fix_date(dt):
     """Ensure SQL Server compatible date or return None."""
     if isinstance(dt, pd.Timestamp):
+        dt = dt.to_pydatetime()
+    elif isinstance(dt, date) and not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)
+    if isinstance(dt, datetime):
         if dt.year < 1753:
             return None
-        return dt.to_pydatetime()
+        return dt
     return None
 
-# DB connection
-conn = pyodbc.connect(
-    "DRIVER={ODBC Driver 17 for SQL Server};"
-    "SERVER=192.168.0.133;"
-    "DATABASE=Reportes;"
-    "Trusted_Connection=yes;"
-)
-cursor = conn.cursor()
-
-# Load full documents
-df = pd.read_sql("""
-SELECT
-    IdDocumento,
-    TextoPDF,
-    NUC,
-    NumeroTramite,
-    Sala,
-    Tribunal,
-    Materia,
-    TipoFallo,
-    TipoDocumento,
-    FechaDecision,
-    FechaTramite
-FROM [Reportes].[IA].[JuritecaTrainingSample]
-WHERE TextoPDF IS NOT NULL
-""", conn)
-
-# Load existing (IdDocumento, IdChunk) pairs
-existing_chunks = pd.read_sql("""
-    SELECT IdDocumento, IdChunk
-    FROM [Reportes].[IA].[JuritecaChunks]
-""", conn)
-existing_pairs = set(zip(existing_chunks["IdDocumento"], existing_chunks["IdChunk"]))
-
-print(f"📄 Total documentos para procesar: {len(df)}")
-
-# Process document by document
-for _, row in df.iterrows():
-    doc_id = int(row["IdDocumento"])
-    texto = row["TextoPDF"]
-
-    if not isinstance(texto, str) or not texto.strip():
-        continue
+def _connect():
+    # DB connection
+    return pyodbc.connect(
+        "DRIVER={ODBC Driver 17 for SQL Server};"
+        "SERVER=192.168.0.133;"
+        "DATABASE=Reportes;"
+        "Trusted_Connection=yes;"
+    )
+
+
+def _reconcile(conn, page_size: int = CHUNK_FETCH_SIZE) -> tuple[int, int]:
+    """
+    Registra como completos los documentos huérfanos cuyo número de chunks
+    coincide con el esperado y borra los chunks de los parciales para que
+    el recorrido principal los vuelva a trocear (los de texto vacío quedan
+    registrados con Chunks=0) → (registrados, borrados).
+    """
+    cur = conn.cursor()
+    cur.execute(CREATE_DONE_SQL)
+    conn.commit()
+    cur.fast_executemany = True
+    ok = redo = 0
+    for page in iter_keyset_pages(conn, ORPHAN_COLUMNS, SOURCE_TABLE, where=ORPHAN_WHERE,
+                                  key="s.IdDocumento", page_size=page_size):
+        done, stale = [], []
+        for row in page:
+            texto = row.TextoPDF if isinstance(row.TextoPDF, str) else ""
+            expected = len(_split_text(texto))
+            if row.Chunks != expected:
+                stale.append((int(row.IdDocumento),))
+                print(f"♻️ Doc {row.IdDocumento}: {row.Chunks} chunks de {expected} esperados; "
+                      "se borran y se vuelve a trocear")
+            if row.Chunks == expected or not expected:
+                done.append((int(row.IdDocumento), expected))
+        if stale:
+            cur.executemany(DELETE_CHUNKS_SQL, stale)
+        if done:
+            cur.executemany(DONE_SQL, done)
+        conn.commit()
+        ok += len(done)
+        redo += len(stale)
+    cur.close()
+    if ok or redo:
+        print(f"🔎 Reconciliación: {ok} docs registrados como completos · {redo} parciales")
+    return ok, redo
+
+
+def iter_documents(conn, page_size: int = CHUNK_FETCH_SIZE):
+    """Documentos pendientes de trocear, en orden de IdDocumento."""
+    return iter_keyset(conn, SOURCE_COLUMNS, SOURCE_TABLE, where=SOURCE_WHERE,
+                       key="s.IdDocumento", page_size=page_size)
+
 
+class BulkInserter:
+    """
+    Acumula los chunks de documentos completos y los envía en lotes con un
+    commit cada uno; un lote nunca parte un documento y cada documento se
+    registra en DONE_TABLE dentro del mismo commit (sin chunks ⇒ Chunks=0).
+    """
+
+    def __init__(self, conn, batch_size: int = CHUNK_INSERT_BATCH):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.rows: list[tuple] = []
+        self.docs: list[tuple[int, list[tuple]]] = []
+        self.inserted = 0
+        self.failed = 0
+        self.cur = conn.cursor()
+        self.cur.fast_executemany = True
+
+    def add_document(self, doc_id: int, rows: list[tuple]) -> None:
+        self.docs.append((doc_id, rows))
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size or len(self.docs) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.docs:
+            return
+        try:
+            if self.rows:
+                self.cur.executemany(INSERT_SQL, self.rows)
+            self.cur.executemany(DONE_SQL, [(doc_id, len(rows)) for doc_id, rows in self.docs])
+            self.conn.commit()
+            self.inserted += len(self.rows)
+        except Exception as e_batch:
+            self.conn.rollback()
+            print(f"⚠️ Lote de {len(self.rows)} filas falló ({e_batch}); reintento por documento")
+            self._flush_by_document()
+        self.rows.clear()
+        self.docs.clear()
+
+    def _flush_by_document(self) -> None:
+        for doc_id, rows in self.docs:
+            try:
+                if rows:
+                    self.cur.executemany(INSERT_SQL, rows)
+                self.cur.execute(DONE_SQL, doc_id, len(rows))
+                self.conn.commit()
+                self.inserted += len(rows)
+            except Exception as e_doc:
+                self.conn.rollback()
+                self.failed += 1
+                print(f"❌ Error inserting chunks of doc {doc_id}: {e_doc}")
+
+    def close(self) -> None:
+        self.flush()
+        self.cur.close()
+
+
+def run(batch_size: int = CHUNK_INSERT_BATCH) -> None:
+    # Cada página se lee completa antes de devolver filas: lectura y
+    # escritura comparten conexión sin result sets abiertos
+    conn = _connect()
+    _reconcile(conn)
+    t0 = time.perf_counter()
+    docs = 0
+    writer = BulkInserter(conn, batch_size)
     try:
-        chunks = _split_text(texto)
-        print(f"🧩 ID {doc_id}: {len(chunks)} chunks")
+        # Process document by document
+        for row in iter_documents(conn):
+            doc_id = int(row.IdDocumento)
+            texto = row.TextoPDF
 
-        for idx, chunk in enumerate(chunks):
-            if (doc_id, idx) in existing_pairs:
-                continue  # Skip existing chunk
+            if not isinstance(texto, str) or not texto.strip():
+                writer.add_document(doc_id, [])      # se registra con Chunks=0
+                continue
 
             try:
-                cursor.execute("""
-                    INSERT INTO [Reportes].[IA].[JuritecaChunks] (
-                        IdDocumento, IdChunk, Texto,
-                        NUC, NumeroTramite, Sala, Tribunal, Materia,
-                        TipoFallo, TipoDocumento, FechaDecision, FechaTramite
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    doc_id, idx, chunk,
-                    row["NUC"], row["NumeroTramite"], row["Sala"], row["Tribunal"],
-                    row["Materia"], row["TipoFallo"], row["TipoDocumento"],
-                    fix_date(row["FechaDecision"]), fix_date(row["FechaTramite"])
-                ))
-                conn.commit()
-                print(f"✅ Inserted chunk {idx} for doc {doc_id}")
-
-            except Exception as e_chunk:
-                print(f"❌ Error inserting chunk {idx} of doc {doc_id}: {e_chunk}")
-    except Exception as e_doc:
-        print(f"❌ Error processing document {doc_id}: {e_doc}")
-
-cursor.close()
-conn.close()
-
-print("✅ Chunking process completed with resume logic.")
+                chunks = _split_text(texto)
+                docs += 1
+                meta = (
+                    row.NUC, row.NumeroTramite, row.Sala, row.Tribunal,
+                    row.Materia, row.TipoFallo, row.TipoDocumento,
+                    fix_date(row.FechaDecision), fix_date(row.FechaTramite),
+                )
+                writer.add_document(doc_id, [(doc_id, idx, chunk, *meta)
+                                             for idx, chunk in enumerate(chunks)])
+            except Exception as e_doc:
+                print(f"❌ Error processing document {doc_id}: {e_doc}")
+
+            if docs and docs % 1000 == 0:
+                secs = time.perf_counter() - t0
+                print(f"🧩 {docs} docs · {writer.inserted} chunks insertados "
+                      f"({writer.inserted / secs:.0f} chunks/s)")
+        writer.close()
+    finally:
+        conn.close()
+
+    secs = time.perf_counter() - t0
+    print(f"✅ Chunking completado: {docs} docs · {writer.inserted} chunks "
+          f"({writer.inserted / max(secs, 1e-9):.0f} chunks/s) · {writer.failed} docs con error · {secs:.0f}s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Carga masiva de JuritecaChunks")
+    ap.add_argument("--batch", type=int, default=CHUNK_INSERT_BATCH,
+                    help="filas por executemany/commit")
+    args = ap.parse_args()
+    run(batch_size=args.batch)
@@ -1,75 +1,231 @@
-# chunker_to_sql.py
+# data_text_job.py
+"""
+Ingesta de TextoPDF en [Reportes].[IA].[JuritecaTrainingSample].
+
+    python data_text_job.py                  → procesa todas las filas pendientes
+    python data_text_job.py --limit 1000     → sólo las primeras 1000
+    python data_text_job.py --retry-errors   → reintenta también las que fallaron
+
+Pipeline por ventanas de TEXT_JOB_WINDOW documentos:
+    1. descarga + capa de texto por página   (hilos, DOWNLOAD_WORKERS)
+    2. OCR sólo de las páginas sin texto     (procesos, OCR_WORKERS); cada
+       página se rasteriza justo antes de enviarla y nunca hay más de
+       OCR_MAX_IN_FLIGHT PNG en vuelo, aunque la ventana traiga escaneos
+       de cientos de páginas
+    3. UPDATE … executemany + commit cada TEXT_JOB_UPDATE_BATCH filas
+
+Los pendientes se leen paginando por IdDocumento (sql_reader.iter_keyset),
+sin cargar la tabla entera. Reanudable: cada documento terminado se anota
+en `spool.jsonl` antes de ir a SQL; si la corrida cae, la siguiente vuelca
+primero el spool. Las filas
+ya actualizadas dejan de cumplir `TextoPDF IS NULL` y no se repiten. Los
+fallos quedan en `errors.jsonl` y se saltan salvo con --retry-errors.
+Al final (y en cada commit) reporta páginas/s y proporción de OCR.
+"""
+
+import argparse, json, time
+from itertools import islice
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED,
+                                as_completed, wait)
+from pathlib import Path
 
-import os
 import pyodbc
-import pandas as pd
 import requests
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
-import io
-
-# Configurar ruta de Tesseract manualmente
-TESSERACT_CMD = (
-    r"C:\Users\su-samfernandez\PycharmProjects\ExtractorDeInvolucradosPJ\tesseract.exe"
-)
-os.environ["TESSERACT_CMD"] = TESSERACT_CMD
-os.environ["TESSDATA_PREFIX"] = os.path.join(os.path.dirname(TESSERACT_CMD), "tessdata")
-pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD  # línea clave
-
-# Configuración de conexión
-conn = pyodbc.connect(
-    "DRIVER={ODBC Driver 17 for SQL Server};"
-    "SERVER=192.168.0.133;"
-    "DATABASE=Reportes;"
-    "Trusted_Connection=yes;"
-)
-cursor = conn.cursor()
-
-# Leer los textos ya procesados
-df = pd.read_sql("""
-SELECT IdDocumento, UrlDocumentoFirmado
-FROM [Reportes].[IA].[JuritecaTrainingSample]
-WHERE TextoPDF IS NULL AND UrlDocumentoFirmado IS NOT NULL
-""", conn)
-
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    all_text = []
-    for page in doc:
-        text = page.get_text("text")
-        if text.strip():
-            all_text.append(text)
-        else:
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            ocr_text = pytesseract.image_to_string(img)
-            all_text.append(ocr_text)
-    doc.close()
-    return "\n".join(all_text).strip()
-
-# Procesar fila por fila
-for _, row in df.iterrows():
-    doc_id = row["IdDocumento"]
-    url = row["UrlDocumentoFirmado"]
+from requests.adapters import HTTPAdapter
+
+from config import (DOWNLOAD_WORKERS, OCR_WORKERS, OCR_DPI, OCR_MAX_IN_FLIGHT,
+                    TEXT_JOB_UPDATE_BATCH, TEXT_JOB_WINDOW, TEXT_JOB_STATE_DIR)
+from pdf_extract import text_layer, iter_scans, ocr_png
+from sql_reader import iter_keyset
+
+SPOOL  = TEXT_JOB_STATE_DIR / "spool.jsonl"
+ERRORS = TEXT_JOB_STATE_DIR / "errors.jsonl"
+
+UPDATE_SQL = """
+    UPDATE [Reportes].[IA].[JuritecaTrainingSample]
+    SET TextoPDF = ?
+    WHERE IdDocumento = ?
+"""
+
+
+def _connect():
+    # Configuración de conexión
+    return pyodbc.connect(
+        "DRIVER={ODBC Driver 17 for SQL Server};"
+        "SERVER=192.168.0.133;"
+        "DATABASE=Reportes;"
+        "Trusted_Connection=yes;"
+    )
+
+
+# ───────────────────── estado en disco ─────────────────────
+def _read_jsonl(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    out = []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                out.append(json.loads(line))
+            except json.JSONDecodeError:       # última línea truncada por el corte
+                pass
+    return out
+
+
+def _append_jsonl(path: Path, rec: dict) -> None:
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        fh.flush()
+
+
+class Stats:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.docs = self.pages = self.ocr_pages = self.errors = 0
+
+    def report(self, prefix: str = "") -> str:
+        secs = time.perf_counter() - self.t0
+        return (f"{prefix}{self.docs} docs · {self.pages} págs · {self.pages / secs:.1f} págs/s · "
+                f"OCR {self.ocr_pages}/{self.pages} ({self.ocr_pages / max(self.pages, 1):.1%}) · "
+                f"{self.errors} errores · {secs:.0f}s")
 
-    try:
-        print(f"Procesando ID {doc_id}...")
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
 
-        texto = extract_text_from_pdf_bytes(response.content)
+# ───────────────────── escritura por lotes ─────────────────────
+def _flush(conn, batch: list[tuple[str, object]]) -> None:
+    if not batch:
+        return
+    cur = conn.cursor()
+    cur.fast_executemany = True
+    cur.executemany(UPDATE_SQL, batch)
+    conn.commit()
+    cur.close()
+    SPOOL.unlink(missing_ok=True)        # todo lo del spool ya está en SQL
+    batch.clear()
+
+
+def _recover_spool(conn) -> int:
+    recs = {r["id"]: r["texto"] for r in _read_jsonl(SPOOL)}
+    if recs:
+        _flush(conn, [(t, i) for i, t in recs.items()])
+    return len(recs)
+
+
+# ───────────────────── pipeline ─────────────────────
+_session = requests.Session()
+_session.mount("http://",  HTTPAdapter(pool_maxsize=DOWNLOAD_WORKERS))
+_session.mount("https://", HTTPAdapter(pool_maxsize=DOWNLOAD_WORKERS))
+
+
+def _fetch_and_split(url: str):
+    """→ (pdf, textos_por_página, páginas_sin_texto)."""
+    response = _session.get(url, timeout=20)
+    response.raise_for_status()
+    return (response.content, *text_layer(response.content))
+
+
+def _pending_rows(conn, retry_errors: bool, limit: int | None):
+    """Genera (IdDocumento, URL) pendientes, paginando por IdDocumento."""
+    skip = set() if retry_errors else {r["id"] for r in _read_jsonl(ERRORS)}
+    rows = iter_keyset(conn, "IdDocumento, UrlDocumentoFirmado",
+                       "[Reportes].[IA].[JuritecaTrainingSample]",
+                       where="TextoPDF IS NULL AND UrlDocumentoFirmado IS NOT NULL",
+                       key="IdDocumento", page_size=TEXT_JOB_WINDOW)
+    pending = ((r.IdDocumento, r.UrlDocumentoFirmado) for r in rows
+               if str(r.IdDocumento) not in skip)
+    return islice(pending, limit) if limit else pending
+
+
+def _process_window(window, dl_pool, ocr_pool, conn, batch, stats: Stats) -> None:
+    downloads = {dl_pool.submit(_fetch_and_split, url): doc_id for doc_id, url in window}
+    texts: dict = {}
+    scanned = []                                 # (doc_id, pdf, páginas sin texto)
+    for fut in as_completed(downloads):
+        doc_id = downloads[fut]
+        try:
+            pdf, page_texts, scans = fut.result()
+        except Exception as e:
+            print(f"❌ Error con ID {doc_id}: {e}")
+            _append_jsonl(ERRORS, {"id": str(doc_id), "error": str(e)})
+            stats.errors += 1
+            continue
+        texts[doc_id] = page_texts
+        stats.pages += len(page_texts)
+        stats.ocr_pages += len(scans)
+        if scans:
+            scanned.append((doc_id, pdf, scans))
+
+    failed = set()
+    in_flight = {}
+
+    def _collect(fut) -> None:
+        doc_id, page_no = in_flight.pop(fut)
+        try:
+            texts[doc_id][page_no] = fut.result()
+        except Exception as e:
+            if doc_id not in failed:
+                print(f"❌ OCR falló en ID {doc_id} (pág. {page_no + 1}): {e}")
+                _append_jsonl(ERRORS, {"id": str(doc_id), "error": f"OCR: {e}"})
+                stats.errors += 1
+            failed.add(doc_id)
+
+    while scanned:
+        doc_id, pdf, pages = scanned.pop(0)      # el PDF se libera al terminar sus páginas
+        try:
+            for page_no, png in iter_scans(pdf, pages, dpi=OCR_DPI):
+                while len(in_flight) >= OCR_MAX_IN_FLIGHT:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        _collect(fut)
+                if doc_id in failed:
+                    break
+                in_flight[ocr_pool.submit(ocr_png, png)] = (doc_id, page_no)
+        except Exception as e:                   # fallo al rasterizar
+            print(f"❌ Rasterizado falló en ID {doc_id}: {e}")
+            _append_jsonl(ERRORS, {"id": str(doc_id), "error": f"render: {e}"})
+            stats.errors += 1
+            failed.add(doc_id)
+    for fut in as_completed(list(in_flight)):
+        _collect(fut)
+
+    for doc_id, _ in window:                    # orden estable por IdDocumento
+        if doc_id not in texts or doc_id in failed:
+            continue
+        texto = "\n".join(t for t in texts[doc_id] if t.strip()).strip()
+        _append_jsonl(SPOOL, {"id": doc_id, "texto": texto})
+        batch.append((texto, doc_id))
+        stats.docs += 1
+        if len(batch) >= TEXT_JOB_UPDATE_BATCH:
+            _flush(conn, batch)
+            print(stats.report("💾 "))
+
+
+def run(limit: int | None = None, retry_errors: bool = False) -> Stats:
+    TEXT_JOB_STATE_DIR.mkdir(parents=True, exist_ok=True)
+    if retry_errors:
+        ERRORS.unlink(missing_ok=True)
+    conn = _connect()
+    stats = Stats()
+    try:
+        recovered = _recover_spool(conn)
+        if recovered:
+            print(f"↩️  {recovered} documentos recuperados del spool de la corrida anterior")
 
-        cursor.execute("""
-            UPDATE [Reportes].[IA].[JuritecaTrainingSample]
-            SET TextoPDF = ?
-            WHERE IdDocumento = ?
-        """, texto, doc_id)
-        conn.commit()
-        print(f"✅ Texto guardado para ID {doc_id}")
+        rows = _pending_rows(conn, retry_errors, limit)
+        batch: list = []
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as dl_pool, \
+             ProcessPoolExecutor(max_workers=OCR_WORKERS) as ocr_pool:
+            while window := list(islice(rows, TEXT_JOB_WINDOW)):
+                _process_window(window, dl_pool, ocr_pool, conn, batch, stats)
+        _flush(conn, batch)
+    finally:
+        conn.close()
+    print(stats.report("✅ "))
+    return stats
 
-    except Exception as e:
-        print(f"❌ Error con ID {doc_id}: {e}")
 
-cursor.close()
-conn.close()
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Ingesta paralela y reanudable de TextoPDF")
+    ap.add_argument("--limit", type=int, default=None)
+    ap.add_argument("--retry-errors", action="store_true")
+    args = ap.parse_args()
+    run(limit=args.limit, retry_errors=args.retry_errors)
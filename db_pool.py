@@ -0,0 +1,144 @@
+"""
+db_pool.py
+----------
+Pool pequeño de conexiones pyodbc para SQL Server.
+
+    pool = ConnectionPool(CONN_STR, maxsize=8)
+    with pool.connection() as conn:
+        df = pd.read_sql("SELECT … WHERE NUC = ?", conn, params=[nuc])
+
+• Checkout por hilo: cada hilo recibe su propia conexión (una conexión
+  pyodbc no es segura entre hilos); un `with` anidado en el mismo hilo
+  reutiliza la que ya tiene.
+• Health check: una conexión inactiva más de DB_POOL_HEALTHCHECK_IDLE s
+  ejecuta `SELECT 1` antes de entregarse; si falla se reconecta.
+• Una conexión que lanza pyodbc.Error dentro del `with` se descarta en vez
+  de volver al pool. Al devolverla se hace rollback de lo no confirmado.
+"""
+
+from __future__ import annotations
+import logging, queue, threading, time
+from contextlib import contextmanager
+from typing import Iterator
+
+import pyodbc
+
+from config import DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE
+
+log = logging.getLogger(__name__)
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, conn_str: str, maxsize: int = DB_POOL_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 healthcheck_idle: float = DB_POOL_HEALTHCHECK_IDLE):
+        self.conn_str = conn_str
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._idle: "queue.LifoQueue[tuple[pyodbc.Connection, float]]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ───────────────────── internos ─────────────────────
+    def _new(self) -> pyodbc.Connection:
+        return pyodbc.connect(self.conn_str)
+
+    @staticmethod
+    def _alive(conn: pyodbc.Connection) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1").fetchone()
+            cur.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def _discard(self, conn: pyodbc.Connection) -> None:
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def _checkout(self) -> pyodbc.Connection:
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.maxsize
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._new()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                conn, last_used = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise PoolTimeout(f"Sin conexiones libres tras {self.timeout}s "
+                                  f"(pool de {self.maxsize})") from None
+
+        if time.monotonic() - last_used > self.healthcheck_idle and not self._alive(conn):
+            log.warning("Conexión SQL caída; reconectando")
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+            try:
+                conn = self._new()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return conn
+
+    def _checkin(self, conn: pyodbc.Connection) -> None:
+        try:
+            conn.rollback()
+        except pyodbc.Error:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    # ───────────────────── API ─────────────────────
+    @contextmanager
+    def connection(self) -> Iterator[pyodbc.Connection]:
+        held = getattr(self._local, "conn", None)
+        if held is not None:                       # reentrante en el mismo hilo
+            yield held
+            return
+        conn = self._checkout()
+        self._local.conn = conn
+        broken = False
+        try:
+            yield conn
+        except pyodbc.Error:
+            broken = not self._alive(conn)
+            raise
+        finally:
+            self._local.conn = None
+            if broken:
+                self._discard(conn)
+            else:
+                self._checkin(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        return {"abiertas": self._created, "libres": self._idle.qsize(), "max": self.maxsize}
@@ -3,10 +3,10 @@ ROOT = pathlib.Path(__file__).resolve().parent
 sys.path.insert(0, str(ROOT))
 
 import vectorstore
-from embed import BNEEmbeddings
+from embed import get_embeddings
 
-embedder = BNEEmbeddings()
-idx      = vectorstore.vectordb.index       # faiss.IndexFlatL2
+embedder = get_embeddings()
+idx      = vectorstore.vectordb.index       # IndexFlatL2 o ANN (ver ann_index)
 terms    = ["robo", "manutención", "divorcio"]
 
 for term in terms:
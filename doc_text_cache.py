@@ -0,0 +1,86 @@
+"""
+doc_text_cache.py
+-----------------
+Caché en disco del texto extraído de los PDF de SJ.Documentos.
+
+Clave = sha256(URL + FechaCreacion): un documento re-subido (otra fecha) o
+con otra URL produce otra entrada, así que nunca se sirve texto obsoleto.
+Cada entrada es un fichero UTF-8 en DOC_TEXT_CACHE_DIR/<k[:2]>/<k>.md; los
+aciertos actualizan su mtime y, al superar DOC_TEXT_CACHE_MAX_BYTES, se
+borran los menos usados hasta quedar en el 90 %.
+"""
+
+from __future__ import annotations
+import hashlib, os, threading
+from pathlib import Path
+from typing import Optional
+
+from config import DOC_TEXT_CACHE_DIR, DOC_TEXT_CACHE_MAX_BYTES
+
+
+def doc_key(url: str, fecha_creacion) -> str:
+    return hashlib.sha256(f"{url}\x00{fecha_creacion}".encode("utf-8")).hexdigest()
+
+
+class DocTextCache:
+    def __init__(self, root: Path | str = DOC_TEXT_CACHE_DIR,
+                 max_bytes: int = DOC_TEXT_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._bytes = sum(f.stat().st_size for f in self.root.glob("*/*.md"))
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.md"
+
+    def get(self, url: str, fecha_creacion) -> Optional[str]:
+        p = self._path(doc_key(url, fecha_creacion))
+        try:
+            text = p.read_text(encoding="utf-8")
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(p)                       # marca de uso para la expulsión LRU
+        except OSError:
+            pass
+        self.hits += 1
+        return text
+
+    def put(self, url: str, fecha_creacion, text: str) -> None:
+        p = self._path(doc_key(url, fecha_creacion))
+        p.parent.mkdir(exist_ok=True)
+        data = text.encode("utf-8")
+        tmp = p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        with self._lock:
+            old = p.stat().st_size if p.exists() else 0
+            os.replace(tmp, p)
+            self._bytes += len(data) - old
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        files = sorted(((f.stat().st_mtime, f.stat().st_size, f)
+                        for f in self.root.glob("*/*.md")), key=lambda t: t[0])
+        self._bytes = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * 0.9)
+        for _, size, f in files:
+            if self._bytes <= target:
+                break
+            try:
+                f.unlink()
+                self._bytes -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._bytes,
+                "hit_rate": (self.hits / total) if total else 0.0}
+
+
+doc_text_cache = DocTextCache()
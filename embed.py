@@ -1,10 +1,110 @@
 # embed.py
 
+import os, time, atexit, logging, threading
+import numpy as np
 from sentence_transformers import SentenceTransformer
-from config import EMBED_MODEL_ID
+from config import (
+    EMBED_MODEL_ID, EMBED_CACHE_ENABLED, EMBED_WORKERS, EMBED_WORKER_MB, EMBED_PARALLEL_MIN,
+    EMBED_BACKEND, ONNX_QUANT_CONFIG,
+)
 from typing import List
-from langchain_huggingface import HuggingFaceEmbeddings
-_model = SentenceTransformer(EMBED_MODEL_ID)   # ← ESTA línea debe existir
+from embed_cache import embedding_cache
+
+log = logging.getLogger(__name__)
+
+def _use_onnx(model_id: str) -> bool:
+    if EMBED_BACKEND != "onnx-int8" or model_id != EMBED_MODEL_ID:
+        return False
+    import embed_onnx
+    return embed_onnx.is_exported()
+
+def _model_key(model_id: str = EMBED_MODEL_ID) -> str:
+    """Clave de caché del modelo (sin cargarlo: un acierto total no lo necesita)."""
+    if _use_onnx(model_id):
+        return f"{EMBED_MODEL_ID}@onnx-int8-{ONNX_QUANT_CONFIG}"
+    return model_id
+
+def _load_model(model_id: str) -> tuple[SentenceTransformer, str]:
+    """
+    Devuelve (modelo, clave de caché). EMBED_BACKEND=onnx-int8 usa el modelo
+    cuantizado de embed_onnx.py; sus vectores llevan otra clave de caché
+    porque no son idénticos a los fp32.
+    """
+    if _use_onnx(model_id):
+        import embed_onnx
+        return embed_onnx.load_int8(), _model_key(model_id)
+    if EMBED_BACKEND == "onnx-int8" and model_id == EMBED_MODEL_ID:
+        log.warning("EMBED_BACKEND=onnx-int8 sin modelo exportado "
+                    "(python embed_onnx.py export); se usa PyTorch fp32.")
+    return SentenceTransformer(model_id), model_id
+
+
+# ─────────────────────────────────────────────────────────────────
+# Registro de modelos: cada modelo se carga UNA vez por proceso, en el
+# primer uso, y lo comparten index_cases, index_laws y todas las tools.
+# ─────────────────────────────────────────────────────────────────
+_MODELS: dict[str, tuple[SentenceTransformer, str]] = {}
+_MODELS_LOCK = threading.Lock()
+
+def _get_entry(model_id: str = EMBED_MODEL_ID) -> tuple[SentenceTransformer, str]:
+    entry = _MODELS.get(model_id)
+    if entry is None:
+        with _MODELS_LOCK:
+            entry = _MODELS.get(model_id)
+            if entry is None:
+                t0 = time.perf_counter()
+                entry = _MODELS[model_id] = _load_model(model_id)
+                log.info("Modelo %s cargado en %.1fs", entry[1], time.perf_counter() - t0)
+    return entry
+
+def get_model(model_id: str = EMBED_MODEL_ID) -> SentenceTransformer:
+    return _get_entry(model_id)[0]
+
+def _rss_bytes() -> int | None:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _available_bytes() -> int | None:
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _cap_workers(workers: int) -> int:
+    """Recorta `workers` a los que caben en la RAM libre (EMBED_WORKER_MB c/u)."""
+    avail = _available_bytes()
+    if avail is None:
+        return workers
+    fit = max(1, avail // (EMBED_WORKER_MB * 2**20))
+    if fit < workers:
+        log.warning("Embeddings: %d workers pedidos, RAM libre para %d", workers, fit)
+    return int(min(workers, fit))
+
+def resident_memory() -> dict:
+    """Memoria de los modelos cargados (pesos) y RSS total del proceso, en MB."""
+    models = {}
+    for model, key in _MODELS.values():
+        n_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        models[key] = round(n_bytes / 2**20, 1)
+    rss = _rss_bytes()
+    return {"modelos_mb": models, "rss_mb": round(rss / 2**20, 1) if rss else None}
 
 
 # Tu wrapper para RoBERTa-BNE sigue igual:
@@ -12,16 +112,18 @@ from langchain_core.embeddings import Embeddings
 
 # ---------------------------
 
+_EMBEDDER = None
+
 def get_embeddings(kind: str = "cases"):
-    if kind == "laws":
-        # Usamos el wrapper oficial con normalización L2
-        return HuggingFaceEmbeddings(
-            model_name=EMBED_MODEL_ID,
-            model_kwargs={"device": "cpu"},              # o "cuda"
-            encode_kwargs={"normalize_embeddings": True},# ← muy importante
-        )
-    # Si es "cases", seguimos con tu wrapper local
-    return BNEEmbeddings()
+    """
+    Embedder compartido del proceso. "laws" usaba HuggingFaceEmbeddings con
+    el mismo EMBED_MODEL_ID y normalización L2: ambos índices usan ahora la
+    misma instancia (un solo juego de pesos en memoria y la misma caché).
+    """
+    global _EMBEDDER
+    if _EMBEDDER is None:
+        _EMBEDDER = BNEEmbeddings()
+    return _EMBEDDER
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -37,17 +139,98 @@ def _batchify(texts: List[str], batch: int | None):
     for i in range(0, len(texts), step):
         yield texts[i : i + step]
 
-def _encode(texts: List[str], MAX_BATCH: int | None = None):
-    """Devuelve embeddings normalizados por lotes."""
-    batch_size = MAX_BATCH or MAX_BATCH_SIZE
-    vectors = []
-    for chunk in _batchify(texts, batch_size):
-        vecs = _model.encode(
-            chunk,
+# Última medición de rendimiento (para dimensionar hardware de build)
+last_throughput: dict = {}
+_pool = None
+_pool_workers = 0                 # nº de procesos del pool vivo
+_pool_lock = threading.Lock()
+_OMP_FROM_ENV = "OMP_NUM_THREADS" in os.environ
+
+def _length_order(texts: List[str]) -> List[int]:
+    """Índices ordenados por longitud: lotes homogéneos ⇒ menos padding."""
+    return sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+def _get_pool(workers: int):
+    """Pool de `workers` procesos; si el vivo tiene otro tamaño se reinicia."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _stop_pool()
+        if _pool is None:
+            # Cada worker con su cuota de hilos: evita sobre-suscribir la CPU
+            # (se respeta un OMP_NUM_THREADS fijado por el usuario)
+            if not _OMP_FROM_ENV:
+                os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // workers))
+            _pool = get_model().start_multi_process_pool(["cpu"] * workers)
+            _pool_workers = len(_pool["processes"])
+            atexit.unregister(stop_pool)          # una sola vez aunque se reinicie
+            atexit.register(stop_pool)
+        return _pool, _pool_workers
+
+def _stop_pool():
+    global _pool, _pool_workers
+    if _pool is not None:
+        SentenceTransformer.stop_multi_process_pool(_pool)
+        _pool, _pool_workers = None, 0
+
+def stop_pool():
+    with _pool_lock:
+        _stop_pool()
+
+def _encode_uncached(texts: List[str], batch_size: int, workers: int | None = None):
+    """
+    Codifica en orden de longitud y devuelve en el orden original.
+    Con ≥ EMBED_PARALLEL_MIN textos y varios workers usa un pool de procesos
+    (SentenceTransformer.start_multi_process_pool); si no, un solo proceso.
+    """
+    if not texts:
+        return []
+    workers = workers or EMBED_WORKERS
+    order = _length_order(texts)
+    ordered = [texts[i] for i in order]
+    t0 = time.perf_counter()
+
+    if workers > 1 and len(texts) >= EMBED_PARALLEL_MIN:
+        workers = _cap_workers(workers)
+    if workers > 1 and len(texts) >= EMBED_PARALLEL_MIN:
+        pool, workers = _get_pool(workers)     # tamaño real del pool
+        vecs = get_model().encode_multi_process(
+            ordered, pool,
+            batch_size=batch_size,
+            chunk_size=batch_size * 8,
             normalize_embeddings=True,
-            show_progress_bar=False,
         )
-        vectors.extend(vecs)
+    else:
+        workers = 1
+        vecs = np.vstack([
+            get_model().encode(chunk, normalize_embeddings=True, show_progress_bar=False)
+            for chunk in _batchify(ordered, batch_size)
+        ])
+
+    secs = time.perf_counter() - t0
+    last_throughput.update(chunks=len(texts), seconds=secs, workers=workers,
+                           chunks_per_sec=len(texts) / secs if secs else 0.0)
+    if len(texts) >= batch_size:
+        log.info("Embeddings: %d chunks en %.1fs (%.1f chunks/s, %d workers)",
+                 len(texts), secs, last_throughput["chunks_per_sec"], workers)
+
+    out = np.empty_like(vecs)
+    out[order] = vecs
+    return list(out)
+
+def _encode(texts: List[str], MAX_BATCH: int | None = None):
+    """Devuelve embeddings normalizados por lotes (pasando por embed_cache)."""
+    batch_size = MAX_BATCH or MAX_BATCH_SIZE
+    if not EMBED_CACHE_ENABLED:
+        return [v.tolist() for v in _encode_uncached(texts, batch_size)]
+
+    vectors = embedding_cache.get_many(_model_key(), texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = _encode_uncached([texts[i] for i in missing], batch_size)
+        embedding_cache.put_many(_model_key(), [texts[i] for i in missing], fresh)
+        for i, v in zip(missing, fresh):
+            vectors[i] = v
     return [v.tolist() for v in vectors]
 
 
@@ -57,14 +240,28 @@ def _encode(texts: List[str], MAX_BATCH: int | None = None):
 # ─────────────────────────────────────────────────────────────────
 
 class BNEEmbeddings(Embeddings):
-    """Adaptador LangChain simple sin multiproceso (compatible Windows)."""
+    """Adaptador LangChain. Los lotes grandes (builds de índices) se reparten
+    en un pool de procesos; en Windows llámalo bajo `if __name__ == "__main__"`."""
 
     def embed_documents(self, texts: List[str]):
         return _encode(texts)
 
     def embed_query(self, text: str):
-        return _model.encode(
-            text,
-            normalize_embeddings=True,
-            show_progress_bar=False,
-        ).tolist()
+        return _encode([text])[0]
+
+
+# ─────────────────────────────────────────────────────────────────
+# Benchmark:  python embed.py [n_textos] [workers …]
+# ─────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    import sys, random
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    worker_list = [int(w) for w in sys.argv[2:]] or [1, EMBED_WORKERS]
+    rng = random.Random(0)
+    vocab = "sentencia recurso tribunal fallo demanda divorcio robo apelación artículo ley".split()
+    texts = [" ".join(rng.choices(vocab, k=rng.randint(20, 600))) for _ in range(n)]
+    for w in worker_list:
+        _encode_uncached(texts, MAX_BATCH_SIZE, workers=w)
+        print(f"workers={w:<3} {last_throughput['chunks_per_sec']:.1f} chunks/s "
+              f"({last_throughput['seconds']:.1f}s)")
+    stop_pool()
@@ -0,0 +1,126 @@
+"""
+embed_cache.py
+--------------
+Caché persistente de embeddings (SQLite, vectores float16).
+
+Clave = sha256(EMBED_MODEL_ID + texto normalizado). Lo usan tanto
+embed._encode (constructores de índices) como embed_query (consultas), de
+modo que re-indexar chunks sin cambios o repetir términos como "robo" o
+"divorcio" no vuelve a pasar por SentenceTransformer.
+
+• get_many / put_many   → lectura/escritura por lotes
+• Expulsión LRU         → columna last_used; al superar EMBED_CACHE_MAX_ITEMS
+                          se borra el 10 % menos usado
+• stats()               → {"hits", "misses", "items", "hit_rate"}
+
+El fichero SQLite se abre en el primer get_many/put_many: con
+EMBED_CACHE_ENABLED apagado importar el módulo no lo toca.
+"""
+
+from __future__ import annotations
+import hashlib, sqlite3, threading, time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from config import EMBED_CACHE_PATH, EMBED_CACHE_MAX_ITEMS
+
+_SQLITE_VARS = 500          # claves por SELECT … IN (…)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(str(text).split())
+
+
+def cache_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path | str = EMBED_CACHE_PATH,
+                 max_items: int = EMBED_CACHE_MAX_ITEMS):
+        self.path = Path(path)
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._items = 0
+
+    def _db(self) -> sqlite3.Connection:
+        """Conexión (se abre y prepara en el primer uso; llamar con el lock)."""
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb ("
+                " key TEXT PRIMARY KEY, dim INTEGER, vec BLOB, last_used REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS emb_lru ON emb(last_used)")
+            self._items = conn.execute("SELECT COUNT(*) FROM emb").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model_id: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Vector float32 por texto, o None si no está en caché."""
+        keys = [cache_key(model_id, t) for t in texts]
+        found = {}
+        with self._lock:
+            conn = self._db()
+            for i in range(0, len(keys), _SQLITE_VARS):
+                part = keys[i : i + _SQLITE_VARS]
+                rows = conn.execute(
+                    f"SELECT key, vec FROM emb WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                # Una sola transacción por consulta: en autocommit cada fila
+                # del executemany sería un commit propio
+                now = time.time()
+                conn.execute("BEGIN")
+                conn.executemany("UPDATE emb SET last_used=? WHERE key=?",
+                                 [(now, k) for k in found])
+                conn.execute("COMMIT")
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return [
+            np.frombuffer(found[k], dtype="float16").astype("float32") if k in found else None
+            for k in keys
+        ]
+
+    def put_many(self, model_id: str, texts: Sequence[str], vectors) -> None:
+        now = time.time()
+        rows = [
+            (cache_key(model_id, t), len(v), np.asarray(v, dtype="float16").tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR REPLACE INTO emb VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+            self._items += len(rows)
+            if self._items > self.max_items:
+                self._evict()
+
+    def _evict(self) -> None:
+        self._items = self._conn.execute("SELECT COUNT(*) FROM emb").fetchone()[0]
+        excess = self._items - int(self.max_items * 0.9)
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM emb WHERE key IN "
+                "(SELECT key FROM emb ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            self._items -= excess
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "items": self._items,
+                "hit_rate": (self.hits / total) if total else 0.0}
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,112 @@
+"""
+embed_onnx.py
+-------------
+Backend ONNX Runtime (int8 dinámico) para el embedder RoBERTa-BNE.
+
+    python embed_onnx.py export     → exporta + cuantiza en ONNX_MODEL_DIR
+    python embed_onnx.py compare    → deriva coseno y latencia vs fp32
+
+Tras exportar, `EMBED_BACKEND=onnx-int8` hace que embed.py cargue este
+modelo en lugar del SentenceTransformer fp32 de PyTorch. Los vectores
+cuantizados difieren ligeramente de los fp32 con que se construyeron los
+índices: usa `compare` para confirmar que la deriva es aceptable.
+
+Requiere sentence-transformers>=3.2 con extras ONNX:
+    pip install "sentence-transformers[onnx]"
+"""
+
+from __future__ import annotations
+import statistics, sys, time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from config import EMBED_MODEL_ID, ONNX_MODEL_DIR, ONNX_QUANT_CONFIG
+
+
+def onnx_file_name(quant: str = ONNX_QUANT_CONFIG) -> str:
+    return f"onnx/model_qint8_{quant}.onnx"
+
+
+def is_exported(save_dir: Path = ONNX_MODEL_DIR, quant: str = ONNX_QUANT_CONFIG) -> bool:
+    return (Path(save_dir) / onnx_file_name(quant)).exists()
+
+
+def _require_onnx() -> None:
+    try:
+        import onnxruntime, optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "EMBED_BACKEND=onnx-int8 requiere los extras ONNX: "
+            'pip install "sentence-transformers[onnx]"'
+        ) from e
+
+
+def load_int8(save_dir: Path = ONNX_MODEL_DIR, quant: str = ONNX_QUANT_CONFIG) -> SentenceTransformer:
+    _require_onnx()
+    return SentenceTransformer(
+        str(save_dir), backend="onnx", device="cpu",
+        model_kwargs={"file_name": onnx_file_name(quant)},
+    )
+
+
+def export_int8(save_dir: Path = ONNX_MODEL_DIR, quant: str = ONNX_QUANT_CONFIG) -> Path:
+    """Exporta EMBED_MODEL_ID a ONNX y guarda la variante int8 dinámica."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    _require_onnx()
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(EMBED_MODEL_ID, backend="onnx", device="cpu")
+    model.save(str(save_dir))
+    export_dynamic_quantized_onnx_model(model, quant, str(save_dir))
+    return save_dir / onnx_file_name(quant)
+
+
+# ───────────────────── deriva y latencia vs fp32 ─────────────────────
+_SAMPLE = [
+    "robo", "divorcio por incompatibilidad de caracteres", "manutención de menores",
+    "¿qué dice el artículo 69 de la constitución?",
+    "recurso de amparo contra actuación administrativa",
+    "la corte rechaza el recurso de casación interpuesto por la parte demandante",
+    "pensión alimenticia y guarda de los hijos menores de edad",
+    "homicidio voluntario con circunstancias agravantes",
+]
+
+
+def _latency_ms(model: SentenceTransformer, texts: List[str], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        for t in texts:
+            t0 = time.perf_counter()
+            model.encode(t, normalize_embeddings=True, show_progress_bar=False)
+            times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def compare(texts: List[str] = _SAMPLE, runs: int = 5) -> dict:
+    """Coseno fp32↔int8 por texto y latencia mediana de un embed_query."""
+    fp32 = SentenceTransformer(EMBED_MODEL_ID, device="cpu")
+    int8 = load_int8()
+    a = fp32.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    b = int8.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    cos = np.sum(a * b, axis=1)
+    ms_fp32 = _latency_ms(fp32, texts, runs)
+    ms_int8 = _latency_ms(int8, texts, runs)
+    return {
+        "cos_medio": float(cos.mean()), "cos_min": float(cos.min()),
+        "ms_fp32": ms_fp32, "ms_int8": ms_int8, "speedup": ms_fp32 / ms_int8,
+    }
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "compare"
+    if cmd == "export":
+        print("✅ Modelo int8 en", export_int8())
+    else:
+        r = compare()
+        print(f"coseno fp32↔int8: medio {r['cos_medio']:.4f} · mínimo {r['cos_min']:.4f}")
+        print(f"embed_query: fp32 {r['ms_fp32']:.1f} ms · int8 {r['ms_int8']:.1f} ms "
+              f"(×{r['speedup']:.1f})")
@@ -9,6 +9,7 @@ Formato Excel (`Interactions.xlsx`) con columnas:
     • assistant_msg  (respuesta Markdown)
     • intent         (etiqueta del router)
     • feedback       (Acepta/Parcial/Rechaza)
+    • intent_source  (local/llm: quién decidió `intent`)
 
 Este archivo se lee luego para entrenar el modelo de recompensa
 o exportar a JSONL para DPO / RLHF fine-tuning:contentReference[oaicite:0]{index=0}.
@@ -23,7 +24,8 @@ from config import INTER_FILE, SCORES
 def _ensure_file() -> None:
     if not Path(INTER_FILE).exists():
         df = pd.DataFrame(columns=[
-            "timestamp", "user_msg", "assistant_msg", "intent", "feedback"
+            "timestamp", "user_msg", "assistant_msg", "intent", "feedback",
+            "intent_source",
         ])
         df.to_excel(INTER_FILE, index=False)
 
@@ -31,15 +33,19 @@ def log_interaction(
     user_msg: str,
     assistant_msg: str,
     intent: str,
-    feedback: Literal["Acepta", "Parcial", "Rechaza"]
+    feedback: Literal["Acepta", "Parcial", "Rechaza"],
+    intent_source: Literal["local", "llm", ""] = "",
 ) -> None:
     _ensure_file()
     df = pd.read_excel(INTER_FILE)
-    df.loc[len(df)] = [
-        datetime.now(timezone.utc).isoformat(),
-        user_msg,
-        assistant_msg,
-        intent,
-        feedback,
-    ]
+    if "intent_source" not in df.columns:        # ficheros anteriores
+        df["intent_source"] = ""
+    df.loc[len(df)] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "user_msg": user_msg,
+        "assistant_msg": assistant_msg,
+        "intent": intent,
+        "feedback": feedback,
+        "intent_source": intent_source,
+    }
     df.to_excel(INTER_FILE, index=False)
@@ -0,0 +1,174 @@
+"""
+hybrid_search.py
+----------------
+Recuperación híbrida de sentencias: BM25 (Whoosh, bm25_store) + FAISS
+(index_cases), fusionados por Reciprocal Rank Fusion.
+
+    hybrid_search("divorcio por incompatibilidad", k=5)     → List[Document]
+    hybrid_search(texto, k=5, q_vec=vector_ya_calculado)    → sin re-embeber
+    hybrid_search(msg, k=5, lexical_query=pregunta)         → BM25 sólo sobre la pregunta
+
+• Las dos rutas corren en paralelo; la fusión es a nivel de documento
+  (IdDocumento): score = Σ 1 / (HYBRID_RRF_K + rango) en cada ruta.
+• Una consulta que es sólo un identificador (NUC, NumeroTramite o
+  IdDocumento) va únicamente a la ruta léxica, por coincidencia exacta en
+  los campos ID: sin embedding ni FAISS.
+• Por cada documento se devuelve su mejor chunk denso; si sólo lo halló
+  BM25, el primer chunk desde chunk_store. metadata["rrf_score"] y
+  metadata["fuentes"] indican de dónde vino.
+• stats() → latencia media y tasa de acierto por ruta (dense / bm25 / ids).
+"""
+
+from __future__ import annotations
+import logging, re, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain.schema import Document
+
+from config import HYBRID_RRF_K, HYBRID_DEPTH, NUC_PATTERN
+from bm25_store import search_bm25, search_bm25_ids
+from chunk_store import chunk_store
+from vectorstore import search_by_vector, vectordb
+
+log = logging.getLogger(__name__)
+
+# NUC (034-2021-ECON-00366) o número largo (IdDocumento / NumeroTramite)
+_ID_ONLY = re.compile(rf"^\s*({NUC_PATTERN}|\d{{6,}})\s*[.?!]?\s*$", re.IGNORECASE)
+
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid")
+
+
+def identifier_only(query: str) -> Optional[str]:
+    """El identificador si la consulta no contiene nada más, si no None."""
+    m = _ID_ONLY.match(query or "")
+    return m.group(1).lower() if m else None
+
+
+# ───────────────────── estadísticas por ruta ─────────────────────
+class _PathStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._s: Dict[str, Dict[str, float]] = {}
+
+    def record(self, path: str, seconds: float, hits: int) -> None:
+        with self._lock:
+            s = self._s.setdefault(path, {"llamadas": 0, "segundos": 0.0, "con_resultados": 0})
+            s["llamadas"] += 1
+            s["segundos"] += seconds
+            s["con_resultados"] += bool(hits)
+
+    def report(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                p: {"llamadas": int(s["llamadas"]),
+                    "latencia_ms": 1000 * s["segundos"] / s["llamadas"],
+                    "hit_rate": s["con_resultados"] / s["llamadas"]}
+                for p, s in self._s.items()
+            }
+
+
+_STATS = _PathStats()
+
+
+def stats() -> Dict[str, dict]:
+    return _STATS.report()
+
+
+def _timed(path: str, fn, *args):
+    t0 = time.perf_counter()
+    try:
+        out = fn(*args)
+    except Exception as e:
+        log.warning("Ruta %s falló: %s", path, e)
+        out = []
+    _STATS.record(path, time.perf_counter() - t0, len(out))
+    return out
+
+
+# ───────────────────── helpers ─────────────────────
+def _doc_id(doc: Document):
+    meta = doc.metadata or {}
+    return meta.get("DocumentID") or meta.get("IdDocumento") or id(doc)
+
+
+def _matches(meta: dict, filtro: dict | None) -> bool:
+    return not filtro or all(meta.get(f) == v for f, v in filtro.items())
+
+
+def _lexical_document(doc_id: int, filtro: dict | None) -> Optional[Document]:
+    """Primer chunk del documento desde chunk_store (hits sólo-BM25)."""
+    records = [(t, m) for t, m in chunk_store.get_records(str(doc_id))
+               if str(m.get("DocumentID", m.get("IdDocumento"))) == str(doc_id)]
+    if not records:
+        return None
+    text, meta = min(records, key=lambda r: r[1].get("ChunkID", 0))
+    if not _matches(meta, filtro):
+        return None
+    return Document(page_content=text, metadata=dict(meta))
+
+
+def _dense(query: str, q_vec, depth: int, filtro: dict | None) -> List[Document]:
+    if q_vec is None:
+        q_vec = vectordb.get().embedding_function.embed_query(query)
+    return search_by_vector(q_vec, k=depth, filtro=filtro)
+
+
+# ───────────────────── API ─────────────────────
+def lexical_ids(ident: str, k: int = 5, filtro: dict | None = None) -> List[Document]:
+    """Sólo ruta léxica exacta por identificador."""
+    hits = _timed("ids", search_bm25_ids, ident, k)
+    out = []
+    for doc_id, score in hits:
+        doc = _lexical_document(doc_id, filtro)
+        if doc is not None:
+            doc.metadata.update(rrf_score=score, fuentes=["ids"])
+            out.append(doc)
+    return out[:k]
+
+
+def hybrid_search(query: str, k: int = 5, q_vec=None,
+                  filtro: dict | None = None,
+                  lexical_query: str | None = None) -> List[Document]:
+    """
+    Top-k documentos (un chunk representativo por IdDocumento) por RRF.
+    `lexical_query` sustituye a `query` en la ruta BM25 (p. ej. la pregunta
+    sin el historial que acompaña a la consulta densa).
+    """
+    ident = identifier_only(lexical_query or query)
+    if ident is not None:
+        return lexical_ids(ident, k, filtro)
+
+    depth = max(k * HYBRID_DEPTH, k)
+    f_dense = _POOL.submit(_timed, "dense", _dense, query, q_vec, depth * 2, filtro)
+    f_bm25 = _POOL.submit(_timed, "bm25", search_bm25, lexical_query or query, depth)
+    dense, lexical = f_dense.result(), f_bm25.result()
+
+    scores: Dict = {}
+    best: Dict = {}
+    fuentes: Dict = {}
+    rank = 0
+    for doc in dense:                              # chunks → documentos, mejor rango
+        did = _doc_id(doc)
+        if did in best:
+            continue
+        best[did] = doc
+        scores[did] = 1.0 / (HYBRID_RRF_K + rank + 1)
+        fuentes[did] = ["dense"]
+        rank += 1
+    for rank, (did, _) in enumerate(lexical):
+        scores[did] = scores.get(did, 0.0) + 1.0 / (HYBRID_RRF_K + rank + 1)
+        fuentes.setdefault(did, []).append("bm25")
+
+    out: List[Document] = []
+    for did in sorted(scores, key=scores.get, reverse=True):
+        doc = best.get(did) or _lexical_document(did, filtro)
+        if doc is None:
+            continue
+        doc = Document(page_content=doc.page_content,
+                       metadata={**doc.metadata, "rrf_score": scores[did],
+                                 "fuentes": fuentes[did]})
+        out.append(doc)
+        if len(out) == k:
+            break
+    return out
@@ -0,0 +1,121 @@
+"""
+id_resolver.py
+--------------
+Resolución identificador → fila del catálogo de casos, sin escanear el
+DataFrame.
+
+Se construye una vez sobre case_catalog.catalog.meta:
+    • índices hash exactos por campo: NUC, IdDocumento, NumeroTramite
+      (clave normalizada → posiciones en el catálogo)
+    • índice de prefijos: lista ordenada de todas las claves normalizadas,
+      consultada con bisect (p. ej. un NUC escrito sin los últimos dígitos)
+
+Un prefijo sólo resuelve si identifica una única fila: a diferencia del
+antiguo `str.contains`, "12345" nunca resuelve a la fila de "9123456".
+
+Uso:
+    from id_resolver import resolver
+    resolver.resolve("034-2021-ECON-00366")        → posición o None
+    resolver.resolve_in_text("resume el caso …")   → posición o None
+"""
+
+from __future__ import annotations
+import re, threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from case_catalog import catalog
+from config import NUC_PATTERN
+
+FIELDS = ("NUC", "IdDocumento", "NumeroTramite")     # orden de precedencia
+
+_PAT_NUC   = re.compile(NUC_PATTERN, re.I)
+_PAT_DOCID = re.compile(r"\b\d{6,}\b")
+
+
+def norm_id(value) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().lower()
+
+
+class IdResolver:
+    def __init__(self, meta: pd.DataFrame, fields: Sequence[str] = FIELDS):
+        self.fields = [f for f in fields if f in meta.columns]
+        self.exact: Dict[str, Dict[str, List[int]]] = {}
+        merged: Dict[str, List[int]] = {}
+        for f in self.fields:
+            idx: Dict[str, List[int]] = {}
+            for pos, key in enumerate(meta[f].map(norm_id).tolist()):
+                if key:
+                    idx.setdefault(key, []).append(pos)
+                    merged.setdefault(key, []).append(pos)
+            self.exact[f] = idx
+        self._merged = merged
+        self._sorted = sorted(merged)
+
+    def lookup(self, ident: str, fields: Sequence[str] | None = None) -> List[int]:
+        """Posiciones con coincidencia exacta (en el primer campo que acierte)."""
+        key = norm_id(ident)
+        for f in fields or self.fields:
+            hit = self.exact.get(f, {}).get(key)
+            if hit:
+                return hit
+        return []
+
+    def prefix(self, ident: str, limit: int = 20) -> List[int]:
+        """Posiciones cuyas claves empiezan por `ident` (a lo sumo `limit` claves)."""
+        p = norm_id(ident)
+        if not p:
+            return []
+        out: List[int] = []
+        i = bisect_left(self._sorted, p)
+        while i < len(self._sorted) and self._sorted[i].startswith(p) and limit:
+            for pos in self._merged[self._sorted[i]]:
+                if pos not in out:
+                    out.append(pos)
+            i += 1
+            limit -= 1
+        return out
+
+    def resolve(self, ident: str) -> Optional[int]:
+        """Exacto primero; si no, un prefijo que identifique una sola fila."""
+        hit = self.lookup(ident)
+        if hit:
+            return hit[0]
+        cand = self.prefix(ident, limit=2)
+        return cand[0] if len(cand) == 1 else None
+
+    def resolve_in_text(self, text: str) -> Optional[int]:
+        """Primer NUC y, si no resuelve, primer número largo del mensaje."""
+        for pat in (_PAT_NUC, _PAT_DOCID):
+            for m in pat.finditer(text or ""):
+                pos = self.resolve(m.group(0))
+                if pos is not None:
+                    return pos
+        return None
+
+
+class _LazyResolver:
+    """Se construye sobre el catálogo compartido en el primer uso."""
+
+    def __init__(self):
+        self._r: Optional[IdResolver] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> IdResolver:
+        if self._r is None:
+            with self._lock:
+                if self._r is None:
+                    self._r = IdResolver(catalog.meta)
+        return self._r
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+resolver = _LazyResolver()
@@ -0,0 +1,151 @@
+"""
+incremental_index.py
+--------------------
+Actualización incremental de un índice FAISS (index_laws / index_cases).
+
+Junto a cada índice se guarda `manifest.json`:
+
+    { clave_chunk: {"hash": sha1(texto+metadatos), "id": docstore_id}, … }
+
+En cada corrida se comparan los chunks actuales con el manifiesto y sólo:
+    • se embeben los chunks nuevos o cuyo hash cambió,
+    • se eliminan del índice los chunks borrados o modificados.
+
+El resultado se escribe en un directorio temporal y se intercambia con el
+anterior (rename), de modo que un lector nunca ve un índice a medio guardar.
+"""
+
+from __future__ import annotations
+import os, json, uuid, shutil, hashlib, time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+
+MANIFEST = "manifest.json"
+
+
+def chunk_key(meta: dict) -> str:
+    """Clave estable de un chunk (equivale a (IdDocumento, IdChunk) en SQL)."""
+    cid = meta.get("ChunkID", 0)
+    if meta.get("DocumentID") is not None:
+        return f"case:{meta['DocumentID']}:{cid}"
+    if meta.get("fuente") == "constitucion":
+        return f"const:{meta.get('articulo')}:{cid}"
+    return f"{meta.get('fuente', 'doc')}:{meta.get('ID')}:{cid}"
+
+
+def content_hash(doc: Document) -> str:
+    payload = json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1((doc.page_content + "\x00" + payload).encode("utf-8")).hexdigest()
+
+
+def keyed_chunks(docs: List[Document]) -> Tuple[Dict[str, Document], int]:
+    """
+    {clave: doc} sin perder chunks cuya clave se repite (p. ej. criterios sin
+    ID → "criterio:nan:0"): todos los de una clave repetida pasan a
+    "clave#<hash del contenido>", estable entre corridas e independiente del
+    orden. Sólo se descartan duplicados idénticos. → (dict, nº de colisiones)
+    """
+    groups: Dict[str, List[Document]] = {}
+    for d in docs:
+        groups.setdefault(chunk_key(d.metadata), []).append(d)
+    out: Dict[str, Document] = {}
+    collisions = 0
+    for k, group in groups.items():
+        if len(group) == 1:
+            out[k] = group[0]
+            continue
+        collisions += len(group)
+        for d in group:
+            out[f"{k}#{content_hash(d)[:16]}"] = d
+    return out, collisions
+
+
+def _load_manifest(path: Path) -> Dict[str, dict]:
+    f = path / MANIFEST
+    if not f.exists():
+        return {}
+    with open(f, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _manifest_from_docstore(db: FAISS) -> Dict[str, dict]:
+    """Manifiesto para un índice creado antes de este módulo (sin re-embeber)."""
+    by_id = {sid: db.docstore.search(sid) for sid in db.index_to_docstore_id.values()}
+    ids_of = {id(doc): sid for sid, doc in by_id.items()}
+    keyed, _ = keyed_chunks(list(by_id.values()))
+    return {k: {"hash": content_hash(doc), "id": ids_of[id(doc)]} for k, doc in keyed.items()}
+
+
+def save_atomic(db: FAISS, path: Path, manifest: Dict[str, dict] | None = None) -> None:
+    """save_local en un directorio temporal + intercambio por rename."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    old = path.with_name(path.name + ".old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    db.save_local(str(tmp))
+    if manifest is not None:
+        with open(tmp / MANIFEST, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, ensure_ascii=False)
+    shutil.rmtree(old, ignore_errors=True)
+    if path.exists():
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def update_index(path: Path, docs: List[Document], embeddings) -> dict:
+    """
+    Sincroniza el índice en `path` con `docs`. Si no existe índice se
+    construye completo; si existe sin manifiesto, éste se deduce del docstore.
+    El índice debe admitir remove_ids con ids contiguos (IndexFlat): los
+    índices ANN se regeneran después a partir del plano (ver build_index).
+    Chunks con la misma clave no se pisan (ver keyed_chunks).
+    Devuelve {"nuevos", "modificados", "eliminados", "sin_cambios",
+    "colisiones", "segundos"}.
+    """
+    t0 = time.perf_counter()
+    path = Path(path)
+    current, collisions = keyed_chunks(docs)
+    hashes = {k: content_hash(d) for k, d in current.items()}
+    manifest = _load_manifest(path)
+
+    if not (path / "index.faiss").exists():
+        ids = [uuid.uuid4().hex for _ in current]
+        db = FAISS.from_documents(list(current.values()), embedding=embeddings,
+                                  ids=ids, normalize_L2=True)
+        new_manifest = {k: {"hash": hashes[k], "id": i} for k, i in zip(current, ids)}
+        save_atomic(db, path, new_manifest)
+        return {"nuevos": len(current), "modificados": 0, "eliminados": 0,
+                "sin_cambios": 0, "colisiones": collisions,
+                "segundos": time.perf_counter() - t0}
+
+    db = FAISS.load_local(str(path), embeddings=embeddings,
+                          allow_dangerous_deserialization=True, normalize_L2=True)
+    if not manifest:
+        manifest = _manifest_from_docstore(db)
+
+    added   = [k for k in current if k not in manifest]
+    changed = [k for k in current if k in manifest and manifest[k]["hash"] != hashes[k]]
+    removed = [k for k in manifest if k not in current]
+
+    stale = [manifest[k]["id"] for k in changed + removed]
+    if stale:
+        db.delete(stale)
+    for k in removed:
+        del manifest[k]
+
+    todo = changed + added
+    if todo:
+        ids = [uuid.uuid4().hex for _ in todo]
+        db.add_documents([current[k] for k in todo], ids=ids)
+        for k, i in zip(todo, ids):
+            manifest[k] = {"hash": hashes[k], "id": i}
+
+    if stale or todo or not (path / MANIFEST).exists():
+        save_atomic(db, path, manifest)
+    return {"nuevos": len(added), "modificados": len(changed), "eliminados": len(removed),
+            "sin_cambios": len(current) - len(added) - len(changed),
+            "colisiones": collisions, "segundos": time.perf_counter() - t0}
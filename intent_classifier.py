@@ -0,0 +1,140 @@
+"""
+intent_classifier.py
+--------------------
+Clasificador de intención local (CPU) que evita la llamada al LLM del router
+cuando la respuesta es obvia.
+
+• Entrenamiento: pares de router.EXAMPLES + interacciones registradas en
+  Interactions.xlsx cuya etiqueta eligió el LLM (intent_source == "llm";
+  se omiten las marcadas "Rechaza"). Las decididas por este mismo
+  clasificador no se usan: reentrenar con ellas reforzaría sus errores.
+• Modelo: k-NN ponderado por coseno sobre los embeddings del embedder
+  compartido (mismos vectores normalizados que los índices).
+• predict(msg) → (label, confianza 0-1). El router sólo confía en él por
+  encima de INTENT_LOCAL_THRESHOLD; por debajo consulta al LLM.
+
+    python intent_classifier.py   → precisión vs etiquetas LLM y % de
+                                    llamadas evitadas por umbral (5-fold)
+"""
+
+from __future__ import annotations
+import logging
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import INTER_FILE, INTENT_KNN_K, INTENT_MIN_SIM, INTENT_LOCAL_THRESHOLD
+from embed import get_embeddings
+
+log = logging.getLogger(__name__)
+
+
+def training_data(include_logs: bool = True) -> Tuple[List[str], List[str]]:
+    from router import EXAMPLES, LABELS
+
+    texts, labels = [], []
+    for user, assistant in zip(EXAMPLES[::2], EXAMPLES[1::2]):
+        texts.append(user["content"])
+        labels.append(assistant["content"])
+
+    if include_logs and Path(INTER_FILE).exists():
+        df = pd.read_excel(INTER_FILE)
+        if "intent_source" not in df.columns:    # registros sin origen: no fiables
+            df = df.iloc[0:0]
+        df = df[df["intent"].isin(LABELS) & (df["feedback"] != "Rechaza")
+                & (df["intent_source"] == "llm")]
+        texts += df["user_msg"].astype(str).tolist()
+        labels += df["intent"].tolist()
+    return texts, labels
+
+
+class KNNIntentClassifier:
+    def __init__(self, k: int = INTENT_KNN_K, min_sim: float = INTENT_MIN_SIM):
+        self.k = k
+        self.min_sim = min_sim
+        self._X: np.ndarray | None = None
+        self._y: np.ndarray | None = None
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> "KNNIntentClassifier":
+        self._X = np.asarray(get_embeddings().embed_documents(list(texts)), dtype="float32")
+        self._y = np.asarray(labels)
+        return self
+
+    def _predict_vec(self, q: np.ndarray) -> Tuple[str, float]:
+        sims = self._X @ q
+        top = np.argsort(-sims)[: self.k]
+        if sims[top[0]] < self.min_sim:              # nada parecido en el entrenamiento
+            return str(self._y[top[0]]), 0.0
+        w = np.clip(sims[top], 0, None)
+        votes: dict[str, float] = {}
+        for lbl, wi in zip(self._y[top], w):
+            votes[lbl] = votes.get(lbl, 0.0) + float(wi)
+        label = max(votes, key=votes.get)
+        total = sum(votes.values())
+        return str(label), (votes[label] / total) if total else 0.0
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        q = np.asarray(get_embeddings().embed_query(text), dtype="float32")
+        return self._predict_vec(q)
+
+
+_CLF: KNNIntentClassifier | None = None
+
+def get_classifier() -> KNNIntentClassifier:
+    """Clasificador del proceso (se entrena en el primer uso)."""
+    global _CLF
+    if _CLF is None:
+        texts, labels = training_data()
+        _CLF = KNNIntentClassifier().fit(texts, labels)
+        log.info("Clasificador de intención local: %d ejemplos", len(texts))
+    return _CLF
+
+
+# ───────────────────── evaluación vs etiquetas LLM ─────────────────────
+def evaluate(thresholds: Sequence[float] = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95), folds: int = 5):
+    """
+    Validación cruzada sobre las interacciones etiquetadas por el LLM
+    (intent_source == "llm"). Los EXAMPLES siempre forman parte del
+    entrenamiento.
+    """
+    base_t, base_y = training_data(include_logs=False)
+    all_t, all_y = training_data(include_logs=True)
+    log_t, log_y = all_t[len(base_t):], np.asarray(all_y[len(base_y):])
+    if not log_t:
+        print("No hay interacciones registradas para evaluar.")
+        return
+
+    emb = get_embeddings()
+    Xb = np.asarray(emb.embed_documents(base_t), dtype="float32")
+    Xl = np.asarray(emb.embed_documents(log_t), dtype="float32")
+    preds, confs = [], []
+    fold_of = np.arange(len(log_t)) % folds
+    order = np.empty(len(log_t), dtype=int)
+    for f in range(folds):
+        test = np.where(fold_of == f)[0]
+        train = np.where(fold_of != f)[0]
+        clf = KNNIntentClassifier()
+        clf._X = np.vstack([Xb, Xl[train]])
+        clf._y = np.concatenate([np.asarray(base_y), log_y[train]])
+        for i in test:
+            lbl, c = clf._predict_vec(Xl[i])
+            order[len(preds)] = i
+            preds.append(lbl)
+            confs.append(c)
+    y_true = log_y[order]
+    preds, confs = np.asarray(preds), np.asarray(confs)
+
+    print(f"Interacciones evaluadas: {len(y_true)}  ·  precisión global: "
+          f"{(preds == y_true).mean():.3f}")
+    print(f"{'umbral':>7} {'% evitadas':>11} {'precisión local':>16}")
+    for th in thresholds:
+        m = confs >= th
+        acc = (preds[m] == y_true[m]).mean() if m.any() else float("nan")
+        mark = "  ← actual" if th == INTENT_LOCAL_THRESHOLD else ""
+        print(f"{th:>7.2f} {m.mean():>10.1%} {acc:>16.3f}{mark}")
+
+
+if __name__ == "__main__":
+    evaluate()
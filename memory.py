@@ -4,6 +4,9 @@
 # 1) ConversationBufferMemory (últimos k turnos)
 # 2) Estado de sesión (docs, doc_actual, pdf_cache, etc.)
 
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Dict, Optional, List
 from langchain.memory import ConversationBufferMemory
 
@@ -22,12 +25,17 @@ def get_pdf_text(session_id: str, pid: str) -> str | None:
     return get_session_state(session_id).get("pdf_cache", {}).get(pid)
 
 
+_LOCK = threading.Lock()      # sólo para crear memorias / estados nuevos
+
+
 def get_conversation_memory(session_id: str) -> ConversationBufferMemory:
-    if session_id not in _conversation_memories:
-        _conversation_memories[session_id] = ConversationBufferMemory(
-            k=12, return_messages=True
-        )
-    return _conversation_memories[session_id]
+    mem = _conversation_memories.get(session_id)
+    if mem is None:
+        with _LOCK:
+            mem = _conversation_memories.setdefault(
+                session_id, ConversationBufferMemory(k=12, return_messages=True)
+            )
+    return mem
 
 
 # ------------- 2. Estado de sesión extendido ----------------------
@@ -36,7 +44,38 @@ _sessions: Dict[str, dict] = {}
 
 def get_session_state(session_id: str) -> dict:
     """Devuelve o inicializa el dict de estado para la sesión."""
-    return _sessions.setdefault(session_id, {})
+    with _LOCK:
+        return _sessions.setdefault(session_id, {})
+
+
+# ------------- 3. Sesión en curso (X-Session / Streamlit) ---------
+# agent.responder_pregunta fija la sesión del turno; las tools, que sólo
+# reciben `msg`, leen su estado (historial, documento activo, pendientes)
+# con current_session() en lugar de globals del módulo compartidos por
+# todas las peticiones. asyncio.to_thread copia el contexto al hilo.
+DEFAULT_SESSION = "default"
+_CURRENT: ContextVar[str] = ContextVar("session_id", default=DEFAULT_SESSION)
+
+
+def current_session() -> str:
+    return _CURRENT.get()
+
+
+@contextmanager
+def use_session(session_id: str | None):
+    token = _CURRENT.set(session_id or DEFAULT_SESSION)
+    try:
+        yield
+    finally:
+        _CURRENT.reset(token)
+
+
+def session_state() -> dict:
+    return get_session_state(current_session())
+
+
+def session_memory() -> ConversationBufferMemory:
+    return get_conversation_memory(current_session())
 
 
 # ──────────────────── API legacy: active_doc ──────────────────────
@@ -0,0 +1,106 @@
+"""
+metadata_index.py
+-----------------
+Índice invertido  campo → valor → ids FAISS  para pre-filtrar búsquedas.
+
+Antes `search_by_text(..., filtro={'Materia': 'Penal'})` pedía k vecinos y
+luego descartaba los que no cumplían el filtro (menos de k resultados y
+distancias calculadas de más). Con este índice se obtiene primero el
+subconjunto de ids que cumplen el filtro y la búsqueda k-NN se hace sólo
+sobre él (IDSelector de FAISS, o fuerza bruta directa si el subconjunto es
+pequeño y el índice es plano).
+
+Campos indexados: Materia, Sala, Tribunal, TipoFallo y AnioDecision
+(año de FechaDecision). Un valor de filtro puede ser una lista (OR).
+"""
+
+from __future__ import annotations
+import time, logging
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+PREFILTER_FIELDS = ("Materia", "Sala", "Tribunal", "TipoFallo", "AnioDecision")
+BRUTE_FORCE_MAX  = 20_000      # subconjuntos ≤ esto en índice plano → distancia directa
+
+
+def _norm_value(v) -> str:
+    return str(v).strip()
+
+
+def _field_values(meta: dict) -> Dict[str, str]:
+    out = {f: _norm_value(meta[f]) for f in PREFILTER_FIELDS[:-1] if meta.get(f) not in (None, "")}
+    fecha = str(meta.get("FechaDecision") or "")
+    if fecha[:4].isdigit():
+        out["AnioDecision"] = fecha[:4]
+    return out
+
+
+class MetadataIndex:
+    def __init__(self, postings: Dict[str, Dict[str, np.ndarray]], ntotal: int):
+        self.postings = postings
+        self.ntotal = ntotal
+
+    @classmethod
+    def from_faiss(cls, db) -> "MetadataIndex":
+        """Recorre el docstore una vez y arma las listas de ids (ordenadas)."""
+        t0 = time.perf_counter()
+        tmp: Dict[str, Dict[str, List[int]]] = {f: {} for f in PREFILTER_FIELDS}
+        for faiss_id, store_id in db.index_to_docstore_id.items():
+            doc = db.docstore.search(store_id)
+            for field, val in _field_values(getattr(doc, "metadata", None) or {}).items():
+                tmp[field].setdefault(val, []).append(faiss_id)
+        postings = {
+            f: {v: np.asarray(sorted(ids), dtype="int64") for v, ids in vals.items()}
+            for f, vals in tmp.items()
+        }
+        log.info("Índice de metadatos: %d valores en %.2fs",
+                 sum(len(v) for v in postings.values()), time.perf_counter() - t0)
+        return cls(postings, db.index.ntotal)
+
+    def can_filter(self, filtro: dict | None) -> bool:
+        return bool(filtro) and all(k in self.postings for k in filtro)
+
+    def ids_for(self, filtro: dict) -> np.ndarray:
+        """Intersección (AND entre campos, OR dentro de una lista de valores)."""
+        result = None
+        for field, wanted in filtro.items():
+            vals = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            lists = [self.postings[field].get(_norm_value(v)) for v in vals]
+            ids = np.unique(np.concatenate([l for l in lists if l is not None] or
+                                           [np.empty(0, dtype="int64")]))
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+            if not len(result):
+                break
+        return result if result is not None else np.empty(0, dtype="int64")
+
+
+# ───────────────────── búsqueda restringida a un subconjunto ─────────────
+def _selector_params(index: faiss.Index, sel) -> faiss.SearchParameters:
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=sel, nprobe=ivf.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=sel)
+
+
+def search_subset(index: faiss.Index, q: np.ndarray, k: int,
+                  ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """k-NN de `q` (1×d) sólo entre `ids`. Devuelve (distancias, ids)."""
+    if not len(ids):
+        return np.empty(0, dtype="float32"), np.empty(0, dtype="int64")
+
+    if isinstance(index, faiss.IndexFlat) and len(ids) <= BRUTE_FORCE_MAX:
+        xb = index.reconstruct_batch(ids)
+        d = ((xb - q) ** 2).sum(axis=1)
+        top = np.argsort(d)[:k]
+        return d[top], ids[top]
+
+    sel = faiss.IDSelectorBatch(ids)
+    D, I = index.search(q, k, params=_selector_params(index, sel))
+    keep = I[0] != -1
+    return D[0][keep], I[0][keep]
@@ -0,0 +1,110 @@
+"""
+pdf_extract.py
+--------------
+Extracción de texto de PDFs (PyMuPDF + OCR Tesseract de respaldo).
+
+Vive en su propio módulo, sin conexión SQL ni estado global pesado, para
+que los workers de un ProcessPoolExecutor puedan importarlo barato: la
+configuración de Tesseract se aplica al importar, también en cada worker.
+
+    extract_markdown(pdf_bytes)            → Markdown (pymupdf4llm), OCR si vacío
+    extract_text_from_pdf_bytes(pdf_bytes) → texto plano, OCR página a página
+"""
+
+import io, os, time
+import fitz  # PyMuPDF
+import pymupdf, pymupdf4llm
+from PIL import Image
+import pytesseract
+
+# Configurar ruta de Tesseract manualmente
+TESSERACT_CMD = (
+    r"C:\Users\su-samfernandez\PycharmProjects\ExtractorDeInvolucradosPJ\tesseract.exe"
+)
+os.environ["TESSERACT_CMD"] = TESSERACT_CMD
+os.environ["TESSDATA_PREFIX"] = os.path.join(os.path.dirname(TESSERACT_CMD), "tessdata")
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD  # línea clave
+
+
+def extract_markdown(pdf_bytes: bytes, ocr_fallback=True) -> str:
+    doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+    # ⇣ extrae a Markdown; page_chunks=True devuelve lista/dicts si prefieres
+    md = pymupdf4llm.to_markdown(
+        doc,
+        page_chunks=False,      # True ⇒ dicta por página
+        ignore_images=True,     # no insertes imágenes como base64
+        table_strategy="lines", # detecta tablas clásicas
+        show_progress=False
+    )  # ⇒ str con \n\n### Encabezados, listas, tablas ...
+    doc.close()
+
+    # Fallback: si no encontró texto y quieres OCR
+    if ocr_fallback and not md.strip():
+        ocr_pages = []
+        doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+        for page in doc:
+            pix = page.get_pixmap(dpi=300)
+            img = Image.open(io.BytesIO(pix.tobytes("png")))
+            ocr_pages.append(pytesseract.image_to_string(img))
+        doc.close()
+        md = "\n".join(ocr_pages)
+
+    return md
+
+
+def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    all_text = []
+    for page in doc:
+        text = page.get_text("text")
+        if text.strip():
+            all_text.append(text)
+        else:
+            pix = page.get_pixmap(dpi=300)
+            img = Image.open(io.BytesIO(pix.tobytes("png")))
+            ocr_text = pytesseract.image_to_string(img)
+            all_text.append(ocr_text)
+    doc.close()
+    return "\n".join(all_text).strip()
+
+
+def extract_markdown_timed(pdf_bytes: bytes) -> tuple[str, float]:
+    """
+    extract_markdown + segundos de reloj que tardó en el worker (para
+    reportar por etapa). No es tiempo de CPU: Tesseract corre en un
+    subproceso y process_time() no lo contaría.
+    """
+    t0 = time.perf_counter()
+    md = extract_markdown(pdf_bytes)
+    return md, time.perf_counter() - t0
+
+
+# ───────────── por página: capa de texto + OCR sólo donde falta ─────────────
+def text_layer(pdf_bytes: bytes) -> tuple[list[str], list[int]]:
+    """
+    Lee la capa de texto de cada página → (textos_por_página, [nº de las
+    páginas sin texto]). No rasteriza nada: eso lo hace iter_scans bajo demanda.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    texts, scans = [], []
+    for i, page in enumerate(doc):
+        text = page.get_text("text")
+        texts.append(text)
+        if not text.strip():
+            scans.append(i)
+    doc.close()
+    return texts, scans
+
+
+def iter_scans(pdf_bytes: bytes, pages: list[int], dpi: int = 300):
+    """Genera (nº_página, png) de una en una: en memoria sólo la página actual."""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        for i in pages:
+            yield i, doc[i].get_pixmap(dpi=dpi).tobytes("png")
+    finally:
+        doc.close()
+
+
+def ocr_png(png: bytes) -> str:
+    return pytesseract.image_to_string(Image.open(io.BytesIO(png)))
@@ -2,7 +2,9 @@
 import streamlit
 from together import Together
 from typing import Literal
-from config import TOGETHER_API_KEY, LLM_MODEL_ID
+from config import (TOGETHER_API_KEY, LLM_MODEL_ID, INTENT_LOCAL_ENABLED, INTENT_LOCAL_THRESHOLD,
+                    ROUTER_CACHE_SIZE, ROUTER_CACHE_TTL)
+from ttl_cache import TTLCache
 LABELS = (
     "expediente",
     "resumen_doc",
@@ -131,20 +133,29 @@ SYSTEM_PROMPT = (
  por tema (sin IDs específicos), SIEMPRE devuelve `conversacional`.
  No devuelvas `relacionar_juris` para este tipo de pedidos."""
 )
-import math
-def detect_intent(msg: str) -> Literal[
-    "expediente",
-    "resumen_doc",
-    "consulta_doc",
-    "estadistica",
-    "relacionar_juris",
-    "consulta_concepto",
-    "auditoria_ley",
-    "comparar_ids",
-    "borrador_alerta",
-    "cronologia",
-    "conversacional"
-]:
+import math, logging
+log = logging.getLogger(__name__)
+
+# Llamadas resueltas por el clasificador local vs. por el LLM
+ROUTER_STATS = {"local": 0, "llm": 0}
+
+
+def _local_intent(msg: str) -> tuple[str, float] | None:
+    """(label, confianza) del k-NN local si supera INTENT_LOCAL_THRESHOLD, si no None."""
+    if not INTENT_LOCAL_ENABLED:
+        return None
+    try:
+        from intent_classifier import get_classifier
+        label, conf = get_classifier().predict(msg)
+    except Exception as e:                       # sin embedder → sólo LLM
+        log.warning("Clasificador local no disponible: %s", e)
+        return None
+    if conf >= INTENT_LOCAL_THRESHOLD and label in LABELS:
+        return label, conf
+    return None
+
+
+def _llm_intent(msg: str) -> tuple[str, float]:
     resp = client.chat.completions.create(
         model=LLM_MODEL_ID,
         messages=[
@@ -163,5 +174,58 @@ def detect_intent(msg: str) -> Literal[
     confidence = math.exp(logprob)  # 0-1
     print(confidence)
     if confidence < 0.8 or label not in LABELS:
-        return "conversacional"
-    return label
\ No newline at end of file
+        return "conversacional", confidence
+    return label, confidence
+
+
+# Resultado por mensaje normalizado: la UI / feedback / API reutilizan la
+# clasificación de responder_pregunta en lugar de volver a llamar al LLM
+_INTENT_CACHE = TTLCache(maxsize=ROUTER_CACHE_SIZE, ttl=ROUTER_CACHE_TTL)
+
+
+def _norm_msg(msg: str) -> str:
+    return " ".join(str(msg).lower().split())
+
+
+def classify_with_source(msg: str) -> tuple[str, float, str]:
+    """
+    (label, confianza 0-1, origen) para `msg`, memoizado por mensaje
+    normalizado. origen es "local" (k-NN) o "llm": sólo las etiquetas
+    "llm" sirven para reentrenar o evaluar el clasificador local.
+    """
+    key = _norm_msg(msg)
+    hit = _INTENT_CACHE.get(key)
+    if hit is not None:
+        return hit
+
+    local = _local_intent(msg)
+    if local is not None:
+        ROUTER_STATS["local"] += 1
+        result = (*local, "local")
+    else:
+        ROUTER_STATS["llm"] += 1
+        result = (*_llm_intent(msg), "llm")
+    _INTENT_CACHE.set(key, result)
+    return result
+
+
+def classify(msg: str) -> tuple[str, float]:
+    """(label, confianza 0-1) para `msg`, memoizado por mensaje normalizado."""
+    label, confidence, _ = classify_with_source(msg)
+    return label, confidence
+
+
+def detect_intent(msg: str) -> Literal[
+    "expediente",
+    "resumen_doc",
+    "consulta_doc",
+    "estadistica",
+    "relacionar_juris",
+    "consulta_concepto",
+    "auditoria_ley",
+    "comparar_ids",
+    "borrador_alerta",
+    "cronologia",
+    "conversacional"
+]:
+    return classify(msg)[0]
@@ -0,0 +1,145 @@
+"""
+semantic_cache.py
+-----------------
+Caché semántica de respuestas del agente.
+
+Una respuesta guardada se reutiliza cuando llega una pregunta:
+    • con la misma intención,
+    • con coseno ≥ SEMANTIC_CACHE_THRESHOLD respecto a la pregunta original,
+    • con los mismos números (artículo 69 ≠ artículo 96, Ley 63-17 ≠ 136-03),
+    • y la misma versión de índices (mtime de index_cases / index_laws):
+      al reconstruir cualquiera de los dos la caché se vacía sola.
+
+Expulsión LRU (SEMANTIC_CACHE_SIZE) y caducidad por entrada
+(SEMANTIC_CACHE_TTL). La clave es sólo la pregunta: agent.py únicamente
+consulta y guarda turnos de SEMANTIC_CACHE_INTENTS cuya tool no lee ningún
+historial, de modo que la respuesta no depende de la conversación.
+"""
+
+from __future__ import annotations
+import re, threading, time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config import (SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_TTL,
+                    SEMANTIC_CACHE_THRESHOLD)
+from embed import get_embeddings
+from vectorstore import INDEX_CASES_DIR, INDEX_LAWS_DIR
+
+_NUM_RE = re.compile(r"\d+")
+
+
+def index_version() -> Tuple[int, ...]:
+    """mtime de los ficheros de index_cases e index_laws (0 si no existen)."""
+    out = []
+    for d in (INDEX_CASES_DIR, INDEX_LAWS_DIR):
+        for name in ("index.faiss", "index.pkl"):
+            try:
+                out.append((d / name).stat().st_mtime_ns)
+            except OSError:
+                out.append(0)
+    return tuple(out)
+
+
+def _numeros(text: str) -> frozenset:
+    return frozenset(n.lstrip("0") or "0" for n in _NUM_RE.findall(text))
+
+
+@dataclass
+class _Entry:
+    intent: str
+    vec: np.ndarray
+    nums: frozenset
+    answer: str
+    expires: float
+
+
+class SemanticCache:
+    def __init__(self, maxsize: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._matrix: Dict[str, Tuple[list, np.ndarray]] = {}   # intent → (ids, vectores)
+        self._version = index_version()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    # ───────────────────── internos (con lock) ─────────────────────
+    def _check_version(self) -> None:
+        v = index_version()
+        if v != self._version:
+            self._entries.clear()
+            self._matrix.clear()
+            self._version = v
+
+    def _drop(self, eid: int) -> None:
+        e = self._entries.pop(eid, None)
+        if e is not None:
+            self._matrix.pop(e.intent, None)
+
+    def _vectors(self, intent: str) -> Tuple[list, np.ndarray]:
+        if intent not in self._matrix:
+            ids = [i for i, e in self._entries.items() if e.intent == intent]
+            mat = (np.stack([self._entries[i].vec for i in ids])
+                   if ids else np.empty((0, 0), dtype="float32"))
+            self._matrix[intent] = (ids, mat)
+        return self._matrix[intent]
+
+    # ───────────────────── API ─────────────────────
+    def _embed(self, question: str) -> np.ndarray:
+        return np.asarray(get_embeddings().embed_query(question), dtype="float32")
+
+    def lookup(self, question: str, intent: str) -> Optional[str]:
+        q = self._embed(question)
+        nums = _numeros(question)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version()
+            ids, mat = self._vectors(intent)
+            if ids:
+                sims = mat @ q
+                for j in np.argsort(-sims):
+                    if sims[j] < self.threshold:
+                        break
+                    e = self._entries[ids[j]]
+                    if e.expires < now:
+                        continue
+                    if e.nums == nums:
+                        self._entries.move_to_end(ids[j])
+                        self.hits += 1
+                        return e.answer
+            self.misses += 1
+            return None
+
+    def store(self, question: str, intent: str, answer: str) -> None:
+        vec = self._embed(question)
+        with self._lock:
+            self._check_version()
+            now = time.monotonic()
+            for eid in [i for i, e in self._entries.items() if e.expires < now]:
+                self._drop(eid)
+            eid, self._next_id = self._next_id, self._next_id + 1
+            self._entries[eid] = _Entry(intent, vec, _numeros(question), answer, now + self.ttl)
+            self._matrix.pop(intent, None)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "items": len(self._entries),
+                "hit_rate": (self.hits / total) if total else 0.0}
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,53 @@
+"""
+sql_reader.py
+-------------
+Lectura paginada por clave (keyset) de tablas grandes de SQL Server.
+
+    for row in iter_keyset(conn, "IdDocumento, TextoPDF",
+                           "[Reportes].[IA].[JuritecaTrainingSample] s",
+                           where="s.TextoPDF IS NOT NULL", key="s.IdDocumento"):
+        ...
+
+iter_keyset_pages() devuelve las mismas filas agrupadas por página (para
+confirmar escrituras una vez por página).
+
+Cada página es un `SELECT TOP (n) … WHERE key > último ORDER BY key`: la
+memoria queda acotada a `page_size` filas, ninguna consulta mantiene un
+result set abierto entre páginas (la misma conexión puede escribir
+mientras tanto) y el recorrido es estable aunque las filas ya procesadas
+dejen de cumplir el WHERE.
+"""
+
+from __future__ import annotations
+from typing import Any, Iterator, List
+
+
+def iter_keyset(conn, columns: str, from_: str, where: str = "1 = 1",
+                key: str = "IdDocumento", page_size: int = 500,
+                after: Any = None) -> Iterator[Any]:
+    """Genera pyodbc.Row en orden de `key`, de `page_size` en `page_size`."""
+    for rows in iter_keyset_pages(conn, columns, from_, where, key, page_size, after):
+        yield from rows
+
+
+def iter_keyset_pages(conn, columns: str, from_: str, where: str = "1 = 1",
+                      key: str = "IdDocumento", page_size: int = 500,
+                      after: Any = None) -> Iterator[List[Any]]:
+    """Como iter_keyset, pero genera cada página como lista de pyodbc.Row."""
+    attr = key.split(".")[-1].strip("[]")
+    base = f"SELECT TOP (?) {columns} FROM {from_} WHERE ({where})"
+    last = after
+    while True:
+        cur = conn.cursor()
+        if last is None:
+            cur.execute(f"{base} ORDER BY {key}", page_size)
+        else:
+            cur.execute(f"{base} AND {key} > ? ORDER BY {key}", page_size, last)
+        rows = cur.fetchall()
+        cur.close()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last = getattr(rows[-1], attr)
@@ -107,10 +107,11 @@ def run(user_msg: str) -> str:
     if ident:
         cd._set_active({"NUC": ident, "NumeroTramite": ident, "DocumentID": ident})
 
-    if not cd.active_doc:
+    active_doc = cd.get_active()
+    if not active_doc:
         return "⚠️ No hay ninguna sentencia activa. Indica el número de caso."
 
-    did = cd._doc_id(cd.active_doc)
+    did = cd._doc_id(active_doc)
     if not did:
         return "⚠️ La sentencia activa no tiene identificador reconocible."
 
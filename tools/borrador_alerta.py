@@ -10,7 +10,7 @@ import json
 from datetime import datetime, timedelta
 import pandas as pd
 from together import Together
-from config import DATA_DIR, TOGETHER_API_KEY, LLM_MODEL_ID
+from config import DATA_DIR, TOGETHER_API_KEY, LLM_MODEL_ID, NUC_PATTERN
 
 # ── Carga plazos si existen ────────────────────────────────────────
 plazos_file = DATA_DIR / "Plazos.xlsx"
@@ -23,7 +23,7 @@ else:
 _client = Together(api_key=TOGETHER_API_KEY)
 
 # ── Regex para capturar NUC ────────────────────────────────────────
-_PAT_NUC = re.compile(r"\b\d{3}-\d{4}-[A-Z]{4}-\d{5}\b", re.I)
+_PAT_NUC = re.compile(NUC_PATTERN, re.I)
 
 # ── Función interna de alertas ────────────────────────────────────
 def _alertas(nuc: str) -> str:
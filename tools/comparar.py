@@ -3,12 +3,13 @@ import json
 from typing import List, Dict
 from together import Together
 from config import TOGETHER_API_KEY, LLM_MODEL_ID, K_RETRIEVE, SIM_THRESHOLD
-from vectorstore import search_by_vector, law_search         # ← law_search añadido
-from embed import BNEEmbeddings
+from vectorstore import law_search                           # ← law_search añadido
+from hybrid_search import hybrid_search
+from embed import get_embeddings
 
 # ──────────────────────────────────────────────────────────
 client = Together(api_key=TOGETHER_API_KEY)
-emb    = BNEEmbeddings()
+emb    = get_embeddings()
 
 # ─────────────── ESQUEMA JSON ─────────────────────────────
 _JSON_SCHEMA = """
@@ -99,9 +100,9 @@ def _md(data: Dict) -> str:
 
 # ─────────────── FUNCIÓN PRINCIPAL ───────────────────────
 def run(msg: str) -> str:
-    # 1. Recuperar precedentes
+    # 1. Recuperar precedentes (BM25 + FAISS, fusión RRF)
     q_vec = emb.embed_query(msg)
-    docs  = search_by_vector(q_vec, k=K_RETRIEVE * 4)
+    docs  = hybrid_search(msg, k=K_RETRIEVE * 4, q_vec=q_vec)
     if not docs:
         return "⚠️ No hallé precedentes relevantes en la base para esa consulta."
 
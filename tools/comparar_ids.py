@@ -3,13 +3,9 @@
 import re, json, textwrap
 from typing import Tuple
 from together import Together
-import pandas as pd
-from config import DATA_DIR, TOGETHER_API_KEY, LLM_MODEL_ID
-
-# ─── Cargar DataFrame con tus sentencias (mismo XLSX) ───────
-_df = pd.read_excel(DATA_DIR / "output (1).xlsx")
-_df["NUC"] = _df["NUC"].astype(str).str.lower()
-_df["IdDocumento"] = _df["IdDocumento"].astype(str).str.lower()
+from config import TOGETHER_API_KEY, LLM_MODEL_ID, NUC_PATTERN
+from case_catalog import catalog          # catálogo compartido (texto vía mmap)
+from id_resolver import resolver          # índices hash NUC / IdDocumento
 
 # ─── Cliente LLM ────────────────────────────────────────────
 client = Together(api_key=TOGETHER_API_KEY)
@@ -34,7 +30,7 @@ la siguiente estructura:
 MAX_CHARS = 40_000     # límite para cada texto en el prompt
 
 # ─── Helpers ───────────────────────────────────────────────
-_PAT_NUC    = re.compile(r"\b\d{3}-\d{4}-[A-Z]{4}-\d{5}\b", re.I)
+_PAT_NUC    = re.compile(NUC_PATTERN, re.I)
 _PAT_DOCID  = re.compile(r"\b\d{6,}\b")
 
 def _extract_two_ids(msg: str) -> Tuple[str, str] | None:
@@ -55,12 +51,10 @@ def _extract_two_ids(msg: str) -> Tuple[str, str] | None:
 
 def _get_text(doc_id: str) -> str | None:
     """Busca el texto correspondiente a un NUC o IdDocumento."""
-    row = _df[_df["NUC"].str.contains(doc_id, na=False)]
-    if row.empty:
-        row = _df[_df["IdDocumento"].str.contains(doc_id, na=False)]
-    if row.empty:
+    pos = resolver.resolve(doc_id)
+    if pos is None:
         return None
-    return row.iloc[0]["textoPDF"]
+    return catalog.text(pos)
 
 # ─── Función pública ───────────────────────────────────────
 def run(msg: str) -> str:
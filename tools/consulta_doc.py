@@ -1,6 +1,7 @@
 # tools/consulta_doc.py  — QA multi-llamada sobre la sentencia ACTIVA + LEYES
 """
-• Sigue usando los mismos chunks de la sentencia que resumen_doc (DATA_DIR/chunks/*.json).
+• Usa los chunks de la sentencia guardados por chunker en `chunk_store`
+  (blob mmap + índice por DocumentID/NUC/NumeroTramite).
 • Si el usuario pregunta algo y ya hay un documento activo, ahora también
   se consultan los artículos constitucionales y criterios jurisprudenciales
   embebidos en index_dir/index_laws.
@@ -14,44 +15,32 @@ Flujo:
 """
 
 from __future__ import annotations
-import os, json, re
+import re
 from typing import Optional
 
 from together import Together
-from config import TOGETHER_API_KEY, LLM_MODEL_ID, DATA_DIR
+from config import TOGETHER_API_KEY, LLM_MODEL_ID, NUC_PATTERN
 from vectorstore import law_search                       # ← NEW
-from memory import memory                      # para save_context
+from memory import session_memory, session_state   # estado de la sesión en curso
 
 # ───────────────────────── LLM ──────────────────────────
 _client = Together(api_key=TOGETHER_API_KEY)
 
 # ─────────────── Estado en memoria ─────────────────────
-active_doc: Optional[dict] = None
+# El documento activo es de la sesión (memory.session_state()["active_doc"]):
+# dos usuarios concurrentes no se pisan la sentencia activa.
+def get_active():
+    return session_state().get("active_doc")
 
-# ────────────── CARGA DE CHUNKS (idéntico a resumen_doc) ──────────────
-CHUNKS_DIR = os.path.join(DATA_DIR, "chunks")
-docs_map: dict[str, list[str]] = {}
+# ────────────── CHUNKS (almacén mmap compartido con chunker) ──────────────
+# docs_map.get(clave) → lista de textos; lectura por offset, sin carga previa
+from chunk_store import chunk_store as docs_map
 
-for fname in os.listdir(CHUNKS_DIR):
-    if not fname.endswith(".json"):
-        continue
-    with open(os.path.join(CHUNKS_DIR, fname), "r", encoding="utf-8") as f:
-        entry = json.load(f)
-
-    md   = entry.get("metadata", {})
-    text = entry.get("text", "")
-
-    for key in ("NUC", "NumeroTramite", "IdDocumento", "DocumentID"):
-        k = str(md.get(key, "")).lower().lstrip("auto:").strip(" _.,")
-        if k:
-            docs_map.setdefault(k, []).append(text)
-
-    # ── y al activar desde el texto/historial
 # ────────────── ID helpers ────────────────────────────────────────────
 ID_PATTERN = re.compile(
-    r"""  # 034-2020-ECON-00189   |   123456
-(?:\b\d{3}-\d{4}-[A-Z]{4}-\d{5}\b   # NUC / IdDocumento con guiones
-        |     \b\d{6,}\b)                   # solo números (≥6)
+    rf"""  # 034-2020-ECON-00189   |   123456
+(?:{NUC_PATTERN}   # NUC / IdDocumento con guiones
+        |     \b\d{{6,}}\b)                   # solo números (≥6)
     """,
     re.VERBOSE | re.IGNORECASE,
 )
@@ -72,8 +61,7 @@ def _doc_id(doc) -> Optional[str]:
     return None
 
 def _set_active(doc):
-    global active_doc
-    active_doc = doc
+    session_state()["active_doc"] = doc
 
 # ────────────── QA helpers ────────────────────────────────────────────
 MAX_CHARS_PER_CALL = 100_000             # ≈ 25 000 tokens
@@ -143,16 +131,13 @@ def _build_context_leyes(pregunta: str) -> str:
 
 # ─────────── API principal ─────────────────────────────
 def run(user_msg: str) -> str:
-    global active_doc
-    try:
-        from agent import history
-    except:
-        history = memory.load_memory_variables({})
+    history = session_state().get("history") or session_memory().load_memory_variables({})
     ident = extract_identifier(user_msg) or extract_identifier(str(history))
     # ── y al activar desde el texto/historial, límpialo igual:
     if ident:
         ident_n = ident.lower().strip(" _.,")
         _set_active({"NUC": ident_n, "NumeroTramite": ident_n, "DocumentID": ident_n})
+    active_doc = get_active()
     if not active_doc:
         return "⚠️ No hay ninguna sentencia activa. Indica el número de caso."
 
@@ -4,52 +4,59 @@ tools/conversacional.py
 Fallback genérico: responde preguntas libres consultando simultáneamente
 
   • Base de leyes      → law_search()
-  • Base de sentencias → search_by_vector()
+  • Base de sentencias → hybrid_search() (BM25 + FAISS)
   • Web                → DuckDuckGoSearchAPIWrapper.results()
 
 Devuelve Markdown con citas numeradas [n] que el LLM genera
 a partir de los fragmentos suministrados en el prompt.
 """
 from __future__ import annotations
-import logging, json, textwrap
-from typing import List, Dict, Any
+import asyncio, logging, json, textwrap, time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import AsyncIterator, List, Dict, Any
 
-from together import Together
+from together import AsyncTogether, Together
 from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
 
-from config       import TOGETHER_API_KEY, LLM_MODEL_ID, K_RETRIEVE
-from vectorstore  import law_search, search_by_vector
-from embed        import BNEEmbeddings
+from config       import TOGETHER_API_KEY, LLM_MODEL_ID, K_RETRIEVE, CTX_DEADLINES
+from vectorstore  import law_search_by_vector
+from hybrid_search import hybrid_search
+from embed        import get_embeddings
 from memory import memory
 history = memory.load_memory_variables({})
 # ────────────────────── inicialización ──────────────────────
 log     = logging.getLogger(__name__)
 client  = Together(api_key=TOGETHER_API_KEY)
-emb     = BNEEmbeddings()
+aclient = AsyncTogether(api_key=TOGETHER_API_KEY)   # streaming (AGENTapi /qa/stream)
+emb     = get_embeddings()
 _DUCK   = DuckDuckGoSearchAPIWrapper()   # motor web
+# Fuentes de contexto en paralelo; holgura para llamadas web abandonadas
+_POOL   = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ctx")
 
 # ───────────────────── helpers ──────────────────────
-def _collect_context(
-    question: str,
-    k_cases: int = 4,
-    k_laws:  int = 4,
-    k_web:   int = 3
-) -> List[Dict[str, Any]]:
-    """Busca contexto híbrido (sentencias, leyes, web) y lo devuelve normalizado."""
-    ctx: List[Dict[str, Any]] = []
+# agent.py añade el historial tras este separador
+_HIST_SEP = "\n\nHistorial de conversaciones:"
 
-    # 1) Sentencias (vector similarity)
-    q_vec = emb.embed_query(question)
-    hits  = search_by_vector(q_vec, k=k_cases)
-    for d in hits:
-        ctx.append({
-            "type": "case",
-            "id":   d.metadata.get("NUC") or d.metadata.get("IdDocumento") or "s/d",
-            "text": d.page_content         # recorte para tokens
-        })
 
-    # 2) Leyes / criterios
-    for d in law_search(question, k=k_laws):
+def _pregunta(msg: str) -> str:
+    """El mensaje del usuario sin el historial añadido por el agente."""
+    return msg.split(_HIST_SEP, 1)[0].strip()
+
+
+def _case_hits(question: str, q_vec, k: int) -> List[Dict[str, Any]]:
+    """Sentencias (BM25 sobre la pregunta + similitud vectorial, fusión RRF)."""
+    return [{
+        "type": "case",
+        "id":   d.metadata.get("NUC") or d.metadata.get("IdDocumento") or "s/d",
+        "text": d.page_content         # recorte para tokens
+    } for d in hybrid_search(question, k=k, q_vec=q_vec,
+                             lexical_query=_pregunta(question))]
+
+
+def _law_hits(q_vec, k: int) -> List[Dict[str, Any]]:
+    """Leyes / criterios (mismo embedding que las sentencias)."""
+    out = []
+    for d in law_search_by_vector(q_vec, k=k):
         src = d.metadata.get("fuente")
         if src == "constitucion":
             tag = f"Art. {d.metadata.get('articulo')}"
@@ -57,25 +64,53 @@ def _collect_context(
             tag = f"Crit. {d.metadata.get('ID') or d.metadata.get('NumDecision')}"
         else:
             tag = src or "ley"
-        ctx.append({"type": "law", "id": tag, "text": d.page_content})
+        out.append({"type": "law", "id": tag, "text": d.page_content})
+    return out
 
-    # 3) Web snippets (DuckDuckGo)
-    try:
-        web_hits = _DUCK.results(f"{question} República Dominicana", k_web)
-    except Exception as e:
-        log.warning("DuckDuckGoSearch error: %s", e)
-        web_hits = []
 
-    for hit in web_hits:
+def _web_hits(question: str, k: int) -> List[Dict[str, Any]]:
+    """Web snippets (DuckDuckGo)."""
+    out = []
+    for hit in _DUCK.results(f"{question} República Dominicana", k):
         snippet = (hit.get("body") or hit.get("title") or "").strip()
         if not snippet:
             continue
-        ctx.append({
+        out.append({
             "type": "web",
             "id":   hit.get("href", "url-desconocida"),
             "text": snippet[:300]               # recorte
         })
+    return out
+
+
+def _collect_context(
+    question: str,
+    k_cases: int = 4,
+    k_laws:  int = 4,
+    k_web:   int = 3
+) -> List[Dict[str, Any]]:
+    """
+    Busca contexto híbrido (sentencias, leyes, web) y lo devuelve normalizado.
+    Las tres fuentes corren en paralelo; cada una tiene su plazo en
+    CTX_DEADLINES y la que no llega a tiempo se descarta (no se espera).
+    El embedding de la pregunta se calcula una sola vez y se comparte.
+    """
+    t0 = time.perf_counter()
+    futs = {"web": _POOL.submit(_web_hits, question, k_web)}   # no necesita embedding
+    q_vec = emb.embed_query(question)
+    futs["cases"] = _POOL.submit(_case_hits, question, q_vec, k_cases)
+    futs["laws"]  = _POOL.submit(_law_hits, q_vec, k_laws)
 
+    ctx: List[Dict[str, Any]] = []
+    for source in ("cases", "laws", "web"):                   # orden del prompt
+        remaining = CTX_DEADLINES[source] - (time.perf_counter() - t0)
+        try:
+            ctx.extend(futs[source].result(timeout=max(0.0, remaining)))
+        except FutureTimeout:
+            log.warning("Fuente %s descartada: superó %.1fs", source, CTX_DEADLINES[source])
+        except Exception as e:
+            log.warning("Fuente %s error: %s", source, e)
+    log.debug("Contexto conversacional en %.2fs", time.perf_counter() - t0)
     return ctx
 
 
@@ -86,16 +121,15 @@ def _block_for_prompt(ctx: List[Dict[str, Any]]) -> str:
     )
 
 # ───────────────────── API principal ──────────────────────
-def run(
+_LLM_KW = dict(model=LLM_MODEL_ID, temperature=0.0, top_k=0, top_p=1, max_tokens=1400)
+
+def _build_messages(
     msg: str,
-    *,
     k_cases: int = 4,
     k_laws:  int = 4,
     k_web:   int = 3
-) -> str:
-    """
-    Conversación libre con recuperación híbrida.
-    """
+) -> List[Dict[str, str]]:
+    """Recupera el contexto (bloqueante) y arma los mensajes para el LLM."""
     # 1) Buscar contexto
     ctx         = _collect_context(msg, k_cases, k_laws, k_web)
     refs_block  = _block_for_prompt(ctx)
@@ -124,17 +158,36 @@ def run(
     """).strip()
 
     log.debug("Prompt conversacional:\n%s", user[:1000])
-    rsp = client.chat.completions.create(
-        model=LLM_MODEL_ID,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user",   "content": user},
-        ],
-        temperature=0.0,
-        top_k=0, top_p=1,
-        max_tokens=1400,
-    )
+    return [
+        {"role": "system", "content": system},
+        {"role": "user",   "content": user},
+    ]
+
+def run(
+    msg: str,
+    *,
+    k_cases: int = 4,
+    k_laws:  int = 4,
+    k_web:   int = 3
+) -> str:
+    """
+    Conversación libre con recuperación híbrida.
+    """
+    messages = _build_messages(msg, k_cases, k_laws, k_web)
+    rsp = client.chat.completions.create(messages=messages, **_LLM_KW)
     return rsp.choices[0].message.content.strip()
 
+async def astream(msg: str) -> AsyncIterator[str]:
+    """
+    Igual que run(), pero emite los tokens a medida que el LLM los genera.
+    La recuperación (FAISS, web) corre en el executor por defecto del loop.
+    """
+    messages = await asyncio.to_thread(_build_messages, msg)
+    stream = await aclient.chat.completions.create(messages=messages, stream=True, **_LLM_KW)
+    async for chunk in stream:
+        d = chunk.choices[0].delta if chunk.choices else None
+        if d and d.content:
+            yield d.content
+
 
-__all__ = ["run"]
+__all__ = ["run", "astream"]
@@ -24,14 +24,14 @@ import re, json, textwrap, pandas as pd
 from typing import Dict, List
 from together import Together
 
-from config import TOGETHER_API_KEY, LLM_MODEL_ID
+from config import TOGETHER_API_KEY, LLM_MODEL_ID, NUC_PATTERN
 from trigger_search_documents import colectar_texto
 
 # ────────────────────────────── LLM ─────────────────────────────────────
 _client = Together(api_key=TOGETHER_API_KEY)
 
 # ───────────────────── RegEx para NUC ───────────────────────────────────
-_PAT_NUC = re.compile(r"\b\d{3}-\d{4}-[A-Z]{4}-\d{5}\b", re.I)
+_PAT_NUC = re.compile(NUC_PATTERN, re.I)
 
 # ───────────────────── JSON-SCHEMA que el LLM debe respetar ─────────────
 _JSON_SCHEMA = """
@@ -99,8 +99,10 @@ def run(user_msg: str) -> str:
     #       • Intentamos localizar una fila “principal” (la que venga en el
     #         DataFrame con tipo_fallo o, si no, simplemente la primera).
     try:
-        from tools.expediente import _match_row
-        row_main = _match_row(user_msg)              # fila exacta (si existe)
+        from case_catalog import catalog
+        from id_resolver import resolver
+        pos = resolver.resolve_in_text(user_msg)     # fila exacta (si existe)
+        row_main = catalog.meta.iloc[pos] if pos is not None else None
     except Exception:
         row_main = None
 
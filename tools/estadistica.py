@@ -4,39 +4,21 @@ tools.estadistica
 Consultas tipo “¿cuántos casos…?” sobre el DataFrame de metadatos.
 
 • Usa ChatTogether vía langchain-experimental.
-• Limpia nombres de columnas y rellena las que falten, de modo que
-  no reviente si el Excel tiene encabezados distintos.
+• Lee los metadatos del catálogo compartido (case_catalog), que ya
+  limpia encabezados y rellena columnas faltantes; sin textoPDF.
 """
 
 import pandas as pd
 from langchain_experimental.agents import create_pandas_dataframe_agent
 from langchain_together import ChatTogether
-from config import DATA_DIR, TOGETHER_API_KEY, LLM_MODEL_ID
+from config import TOGETHER_API_KEY, LLM_MODEL_ID
+from case_catalog import catalog
 
-# ── 1. Cargar Excel completo y normalizar encabezados ─────────────
-df_meta = pd.read_excel(DATA_DIR / "output (1).xlsx")
-
-# Quitar espacios y uniformar mayúsculas
-df_meta.columns = [c.strip() for c in df_meta.columns]
-
-# Mapas de alias posibles → nombre estándar
-ALIAS = {
-    "nuc": "NUC",
-    "número de caso": "NUC",
-    "id_documento": "IdDocumento",
-    "iddocumento": "IdDocumento",
-}
-
-df_meta.rename(columns={k: v for k, v in ALIAS.items() if k in df_meta.columns}, inplace=True)
-
-# Asegurar columnas requeridas
+# ── 1. Metadatos del catálogo compartido (encabezados ya normalizados) ──
 NEEDED = ["IdDocumento", "NUC", "Materia", "Asunto", "TipoFallo"]
-for col in NEEDED:
-    if col not in df_meta.columns:
-        df_meta[col] = ""
 
 # Mantener solo las necesarias (otras no molestan, pero aclaramos)
-df_meta = df_meta[NEEDED]
+df_meta = catalog.meta[NEEDED]
 
 # ── 2. Crear agente de pandas (Together) ──────────────────────────
 llm = ChatTogether(
@@ -15,12 +15,12 @@ from config import (
     TOGETHER_API_KEY, LLM_MODEL_ID,
     EMBED_MODEL_ID, SIM_THRESHOLD_est, GREY_MARGIN,
 )
-from embed import BNEEmbeddings
+from embed import get_embeddings
 from semantic_search import search_with_scores
 from together import Together
 
 # ─── LLM & embedder ─────────────────────────────────────────────────
-embedder = BNEEmbeddings()
+embedder = get_embeddings()
 llm      = Together(api_key=TOGETHER_API_KEY)
 
 # ─── Helpers IDs ────────────────────────────────────────────────────
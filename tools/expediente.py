@@ -7,30 +7,17 @@ recupera los chunks relacionados y genera un JSON con:
   - considerandos
   - fallo_literal
 """
-import re, textwrap
+import textwrap
 import json
 import pandas as pd
 from together import Together
-from config import DATA_DIR, TOGETHER_API_KEY, LLM_MODEL_ID
-from vectorstore import search_by_vector
-# ── 1. Cargar y normalizar DataFrame ───────────────────────────────
-_df = pd.read_excel(DATA_DIR / "output (1).xlsx")
+from config import TOGETHER_API_KEY, LLM_MODEL_ID
+# ── 1. Catálogo de casos compartido (metadatos en RAM, texto mmap) ──
+from case_catalog import catalog
+from id_resolver import resolver
 from typing import Dict, List
 
-# Normalizar nombres: quitar espacios y mantener mayúsculas/minúsculas exactas
-_df.columns = [c.strip() for c in _df.columns]
 # ── NUEVO JSON_SCHEMA AUTODOCUMENTADO ──────────────────────────────
-def _match_row(msg:str):
-    m = _PAT_NUC.search(msg)
-    if m is not None:
-        d = _df[_df["NUC"].str.contains(m.group(), na=False)]
-        if not d.empty: return d.iloc[0]
-    m = _PAT_DOCID.search(msg)
-    if m is not None:
-        d = _df[_df["IdDocumento"].astype(str).str.contains(m.group(), na=False)]
-        if not d.empty: return d.iloc[0]
-    return None
-
 def _md(data:Dict) -> str:
     db  = data["datos_basicos"]
     prt = data["partes"]
@@ -109,53 +96,14 @@ vacío si no aparece.
 
 TEXTO ↓↓↓
 """).strip()
-# Alias posibles → nombre estándar
-_ALIAS = {
-    "nuc": "NUC",
-    "numero de caso": "NUC",
-    "numeroexpediente": "NUC",
-    "iddocumento": "IdDocumento",
-    "id_documento": "IdDocumento",
-}
-rename_map = {}
-for alias, std in _ALIAS.items():
-    for col in list(_df.columns):
-        if col.lower().replace(" ", "") == alias:
-            rename_map[col] = std
-
-_df.rename(columns=rename_map, inplace=True)
-
-# Asegurar columnas mínimas
-REQUIRED = [
-    "NUC", "IdDocumento", "textoPDF",
-    "Materia", "Asunto", "TipoFallo"
-]
-for col in REQUIRED:
-    if col not in _df.columns:
-        _df[col] = ""
-
 # ── 2. Cliente LLM ─────────────────────────────────────────────────
 _client = Together(api_key=TOGETHER_API_KEY)
 
 # ── 3. Funciones internas ──────────────────────────────────────────
-_PAT_NUC    = re.compile(r"\b\d{3}-\d{4}-[A-Z]{4}-\d{5}\b", re.I)
-_PAT_DOCID  = re.compile(r"\b\d{6,}\b")
-
 def _match_row(msg: str) -> pd.Series | None:
-    text = msg.strip()
-    # Intentar NUC
-    m = _PAT_NUC.search(text)
-    if m:
-        df2 = _df[_df["NUC"].str.contains(m.group(), na=False)]
-        if not df2.empty:
-            return df2.iloc[0]
-    # Intentar IdDocumento
-    m2 = _PAT_DOCID.search(text)
-    if m2:
-        df2 = _df[_df["IdDocumento"].astype(str).str.contains(m2.group(), na=False)]
-        if not df2.empty:
-            return df2.iloc[0]
-    return None
+    """Fila del catálogo por NUC o IdDocumento (índices hash de id_resolver)."""
+    pos = resolver.resolve_in_text(msg.strip())
+    return catalog.row(pos) if pos is not None else None
 
 def run(msg: str) -> str:
     """
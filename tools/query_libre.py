@@ -9,6 +9,7 @@ from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
 from langchain.memory import ConversationBufferMemory
 
 from config import DATA_DIR, LLM_MODEL_ID, TOGETHER_API_KEY
+from memory import session_state
 from vectorstore import law_search                           # ← ya carga index_laws
 
 # ──────────────── LLM & search wrappers ───────────────────
@@ -20,7 +21,12 @@ _HISTORY_TURNS   = 4
 _SEARCH_TOP_K    = 20
 _CRIT_TOP_K      = 5
 
-memory: ConversationBufferMemory = ConversationBufferMemory(return_messages=False)
+def session_memory() -> ConversationBufferMemory:
+    """Memoria propia de esta tool para la sesión en curso."""
+    st = session_state()
+    if "query_libre_memory" not in st:
+        st["query_libre_memory"] = ConversationBufferMemory(return_messages=False)
+    return st["query_libre_memory"]
 
 # ──────────────── Carga Constitución en dict ──────────────
 CONST_PATH = Path(DATA_DIR) / "constitucion.csv"
@@ -82,6 +88,17 @@ def _answer_constitution(article_num: int) -> str:
         "_Fuente: Constitución (G.O. 10805-10-06-2015)._"
     )
 
+# ──────────────── Caché semántica (agent.py) ─────────────
+def cache_context() -> str:
+    """El historial que leería query_libre_run ahora mismo (vacío → cacheable)."""
+    return _last_turns(session_memory().buffer, _HISTORY_TURNS)
+
+
+def remember(question: str, respuesta: str) -> None:
+    """Registra un turno servido desde la caché para no desincronizar la memoria."""
+    session_memory().save_context({"input": question}, {"output": respuesta})
+
+
 # ──────────────── Entrada principal ──────────────────────
 def query_libre_run(question: str,
                     temperature: float = 0.0) -> str:
@@ -91,10 +108,11 @@ def query_libre_run(question: str,
         respuesta = _answer_constitution(art_num)
         if respuesta:
             # guarda en memoria y devuelve
-            memory.save_context({"input": question}, {"output": respuesta})
+            session_memory().save_context({"input": question}, {"output": respuesta})
             return respuesta
 
     # 1) Historial reciente
+    memory   = session_memory()
     hist_str = _last_turns(memory.buffer, _HISTORY_TURNS)
 
     # 2) Snippets externos
@@ -130,4 +148,4 @@ def query_libre_run(question: str,
     return respuesta
 
 
-__all__ = ["query_libre_run", "memory"]
+__all__ = ["query_libre_run", "session_memory", "cache_context", "remember"]
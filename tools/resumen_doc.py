@@ -15,8 +15,8 @@ from typing import Optional, List, Tuple, Dict
 from json import loads
 from together import Together
 
-from config import TOGETHER_API_KEY, LLM_MODEL_ID
-from memory import memory
+from config import TOGETHER_API_KEY, LLM_MODEL_ID, NUC_PATTERN
+from memory import session_memory, session_state
 from trigger_search_documents import colectar_texto
 
 client = Together(api_key=TOGETHER_API_KEY)
@@ -24,12 +24,12 @@ client = Together(api_key=TOGETHER_API_KEY)
 # ───────────────────────── utilidades de memoria/chat ────────────────────
 def _get_history_text() -> str:
     try:
-        return (memory.load_memory_variables({}).get("history") or "").strip()
+        return (session_memory().load_memory_variables({}).get("history") or "").strip()
     except Exception:
         return ""
 
 # ───────────────────────── extracción de señales ─────────────────────────
-NUC_RE      = re.compile(r"\b\d{3}-\d{4}-[A-Z0-9]{4}-\d{5}\b", re.I)
+NUC_RE      = re.compile(NUC_PATTERN, re.I)
 ALL_RE      = re.compile(r"\b(todos?|todo|completo|entero|todos los documentos|todos los trámites)\b", re.I)
 SENT_RE     = re.compile(r"\b(sentencia\s*final|solo\s+la?\s*sentencia|solo\s*sentencia|parte\s+dispositiva|dispositivo|fallo\s*final)\b", re.I)
 
@@ -43,18 +43,13 @@ def _extract_nuc(texts: List[str]) -> Optional[str]:
     return None
 
 # ───────────────────────── estado liviano de “pending” ───────────────────
-# Guardamos solo lo mínimo para no cargar memoria con textos.
-_PENDING: Optional[Dict] = None
-
+# Guardamos solo lo mínimo para no cargar memoria con textos, en el estado
+# de la sesión en curso (no en un global compartido por todas).
 def _set_pending(nuc: str, n_docs: int):
-    global _PENDING
-    _PENDING = {"nuc": nuc, "n_docs": n_docs}
+    session_state()["resumen_pending"] = {"nuc": nuc, "n_docs": n_docs}
 
 def _pop_pending() -> Optional[Dict]:
-    global _PENDING
-    p = _PENDING
-    _PENDING = None
-    return p
+    return session_state().pop("resumen_pending", None)
 
 # ───────────────────────── detección de sentencia final ──────────────────
 FINAL_HARD_HINT_COLS = ("TipoFallo", "TipoDocumento", "Tipo", "Clase")
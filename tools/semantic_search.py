@@ -10,12 +10,21 @@ if str(ROOT) not in sys.path:
 
 import vectorstore
 
-_idx        = vectorstore.vectordb.index                 # faiss.IndexFlatL2
-_id2store   = vectorstore.vectordb.index_to_docstore_id  # list[id]
-_docstore   = vectorstore.vectordb.docstore              # InMemoryDocstore
-
 def search_with_scores(vec: list[float], k: int = 10, filtro=None):
+    # Filtro sobre campos indexados → búsqueda sólo entre los ids que cumplen
+    if filtro:
+        hits = vectorstore.vectordb.search_prefiltered(vec, k, filtro)
+        if hits is not None:
+            return hits
+
+    db          = vectorstore.vectordb.get()      # carga perezosa del índice
+    _idx        = db.index                        # IndexFlatL2 o ANN (IVF/HNSW)
+    _id2store   = db.index_to_docstore_id         # list[id]
+    _docstore   = db.docstore                     # InMemoryDocstore
+
     q = np.asarray(vec, dtype="float32").reshape(1, -1)
+    if db._normalize_L2:                          # igual que search_prefiltered
+        faiss.normalize_L2(q)
     dists, idxs = _idx.search(q, k)
     results = []
     for dist, ix in zip(dists[0], idxs[0]):
@@ -1,51 +1,21 @@
 
-import os
-import pyodbc
+import atexit, threading, time
 import pandas as pd
 import requests
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
-import io
-import io, pymupdf, pymupdf4llm
-from PIL import Image
-import pytesseract
-
-def extract_markdown(pdf_bytes: bytes, ocr_fallback=True) -> str:
-    doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
-    # ⇣ extrae a Markdown; page_chunks=True devuelve lista/dicts si prefieres
-    md = pymupdf4llm.to_markdown(
-        doc,
-        page_chunks=False,      # True ⇒ dicta por página
-        ignore_images=True,     # no insertes imágenes como base64
-        table_strategy="lines", # detecta tablas clásicas
-        show_progress=False
-    )  # ⇒ str con \n\n### Encabezados, listas, tablas ...
-    doc.close()
-
-    # Fallback: si no encontró texto y quieres OCR
-    if ocr_fallback and not md.strip():
-        ocr_pages = []
-        doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
-        for page in doc:
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            ocr_pages.append(pytesseract.image_to_string(img))
-        doc.close()
-        md = "\n".join(ocr_pages)
-
-    return md
-
-# Configurar ruta de Tesseract manualmente
-TESSERACT_CMD = (
-    r"C:\Users\su-samfernandez\PycharmProjects\ExtractorDeInvolucradosPJ\tesseract.exe"
-)
-os.environ["TESSERACT_CMD"] = TESSERACT_CMD
-os.environ["TESSDATA_PREFIX"] = os.path.join(os.path.dirname(TESSERACT_CMD), "tessdata")
-pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD  # línea clave
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import DOWNLOAD_WORKERS, EXTRACT_WORKERS
+from db_pool import ConnectionPool
+from doc_text_cache import doc_text_cache
+# Extracción en módulo aparte: los workers del pool de procesos lo importan
+# sin abrir la conexión SQL de este módulo
+from pdf_extract import extract_markdown, extract_markdown_timed, extract_text_from_pdf_bytes
 
 # Configuración de conexión
-conn = pyodbc.connect(
+CONN_STR = (
     "DRIVER={ODBC Driver 18 for SQL Server};"
     "SERVER=192.168.0.133;"
     "DATABASE=DepositoDocumentos;"
@@ -55,50 +25,146 @@ conn = pyodbc.connect(
     "TrustServerCertificate=yes;"
     # opcional: "Timeout=5;"
 )
+# Una conexión por hilo (peticiones concurrentes de la API), abiertas bajo demanda
+pool = ConnectionPool(CONN_STR)
 
-cursor = conn.cursor()
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    all_text = []
-    for page in doc:
-        text = page.get_text("text")
-        if text.strip():
-            all_text.append(text)
-        else:
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            ocr_text = pytesseract.image_to_string(img)
-            all_text.append(ocr_text)
-    doc.close()
-    return "\n".join(all_text).strip()
-
-def colectar_texto(nuc):
-    # Leer los textos ya procesados
-    df = pd.read_sql(f"""
-    SELECT c.NUC, t.NumeroTramite, d.URL, d.FechaCreacion
-FROM DepositoDocumentos.SJ.casos c 
+# Parametrizada: SQL Server reutiliza el plan para cualquier NUC
+DOCUMENTOS_POR_NUC = """
+SELECT c.NUC, t.NumeroTramite, d.URL, d.FechaCreacion
+FROM DepositoDocumentos.SJ.casos c
 JOIN DepositoDocumentos.SJ.Tramites t ON t.IdCaso = c.IdCaso AND t.activo = 1
 JOIN DepositoDocumentos.SJ.Documentos d ON d.IdTramite = t.IdTramite AND d.activo = 1
-WHERE c.activo = 1 AND c.NUC = '{nuc}'
+WHERE c.activo = 1 AND c.NUC = ?
 ORDER BY d.FechaCreacion
-    """, conn)
-    # Procesar fila por fila
-    # Procesar fila por fila (robusto: siempre escribe una celda)
+"""
+
+# ──────────── HTTP: sesión con conexiones reutilizables ────────────
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=DOWNLOAD_WORKERS, pool_maxsize=DOWNLOAD_WORKERS,
+    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
+# ──────────── Pool de procesos para PDF → Markdown / OCR ────────────
+_EXTRACT_POOL: ProcessPoolExecutor | None = None
+_EXTRACT_LOCK = threading.Lock()       # colectar_texto corre en varios hilos de la API
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    global _EXTRACT_POOL
+    with _EXTRACT_LOCK:
+        if _EXTRACT_POOL is None:
+            _EXTRACT_POOL = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+            atexit.register(_EXTRACT_POOL.shutdown, wait=False, cancel_futures=True)
+        return _EXTRACT_POOL
+
+
+def _drop_extract_pool(broken: ProcessPoolExecutor) -> None:
+    """Un worker murió (OOM, PDF que tumba el parser) → el próximo uso crea otro pool."""
+    global _EXTRACT_POOL
+    with _EXTRACT_LOCK:
+        if _EXTRACT_POOL is broken:
+            _EXTRACT_POOL = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_extract(pdf_bytes: bytes):
+    """→ (future, pool que lo ejecuta); un pool ya roto se recrea una vez."""
+    ext_pool = _get_extract_pool()
+    try:
+        return ext_pool.submit(extract_markdown_timed, pdf_bytes), ext_pool
+    except BrokenProcessPool:
+        _drop_extract_pool(ext_pool)
+        ext_pool = _get_extract_pool()
+        return ext_pool.submit(extract_markdown_timed, pdf_bytes), ext_pool
+
+
+def _download(url: str) -> tuple[bytes, float]:
+    t0 = time.perf_counter()
+    response = _SESSION.get(url, timeout=(6, 25))  # (connect, read)
+    response.raise_for_status()
+    return response.content, time.perf_counter() - t0
+
+
+def colectar_texto(nuc):
+    """
+    Texto de todos los documentos del caso `nuc`, en orden de FechaCreacion.
+
+    Pipeline: caché en disco → descargas concurrentes (DOWNLOAD_WORKERS,
+    sesión HTTP compartida) → extracción en pool de procesos
+    (EXTRACT_WORKERS), que arranca en cuanto llega cada PDF. Los tiempos
+    por etapa quedan en df.attrs["tiempos"].
+    """
+    t_inicio = time.perf_counter()
+    # Documentos del caso
+    with pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(DOCUMENTOS_POR_NUC, str(nuc))
+        cols = [c[0] for c in cur.description]
+        df = pd.DataFrame.from_records([tuple(r) for r in cur.fetchall()], columns=cols)
+        cur.close()
+    t_sql = time.perf_counter() - t_inicio
+
+    # Robusto: siempre escribe una celda (texto="" si falla)
     df["texto_pdf"] = ""  # pre-crea la columna
+    pendientes = {}
     for idx, row in df.iterrows():
-        doc_id = row["NUC"]
-        url = row["URL"]
-        texto = ""
-        try:
-            print(f"Procesando ID {doc_id}…")
-            response = requests.get(url, timeout=(6, 25))  # (connect, read)
-            response.raise_for_status()
-            texto = extract_markdown(response.content) or ""
-            print(f"✅ Texto guardado para ID {doc_id} (len={len(texto)})")
-        except Exception as e:
-            print(f"❌ Error con ID {doc_id}: {e}")  # deja texto=""
-        df.at[idx, "texto_pdf"] = texto
+        texto = doc_text_cache.get(row["URL"], row["FechaCreacion"])
+        if texto is not None:
+            df.at[idx, "texto_pdf"] = texto
+        else:
+            pendientes[idx] = row
 
+    seg_descarga = seg_extraccion = 0.0
+    t_pipeline = time.perf_counter()
+    if pendientes:
+        extracciones = {}
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as dl:
+            descargas = {dl.submit(_download, row["URL"]): idx for idx, row in pendientes.items()}
+            for fut in as_completed(descargas):
+                idx = descargas[fut]
+                try:
+                    pdf_bytes, seg = fut.result()
+                    seg_descarga += seg
+                    fut_ext, ext_pool = _submit_extract(pdf_bytes)
+                    extracciones[fut_ext] = (idx, ext_pool)
+                except Exception as e:
+                    print(f"❌ Error descargando ID {df.at[idx, 'NUC']}: {e}")
+        t_descargas = time.perf_counter() - t_pipeline
+
+        for fut in as_completed(extracciones):
+            idx, ext_pool = extracciones[fut]
+            row = pendientes[idx]
+            try:
+                texto, seg = fut.result()
+                texto = texto or ""
+                seg_extraccion += seg
+                doc_text_cache.put(row["URL"], row["FechaCreacion"], texto)
+                df.at[idx, "texto_pdf"] = texto
+                print(f"✅ Texto guardado para ID {row['NUC']} (len={len(texto)})")
+            except BrokenProcessPool as e:
+                _drop_extract_pool(ext_pool)
+                print(f"❌ Error con ID {row['NUC']}: pool de extracción caído ({e})")
+            except Exception as e:
+                print(f"❌ Error con ID {row['NUC']}: {e}")  # deja texto=""
+    else:
+        t_descargas = 0.0
+
+    tiempos = {
+        "documentos": len(df), "en_cache": len(df) - len(pendientes),
+        "sql_s": t_sql,
+        "descarga_s": t_descargas, "descarga_suma_s": seg_descarga,
+        "extraccion_s": time.perf_counter() - t_pipeline - t_descargas,
+        "extraccion_suma_s": seg_extraccion,
+        "total_s": time.perf_counter() - t_inicio,
+    }
+    df.attrs["tiempos"] = tiempos
+    print("⏱️ colectar_texto({}): {documentos} docs ({en_cache} en caché) · SQL {sql_s:.2f}s · "
+          "descarga {descarga_s:.2f}s (Σ {descarga_suma_s:.2f}s) · extracción +{extraccion_s:.2f}s "
+          "(Σ workers {extraccion_suma_s:.2f}s) · total {total_s:.2f}s".format(nuc, **tiempos))
     return df
 
-print(colectar_texto(nuc="034-2021-ECON-00366"))
\ No newline at end of file
+
+if __name__ == "__main__":
+    print(colectar_texto(nuc="034-2021-ECON-00366"))
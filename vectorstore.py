@@ -1,57 +1,140 @@
 """
-vectorstore.py — Carga el índice FAISS y expone helpers de búsqueda.
+vectorstore.py — Índices FAISS (carga perezosa) y helpers de búsqueda.
+
+Importar este módulo ya NO deserializa los índices: `vectordb` y `lawdb`
+son manejadores `LazyFAISS` que llaman a FAISS.load_local en la primera
+búsqueda (o al invocar warmup() explícitamente) y registran cuánto tardó.
+Cualquier atributo del FAISS real (index, docstore, …) se delega.
 """
 
+import logging, threading, time
+from typing import Callable
+
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from config import INDEX_DIR
-from embed import BNEEmbeddings      # ⬅️  nuevo wrapper
+from embed import get_embeddings
+from ann_index import apply_search_params
+from metadata_index import MetadataIndex, search_subset
+
+log = logging.getLogger(__name__)
 
-emb = BNEEmbeddings()
 # Ruta correcta al sub-directorio que contiene index.faiss / index.pkl
 INDEX_CASES_DIR = INDEX_DIR / "index_cases"   # ✅
+INDEX_LAWS_DIR  = INDEX_DIR / "index_laws"
 
-vectordb = FAISS.load_local(
-    str(INDEX_CASES_DIR),                     # ← aquí el path correcto
-    embeddings=emb,
-    allow_dangerous_deserialization=True,
-)
 
+class LazyFAISS:
+    """Carga un índice FAISS local la primera vez que se necesita."""
 
-# ✏️ EDITA la cabecera
-from langchain_community.vectorstores import FAISS
-from config import INDEX_DIR
-from embed import BNEEmbeddings, get_embeddings       # ➕ NUEVO
+    def __init__(self, name: str, path, embeddings_factory: Callable):
+        self.name = name
+        self.path = path
+        self._embeddings_factory = embeddings_factory
+        self._db: FAISS | None = None
+        self._meta_idx: MetadataIndex | None = None
+        self._lock = threading.Lock()
+        self.load_seconds: float | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._db is not None
+
+    def get(self) -> FAISS:
+        if self._db is None:
+            with self._lock:
+                if self._db is None:            # doble chequeo (hilos)
+                    t0 = time.perf_counter()
+                    self._db = FAISS.load_local(
+                        str(self.path),
+                        embeddings=self._embeddings_factory(),
+                        allow_dangerous_deserialization=True,
+                    )
+                    apply_search_params(self._db.index)   # nprobe / efSearch (ANN)
+                    self.load_seconds = time.perf_counter() - t0
+                    log.info("%s cargado en %.2fs (%d vectores)",
+                             self.name, self.load_seconds, self._db.index.ntotal)
+        return self._db
+
+    def metadata_index(self) -> MetadataIndex:
+        """Índice invertido de metadatos (se arma en el primer filtro)."""
+        db = self.get()
+        mi = self._meta_idx
+        if mi is None or mi.ntotal != db.index.ntotal:
+            with self._lock:
+                if self._meta_idx is None or self._meta_idx.ntotal != db.index.ntotal:
+                    self._meta_idx = MetadataIndex.from_faiss(db)
+                mi = self._meta_idx
+        return mi
 
+    def search_prefiltered(self, vec, k: int, filtro: dict):
+        """
+        (Document, distancia) de los k más cercanos entre los que cumplen
+        `filtro`; None si algún campo del filtro no está indexado.
+        """
+        mi = self.metadata_index()
+        if not mi.can_filter(filtro):
+            return None
+        db = self.get()
+        q = np.asarray(vec, dtype="float32").reshape(1, -1)
+        if db._normalize_L2:
+            faiss.normalize_L2(q)
+        dists, ids = search_subset(db.index, q, k, mi.ids_for(filtro))
+        return [
+            (db.docstore.search(db.index_to_docstore_id[int(i)]), float(d))
+            for d, i in zip(dists, ids)
+        ]
 
-# # ➕ NUEVO  índice de leyes
-# try:
-#     lawdb = FAISS.load_local(
-#         str(INDEX_DIR/"index_laws"),
-#         embeddings=get_embeddings("laws"),
-#         allow_dangerous_deserialization=True,
-#     )
-# except FileNotFoundError:
-#     lawdb = None   # todavía no generado
+    def __getattr__(self, attr):
+        # index, docstore, index_to_docstore_id, similarity_search, …
+        return getattr(self.get(), attr)
+
+
+vectordb = LazyFAISS("index_cases", INDEX_CASES_DIR, get_embeddings)
+lawdb    = LazyFAISS("index_laws",  INDEX_LAWS_DIR,  lambda: get_embeddings("laws"))
+
+
+def warmup(*, background: bool = False) -> dict[str, float]:
+    """
+    Pre-carga ambos índices. Con background=True lanza un hilo daemon y
+    devuelve de inmediato (útil en el arranque de uvicorn / Streamlit).
+    Devuelve {nombre: segundos de carga} de los índices ya cargados.
+    """
+    def _load():
+        for db in (vectordb, lawdb):
+            try:
+                db.get()
+            except Exception as e:
+                log.warning("No se pudo pre-cargar %s: %s", db.name, e)
+
+    if background:
+        threading.Thread(target=_load, name="faiss-warmup", daemon=True).start()
+    else:
+        _load()
+    return {db.name: db.load_seconds for db in (vectordb, lawdb) if db.loaded}
 
 
 # ───── Helpers ───────────────────────────────────────────────────────
 def search_by_text(text: str, k: int = 5, filtro: dict | None = None):
     """Búsqueda con filtro opcional por metadatos (e.g. {'Materia':'Penal'})."""
-    return vectordb.similarity_search(text, k=k, filter=filtro)
+    db = vectordb.get()
+    if filtro:
+        return search_by_vector(db.embedding_function.embed_query(text), k=k, filtro=filtro)
+    return db.similarity_search(text, k=k)
 
 def search_by_vector(vec, k: int = 5, filtro: dict | None = None):
-    return vectordb.similarity_search_by_vector(vec, k=k, filter=filtro)
-
-
-# def law_search(text: str, k: int = 5):
-#     if not lawdb:
-#         return []
-#     return lawdb.similarity_search(text, k=k)
-lawdb = FAISS.load_local(
-    str(INDEX_DIR / "index_laws"),
-    embeddings=get_embeddings("laws"),
-    allow_dangerous_deserialization=True,
-)
+    """Con filtro sobre campos indexados (metadata_index) se pre-filtra por
+    ids; con otros campos se mantiene el post-filtro de LangChain."""
+    if filtro:
+        hits = vectordb.search_prefiltered(vec, k, filtro)
+        if hits is not None:
+            return [doc for doc, _ in hits]
+    return vectordb.get().similarity_search_by_vector(vec, k=k, filter=filtro)
 
 def law_search(text: str, k: int = 5, filtro: dict | None = None):
-    return lawdb.similarity_search(text, k=k, filter=filtro)
\ No newline at end of file
+    return lawdb.get().similarity_search(text, k=k, filter=filtro)
+
+def law_search_by_vector(vec, k: int = 5, filtro: dict | None = None):
+    """Como law_search, reutilizando un embedding ya calculado (mismo modelo)."""
+    return lawdb.get().similarity_search_by_vector(vec, k=k, filter=filtro)